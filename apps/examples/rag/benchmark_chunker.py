@@ -0,0 +1,73 @@
+# examples/rag/benchmark_chunker.py
+"""
+Rendimiento del chunker por estructura (chunker.py) frente a load_and_chunk_markdown.
+
+Genera un Markdown grande repitiendo documento.md con encabezados numerados y mide para
+cada chunker: MB/s, chunks/s, pico de memoria (tracemalloc) y tamaño máximo de chunk.
+
+Uso:
+    python benchmark_chunker.py --mb 50
+    python benchmark_chunker.py --mb 300 --solo-estructura          # el actual no cabe en memoria
+    python benchmark_chunker.py --mb 20 --contador tokenizer         # tokens reales de MiniLM
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from chunker import MAX_TOKENS, SOLAPAMIENTO, contador_palabras, contador_tokens, trocear_markdown
+from indice import CHUNK_SIZE, DOCUMENT_PATH, load_and_chunk_markdown
+
+def generar_markdown(path, mb, documento=DOCUMENT_PATH):
+    """Escribe `mb` megabytes repitiendo el documento bajo encabezados "# Parte N" """
+    with open(documento, encoding='utf-8') as f:
+        base = f.read()
+    objetivo = mb * 1024 * 1024
+    escritos = 0
+    parte = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while escritos < objetivo:
+            parte += 1
+            bloque = f"# Parte {parte}\n\n{base}\n\n"
+            f.write(bloque)
+            escritos += len(bloque.encode('utf-8'))
+    return escritos
+
+def medir(nombre, funcion, tamano, medida, unidad):
+    """Ejecuta funcion() -> lista de chunks y muestra rendimiento, memoria y el chunk más grande (medida(chunk) unidades)"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    chunks = funcion()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nombre:<14} {tamano / 1024 / 1024 / segundos:>8.1f} MB/s {len(chunks) / segundos:>10.0f} chunks/s "
+          f"{len(chunks):>9} chunks  pico {pico / 1024 / 1024:>8.1f} MB  máx {max(map(medida, chunks), default=0)} {unidad}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de chunkers de Markdown")
+    parser.add_argument("--mb", type=float, default=50, help="Tamaño del Markdown sintético")
+    parser.add_argument("--contador", choices=["palabras", "tokenizer"], default="palabras",
+                        help="Cómo cuenta tokens el chunker por estructura")
+    parser.add_argument("--solo-estructura", action="store_true",
+                        help="No ejecutar load_and_chunk_markdown (carga el archivo entero en memoria)")
+    args = parser.parse_args()
+
+    contar = contador_palabras if args.contador == "palabras" else contador_tokens()
+    with tempfile.TemporaryDirectory() as directorio:
+        path = os.path.join(directorio, "corpus.md")
+        tamano = generar_markdown(path, args.mb)
+        print(f"📄 Markdown sintético de {tamano / 1024 / 1024:.1f} MB\n")
+
+        # Mientras se recorre el generador solo se conserva el tamaño de cada chunk
+        medir("estructura",
+              lambda: [c["tokens"] for c in trocear_markdown(path, MAX_TOKENS, SOLAPAMIENTO, contar)],
+              tamano, lambda tokens: tokens, "tokens")
+        if not args.solo_estructura:
+            medir("html (actual)", lambda: load_and_chunk_markdown(path, CHUNK_SIZE), tamano,
+                  len, "caracteres")
+
+if __name__ == "__main__":
+    main()
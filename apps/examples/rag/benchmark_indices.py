@@ -0,0 +1,103 @@
+# examples/rag/benchmark_indices.py
+"""
+Recall@k frente a latencia de los índices aproximados (HNSW, IVF-Flat, IVF-PQ) comparados
+con la búsqueda exacta (Flat), sobre embeddings sintéticos normalizados con la dimensión de
+MiniLM. También mide el almacenamiento float16 / int8 con y sin reordenación exacta en float32.
+
+Uso:
+    python benchmark_indices.py                         # 200k vectores de 384 dimensiones
+    python benchmark_indices.py --n 1000000 --consultas 2000 --k 10
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from indice import HNSW_M, PQ_M, bytes_por_vector, ajustar_busqueda, buscar, crear_indice, descripcion_indice
+
+# === Datos sintéticos ===
+def embeddings_sinteticos(n, dim, centros=256, semilla=0):
+    """
+    Vectores normalizados agrupados alrededor de `centros` direcciones, más parecidos a
+    embeddings de texto reales que un ruido uniforme (con el que todos los índices fallan igual).
+    """
+    rng = np.random.default_rng(semilla)
+    base = rng.standard_normal((centros, dim)).astype(np.float32)
+    asignacion = rng.integers(0, centros, n)
+    vectores = base[asignacion] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectores /= np.linalg.norm(vectores, axis=1, keepdims=True)
+    return vectores
+
+def recall_at_k(resultado, referencia, k):
+    """Fracción de los k vecinos exactos que devuelve el índice aproximado"""
+    aciertos = sum(len(set(r[:k]) & set(e[:k])) for r, e in zip(resultado, referencia))
+    return aciertos / (len(referencia) * k)
+
+def medir(faiss_index, consultas, k, embeddings=None, individuales=200):
+    """
+    Returns:
+        tuple: (resultados, ms por consulta en lote, p50 ms de consultas individuales)
+    """
+    inicio = time.perf_counter()
+    _, resultados = buscar(faiss_index, consultas, k, embeddings)
+    ms_lote = 1000 * (time.perf_counter() - inicio) / len(consultas)
+
+    tiempos = []
+    for consulta in consultas[:individuales]:
+        inicio = time.perf_counter()
+        buscar(faiss_index, consulta[None, :], k, embeddings)
+        tiempos.append(1000 * (time.perf_counter() - inicio))
+    return resultados, ms_lote, float(np.median(tiempos))
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latencia de índices FAISS")
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--consultas", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--hilos", type=int, help="Hilos de FAISS (por defecto todos)")
+    args = parser.parse_args()
+
+    if args.hilos:
+        faiss.omp_set_num_threads(args.hilos)
+
+    datos = embeddings_sinteticos(args.n + args.consultas, args.dim)
+    base, consultas = datos[:args.n], datos[args.n:]
+    print(f"📊 {args.n} vectores, {args.dim} dimensiones, {args.consultas} consultas, k={args.k}\n")
+
+    # (tipo, almacenamiento, parámetros de búsqueda, reordenar en float32)
+    configuraciones = [("flat", "float32", {}, False)]
+    configuraciones += [("hnsw", "float32", {"ef_search": ef}, False) for ef in (16, 64, 256)]
+    configuraciones += [("ivf_flat", "float32", {"nprobe": p}, False) for p in (1, 4, 16, 64)]
+    configuraciones += [("ivf_pq", "float32", {"nprobe": p}, r) for p in (4, 16, 64) for r in (False, True)]
+    configuraciones += [("flat", a, {}, r) for a in ("float16", "int8") for r in (False, True)]
+    configuraciones += [("hnsw", "int8", {"ef_search": 64}, r) for r in (False, True)]
+    configuraciones += [("ivf_flat", "int8", {"nprobe": 16}, r) for r in (False, True)]
+
+    print(f"{'índice':<22} {'búsqueda':<20} {'recall@k':>9} {'ms/consulta':>12} {'p50 indiv.':>11} "
+          f"{'bytes/vec':>10} {'construcción':>13}")
+    referencia = None
+    construidos = {}
+    for tipo, almacenamiento, busqueda, rerank in configuraciones:
+        if (tipo, almacenamiento) not in construidos:
+            descripcion = descripcion_indice(tipo, args.n, args.dim, pq_m=PQ_M, hnsw_m=HNSW_M,
+                                             almacenamiento=almacenamiento)
+            inicio = time.perf_counter()
+            faiss_index = crear_indice(base, descripcion)
+            construidos[tipo, almacenamiento] = (descripcion, faiss_index, time.perf_counter() - inicio)
+        descripcion, faiss_index, segundos = construidos[tipo, almacenamiento]
+
+        ajustar_busqueda(faiss_index, busqueda.get("nprobe"), busqueda.get("ef_search"))
+        resultados, ms_lote, p50 = medir(faiss_index, consultas, args.k, base if rerank else None)
+        if referencia is None:
+            referencia = resultados
+        parametros = ", ".join([f"{c}={v}" for c, v in busqueda.items()] + (["rerank"] if rerank else []))
+        print(f"{descripcion:<22} {parametros or 'exacta':<20} {recall_at_k(resultados, referencia, args.k):>9.3f} "
+              f"{ms_lote:>12.4f} {p50:>11.3f} {bytes_por_vector(faiss_index):>10.1f} {segundos:>12.1f}s")
+
+    print(f"\nfloat32 sin comprimir: {4 * args.dim} bytes/vector")
+
+if __name__ == "__main__":
+    main()
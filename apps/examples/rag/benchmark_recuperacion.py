@@ -0,0 +1,73 @@
+# examples/rag/benchmark_recuperacion.py
+"""
+Latencia de recuperación: consultas una a una (retrieve_relevant_chunks) frente a lotes
+(retrieve_many), con la caché de embeddings de consultas vacía y llena.
+
+Uso:
+    python benchmark_recuperacion.py                          # preguntas de test_rag_batch.py
+    python benchmark_recuperacion.py --preguntas preguntas.txt --lote 32 --repeticiones 20
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from evaluar_rag import leer_preguntas
+from rag import cache_embeddings, retrieve_many, retrieve_relevant_chunks
+
+PREGUNTAS = [
+    "¿Cuál es la función de la mirada antes del pase secreto en una técnica mágica?",
+    "¿Por qué se considera efectiva la técnica de “no mirar” durante una técnica oculta?",
+    "Explica el papel de la “idea obnubilante” en el desvío de atención.",
+    "¿Qué efecto tiene en los espectadores el cambio súbito de mirada en una actuación?",
+    "¿Cómo se combinan la mirada y las palabras para reforzar el misdirection durante una técnica?",
+]
+
+def medir_individual(preguntas, con_cache):
+    """ms de cada consulta recuperada por separado"""
+    tiempos = []
+    for pregunta in preguntas:
+        if not con_cache:
+            cache_embeddings.vaciar()
+        inicio = time.perf_counter()
+        retrieve_relevant_chunks(pregunta)
+        tiempos.append(1000 * (time.perf_counter() - inicio))
+    return tiempos
+
+def medir_lotes(preguntas, lote, con_cache):
+    """ms por consulta de cada lote (tiempo del lote entre su tamaño)"""
+    tiempos = []
+    for desde in range(0, len(preguntas), lote):
+        bloque = preguntas[desde:desde + lote]
+        if not con_cache:
+            cache_embeddings.vaciar()
+        inicio = time.perf_counter()
+        retrieve_many(bloque)
+        tiempos.extend([1000 * (time.perf_counter() - inicio) / len(bloque)] * len(bloque))
+    return tiempos
+
+def main():
+    parser = argparse.ArgumentParser(description="p50/p99 de recuperación individual vs en lote")
+    parser.add_argument("--preguntas", help="Archivo con una pregunta por línea (por defecto, las de validación)")
+    parser.add_argument("--lote", type=int, default=16)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    preguntas = leer_preguntas(args.preguntas) if args.preguntas else PREGUNTAS
+    preguntas = preguntas * args.repeticiones
+    # Calentamiento: carga del modelo de embeddings (y del reranker, si está activo)
+    retrieve_many(preguntas[:args.lote])
+
+    print(f"📊 {len(preguntas)} consultas, lotes de {args.lote}\n")
+    print(f"{'modo':<28} {'p50 ms':>8} {'p99 ms':>8}")
+    for con_cache in (False, True):
+        cache_embeddings.vaciar()
+        etiqueta = "con caché" if con_cache else "sin caché"
+        for nombre, tiempos in ((f"individual, {etiqueta}", medir_individual(preguntas, con_cache)),
+                                (f"lote, {etiqueta}", medir_lotes(preguntas, args.lote, con_cache))):
+            print(f"{nombre:<28} {np.percentile(tiempos, 50):>8.2f} {np.percentile(tiempos, 99):>8.2f}")
+    print(f"\n🗃️  Caché de embeddings: {cache_embeddings.metricas()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# examples/rag/bm25.py
+"""
+Recuperación léxica BM25 con índice invertido, para combinarla con la búsqueda densa.
+
+Los embeddings de MiniLM difuminan los términos exactos del dominio ("misdirection",
+"pase secreto", "idea obnubilante"); BM25 recupera el chunk que contiene literalmente
+la palabra. Además de las palabras se indexan los bigramas, de modo que un chunk con la
+frase exacta puntúa más que uno con las dos palabras sueltas.
+
+Las listas de postings se guardan en formato CSR (tres arrays numpy): para el término t,
+docs[inicio[t]:inicio[t + 1]] son los chunks que lo contienen y pesos[...] su peso BM25
+ya calculado, así que una consulta es una suma de unos pocos slices.
+
+Los resultados denso y léxico se combinan con Reciprocal Rank Fusion (RRF), que solo usa
+la posición en cada lista y no necesita calibrar similitudes coseno frente a puntuaciones BM25.
+
+Uso:
+    python bm25.py --directorio indice "pase secreto" "idea obnubilante"     # latencia por consulta
+"""
+
+from collections import Counter
+from array import array
+import argparse
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+# === Configuración ===
+K1 = 1.2
+B = 0.75
+BIGRAMAS = True
+# Constante de RRF (60 en el artículo original): amortigua el peso de los primeros puestos
+K_RRF = 60
+RE_PALABRA = re.compile(r'\w+')
+STOPWORDS = frozenset("""
+a al algo ante antes como con contra cual cuando de del desde donde durante e el ella ellos
+en entre era es esa ese eso esta este esto fue ha hay la las le les lo los mas me mi muy
+no nos o os para pero por que se ser si sin sobre son su sus tambien te tu un una uno unos
+y ya
+""".split())
+
+# === Tokenización ===
+def normalizar_termino(texto):
+    """Minúsculas y sin tildes: "Obnubilante" y "obnubilánte" son el mismo término"""
+    texto = unicodedata.normalize("NFD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def tokenizar(texto, bigramas=BIGRAMAS):
+    """Palabras (sin stopwords) y, opcionalmente, los bigramas de palabras consecutivas"""
+    palabras = [p for p in RE_PALABRA.findall(normalizar_termino(texto)) if p not in STOPWORDS]
+    if bigramas:
+        return palabras + [f"{a} {b}" for a, b in zip(palabras, palabras[1:])]
+    return palabras
+
+# === Índice invertido ===
+class IndiceBM25:
+    def __init__(self, terminos, inicio, docs, pesos, n_docs, bigramas=BIGRAMAS):
+        self.terminos = terminos
+        self.vocabulario = {t: i for i, t in enumerate(terminos)}
+        self.inicio = inicio
+        self.docs = docs
+        self.pesos = pesos
+        self.n_docs = n_docs
+        self.bigramas = bigramas
+
+    @classmethod
+    def construir(cls, textos, k1=K1, b=B, bigramas=BIGRAMAS):
+        """Índice BM25 de una lista de textos (el id de cada uno es su posición)"""
+        vocabulario = {}
+        # Triples (término, doc, tf) en arrays compactos en vez de listas de tuplas
+        col_terminos, col_docs, col_tf = array('i'), array('i'), array('i')
+        longitudes = np.zeros(len(textos), dtype=np.float32)
+        for doc, texto in enumerate(textos):
+            tokens = tokenizar(texto, bigramas)
+            longitudes[doc] = len(tokens)
+            for termino, tf in Counter(tokens).items():
+                col_terminos.append(vocabulario.setdefault(termino, len(vocabulario)))
+                col_docs.append(doc)
+                col_tf.append(tf)
+
+        col_terminos = np.frombuffer(col_terminos, dtype=np.int32)
+        orden = np.argsort(col_terminos, kind='stable')
+        docs = np.frombuffer(col_docs, dtype=np.int32)[orden]
+        tf = np.frombuffer(col_tf, dtype=np.int32)[orden].astype(np.float32)
+        df = np.bincount(col_terminos, minlength=len(vocabulario))
+        inicio = np.zeros(len(vocabulario) + 1, dtype=np.int64)
+        np.cumsum(df, out=inicio[1:])
+
+        # Peso BM25 de cada posting: idf(t) · tf·(k1+1) / (tf + k1·(1 - b + b·|d|/avgdl))
+        n = len(textos)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        media = max(float(longitudes.mean()), 1.0) if n else 1.0
+        normalizacion = k1 * (1 - b + b * longitudes[docs] / media)
+        pesos = np.repeat(idf, df) * tf * (k1 + 1) / (tf + normalizacion)
+
+        terminos = [None] * len(vocabulario)
+        for termino, i in vocabulario.items():
+            terminos[i] = termino
+        return cls(terminos, inicio, docs, pesos.astype(np.float32), n, bigramas)
+
+    def buscar(self, consulta, k):
+        """
+        Returns:
+            tuple: (puntuaciones, ids) de los k chunks con mayor BM25, de mayor a menor
+        """
+        ids_terminos = {self.vocabulario[t] for t in tokenizar(consulta, self.bigramas) if t in self.vocabulario}
+        if not ids_terminos:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        puntuaciones = np.zeros(self.n_docs, dtype=np.float32)
+        for t in ids_terminos:
+            tramo = slice(self.inicio[t], self.inicio[t + 1])
+            # Un término aparece una vez por doc en sus postings: la suma con índices no se pisa
+            puntuaciones[self.docs[tramo]] += self.pesos[tramo]
+        candidatos = np.flatnonzero(puntuaciones)
+        if len(candidatos) > k:
+            candidatos = candidatos[np.argpartition(-puntuaciones[candidatos], k - 1)[:k]]
+        candidatos = candidatos[np.argsort(-puntuaciones[candidatos], kind='stable')]
+        return puntuaciones[candidatos], candidatos.astype(np.int64)
+
+    def guardar(self, f):
+        """Guarda el índice en un archivo abierto en binario (formato .npz)"""
+        np.savez(f, terminos=np.array(self.terminos, dtype=str), inicio=self.inicio, docs=self.docs,
+                 pesos=self.pesos, n_docs=self.n_docs, bigramas=self.bigramas)
+
+    @classmethod
+    def cargar(cls, path):
+        with np.load(path, allow_pickle=False) as datos:
+            return cls(datos["terminos"].tolist(), datos["inicio"], datos["docs"], datos["pesos"],
+                       int(datos["n_docs"]), bool(datos["bigramas"]))
+
+    def bytes(self):
+        return self.inicio.nbytes + self.docs.nbytes + self.pesos.nbytes
+
+# === Fusión ===
+def fusion_rrf(listas, k=None, k_rrf=K_RRF):
+    """
+    Reciprocal Rank Fusion: puntuación(d) = Σ 1 / (k_rrf + posición de d en cada lista).
+
+    Args:
+        listas: listas de ids ordenadas de mejor a peor (p. ej. [ids densos, ids BM25])
+
+    Returns:
+        list: ids fusionados, de mejor a peor (los k primeros si se indica k)
+    """
+    puntuaciones = {}
+    for lista in listas:
+        for posicion, i in enumerate(lista, 1):
+            i = int(i)
+            if i < 0:
+                continue
+            puntuaciones[i] = puntuaciones.get(i, 0.0) + 1.0 / (k_rrf + posicion)
+    fusionados = sorted(puntuaciones, key=puntuaciones.get, reverse=True)
+    return fusionados[:k] if k else fusionados
+
+# === Latencia desde línea de comandos ===
+if __name__ == "__main__":
+    from indice import INDEX_DIR, cargar_bm25
+
+    parser = argparse.ArgumentParser(description="Latencia de BM25 sobre los chunks del índice")
+    parser.add_argument("consultas", nargs="*", default=["pase secreto", "idea obnubilante", "misdirection"])
+    parser.add_argument("--directorio", default=INDEX_DIR)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeticiones", type=int, default=1000)
+    args = parser.parse_args()
+
+    bm25 = cargar_bm25(args.directorio)
+    print(f"📚 {bm25.n_docs} chunks, {len(bm25.terminos)} términos, {bm25.bytes() / 1024:.0f} KB de postings")
+    for consulta in args.consultas:
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            _, ids = bm25.buscar(consulta, args.k)
+            tiempos.append(1000 * (time.perf_counter() - inicio))
+        print(f"🔎 {consulta!r}: {len(ids)} resultados, p50 {np.percentile(tiempos, 50):.3f} ms, "
+              f"p99 {np.percentile(tiempos, 99):.3f} ms")
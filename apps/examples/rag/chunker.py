@@ -0,0 +1,181 @@
+# examples/rag/chunker.py
+"""
+Troceado de Markdown por estructura, en streaming.
+
+A diferencia de load_and_chunk_markdown (Markdown -> HTML -> BeautifulSoup -> texto plano,
+empaquetado por caracteres), se lee el archivo línea a línea sin pasar por HTML:
+    - los encabezados (#, ##, ...) cierran el chunk en curso y definen la ruta de sección
+      ("Misdirection > 1) NO MIRAR") que se guarda en cada chunk y encabeza su texto;
+    - el tamaño se mide en tokens del modelo de embeddings (MiniLM trunca a 256);
+    - un párrafo demasiado grande se parte por frases y, si hace falta, por palabras;
+    - los chunks consecutivos de una sección comparten `solapamiento` tokens.
+La memoria no depende del tamaño del archivo, pero sí del bloque más grande: cada párrafo (o
+bloque de código entre vallas) se acumula entero antes de partirlo, así que un bloque enorme
+sin líneas en blanco ocupa memoria en proporción a su tamaño.
+
+Uso:
+    for chunk in trocear_markdown("documento.md"):
+        print(chunk["seccion"], chunk["tokens"], chunk["texto"])
+"""
+
+from functools import lru_cache
+import re
+
+# === Configuración ===
+MAX_TOKENS = 200
+SOLAPAMIENTO = 32
+# Los encabezados de nivel <= NIVEL_CORTE cortan el chunk; los más profundos quedan como texto
+NIVEL_CORTE = 6
+TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+
+RE_ENCABEZADO = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RE_VALLA = re.compile(r'^\s*(```|~~~)')
+RE_FRASES = re.compile(r'(?<=[.!?…])\s+')
+# Sintaxis en línea que no aporta al embedding
+RE_IMAGEN = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+RE_ENLACE = re.compile(r'\[([^\]]+)\]\([^)]*\)')
+RE_COMENTARIO = re.compile(r'<!--.*?-->')
+RE_ENFASIS = re.compile(r'(\*\*|__|\*|_|`)(?=\S)(.+?)(?<=\S)\1')
+# Marcas de lista y cita al inicio de una línea de texto
+RE_MARCA_LISTA = re.compile(r'^\s*(?:[-*+>]|\d+[.)])\s+')
+
+# === Contadores de tokens ===
+@lru_cache(maxsize=None)
+def contador_tokens(nombre=TOKENIZER):
+    """Cuenta tokens con el tokenizer del modelo de embeddings (sin tokens especiales)"""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(nombre)
+    return lambda texto: len(tokenizer(texto, add_special_tokens=False)["input_ids"])
+
+def contador_palabras(texto):
+    """Aproximación sin tokenizer: ~1.3 tokens WordPiece por palabra en español"""
+    return int(len(texto.split()) * 1.3) + 1
+
+# === Limpieza de línea ===
+def limpiar_linea(linea):
+    """Quita la sintaxis en línea (imágenes, enlaces, énfasis, comentarios, tablas)"""
+    linea = RE_COMENTARIO.sub('', linea)
+    linea = RE_IMAGEN.sub(r'\1', linea)
+    linea = RE_ENLACE.sub(r'\1', linea)
+    linea = RE_ENFASIS.sub(r'\2', linea)
+    return linea.replace('|', ' ').strip()
+
+# === Lectura por bloques ===
+def bloques_markdown(lineas):
+    """
+    Recorre las líneas y produce ("encabezado", nivel, texto) o ("parrafo", numero_linea, texto).
+    Los bloques de código se conservan enteros y sus "#" no se toman por encabezados.
+    """
+    parrafo = []
+    inicio = 0
+    en_codigo = False
+    for numero, linea in enumerate(lineas, 1):
+        linea = linea.rstrip('\n')
+        if RE_VALLA.match(linea):
+            en_codigo = not en_codigo
+            continue
+        if en_codigo:
+            if not parrafo:
+                inicio = numero
+            parrafo.append(linea)
+            continue
+
+        encabezado = RE_ENCABEZADO.match(linea)
+        if encabezado or not linea.strip():
+            if parrafo:
+                yield "parrafo", inicio, " ".join(parrafo)
+                parrafo = []
+            if encabezado:
+                yield "encabezado", len(encabezado.group(1)), limpiar_linea(encabezado.group(2))
+            continue
+
+        texto = limpiar_linea(RE_MARCA_LISTA.sub('', linea))
+        if texto:
+            if not parrafo:
+                inicio = numero
+            parrafo.append(texto)
+    if parrafo:
+        yield "parrafo", inicio, " ".join(parrafo)
+
+def partir_parrafo(texto, max_tokens, contar):
+    """Divide un párrafo demasiado grande por frases y, si una frase no cabe, por palabras"""
+    for frase in RE_FRASES.split(texto):
+        if contar(frase) <= max_tokens:
+            yield frase
+            continue
+        palabras = frase.split()
+        actual = []
+        for palabra in palabras:
+            if actual and contar(" ".join(actual + [palabra])) > max_tokens:
+                yield " ".join(actual)
+                actual = []
+            actual.append(palabra)
+        if actual:
+            yield " ".join(actual)
+
+def cola_solapamiento(piezas, solapamiento):
+    """Últimas piezas (frases) del chunk que suman como mucho `solapamiento` tokens"""
+    cola = []
+    tokens = 0
+    for pieza, n in reversed(piezas):
+        if tokens + n > solapamiento:
+            break
+        cola.insert(0, (pieza, n))
+        tokens += n
+    return cola
+
+# === Troceado ===
+def trocear_lineas(lineas, max_tokens=MAX_TOKENS, solapamiento=SOLAPAMIENTO, contar=None,
+                   nivel_corte=NIVEL_CORTE):
+    """
+    Genera chunks {"texto", "seccion", "tokens", "linea"} a partir de un iterable de líneas.
+    `texto` empieza por la ruta de sección para que el embedding y el prompt tengan el contexto.
+    """
+    contar = contar or contador_tokens()
+    seccion = []
+    piezas = []      # (texto, tokens) del chunk en curso
+    linea_chunk = 1
+    solapadas = 0    # piezas iniciales que vienen del chunk anterior
+
+    def emitir():
+        ruta = " > ".join(seccion)
+        cuerpo = " ".join(p for p, _ in piezas)
+        texto = f"{ruta}\n{cuerpo}" if ruta else cuerpo
+        return {"texto": texto, "seccion": list(seccion), "tokens": sum(n for _, n in piezas),
+                "linea": linea_chunk}
+
+    for tipo, dato, texto in bloques_markdown(lineas):
+        if tipo == "encabezado" and dato <= nivel_corte:
+            if len(piezas) > solapadas:
+                yield emitir()
+            piezas, solapadas = [], 0
+            seccion = seccion[:dato - 1] + [texto]
+            continue
+        if tipo == "encabezado":
+            # Encabezado profundo: se queda en el chunk como una frase más
+            dato = linea_chunk
+
+        # El presupuesto descuenta la ruta de sección que encabeza cada chunk
+        presupuesto = max(16, max_tokens - (contar(" > ".join(seccion)) if seccion else 0))
+        for pieza in partir_parrafo(texto, presupuesto, contar):
+            n = contar(pieza)
+            if piezas and sum(m for _, m in piezas) + n > presupuesto:
+                if len(piezas) > solapadas:
+                    yield emitir()
+                piezas = cola_solapamiento(piezas, solapamiento)
+                while piezas and sum(m for _, m in piezas) + n > presupuesto:
+                    piezas.pop(0)
+                solapadas = len(piezas)
+                linea_chunk = dato
+            if not piezas:
+                linea_chunk = dato
+            piezas.append((pieza, n))
+
+    if len(piezas) > solapadas:
+        yield emitir()
+
+def trocear_markdown(path, max_tokens=MAX_TOKENS, solapamiento=SOLAPAMIENTO, contar=None,
+                     nivel_corte=NIVEL_CORTE):
+    """Trocea un archivo Markdown leyéndolo línea a línea (memoria acotada por el párrafo más grande)"""
+    with open(path, encoding='utf-8') as f:
+        yield from trocear_lineas(f, max_tokens, solapamiento, contar, nivel_corte)
@@ -0,0 +1,110 @@
+# examples/rag/contexto.py
+"""
+Construcción del contexto del prompt con presupuesto de tokens.
+
+El adaptador se entrenó con cutoff_len 2048 (scripts/train.sh). Si el prompt supera ese
+tamaño, el modelo recibe algo que no ha visto nunca, y cada token de contexto sobrante se
+paga en el prefill. Aquí los chunks (ya ordenados por relevancia) se empaquetan así:
+    - se cuentan los tokens con el tokenizer del modelo generador (Phi-4-mini), no con el de
+      los embeddings;
+    - el presupuesto es cutoff_len menos los tokens a generar, la plantilla del prompt y la
+      pregunta;
+    - las frases repetidas se eliminan: el solapamiento entre chunks consecutivos y las rutas
+      de sección que se repiten;
+    - el primer chunk que no cabe entero se recorta por frases; los siguientes se descartan.
+El resultado incluye los tokens usados, para seguir el coste de prefill de cada petición.
+"""
+
+from chunker import RE_FRASES, contador_tokens
+
+# === Configuración ===
+TOKENIZER_GENERADOR = "microsoft/Phi-4-mini-instruct"
+# --cutoff_len de scripts/train.sh y MAX_NEW_TOKENS de scripts/inference.py
+CUTOFF_LEN = 2048
+MAX_NEW_TOKENS = 200
+# Tokens de "<s>[INST] ... [/INST]" que añade el servidor alrededor de la instrucción
+RESERVA_FORMATO = 16
+# Con menos tokens libres que esto no se recorta el chunk siguiente (quedaría un fragmento)
+MIN_TOKENS_RECORTE = 32
+SEPARADOR = "\n\n"
+
+def clave_frase(frase):
+    return " ".join(frase.lower().split())
+
+def frases(texto):
+    """Frases del chunk como (número de línea, frase); las líneas se conservan (ruta de sección)"""
+    for numero, linea in enumerate(texto.split("\n")):
+        for frase in RE_FRASES.split(linea):
+            if frase.strip():
+                yield numero, frase.strip()
+
+def unir_frases(piezas):
+    """Inversa de frases(): frases de la misma línea separadas por espacio y líneas por \\n"""
+    lineas = {}
+    for numero, frase in piezas:
+        lineas.setdefault(numero, []).append(frase)
+    return "\n".join(" ".join(lineas[n]) for n in sorted(lineas))
+
+def construir_contexto(chunks, plantilla, presupuesto=CUTOFF_LEN - MAX_NEW_TOKENS, contar=None):
+    """
+    Args:
+        chunks: textos ordenados de más a menos relevante
+        plantilla: función lista de chunks -> prompt completo (para medir lo que no es contexto)
+        presupuesto: tokens máximos del prompt completo
+
+    Returns:
+        dict: {"chunks": textos incluidos (deduplicados / recortados), "tokens_prompt",
+               "tokens_contexto", "incluidos", "recortados", "descartados", "frases_duplicadas"}
+    """
+    contar = contar or contador_tokens(TOKENIZER_GENERADOR)
+    fijos = contar(plantilla([])) + RESERVA_FORMATO
+    disponibles = presupuesto - fijos
+    separador = contar(SEPARADOR)
+
+    vistas = set()
+    incluidos, usados = [], 0
+    recortados = descartados = duplicadas = 0
+    for posicion, chunk in enumerate(chunks):
+        piezas = []
+        for numero, frase in frases(chunk):
+            clave = clave_frase(frase)
+            if clave in vistas:
+                duplicadas += 1
+                continue
+            piezas.append((numero, frase))
+        if not piezas:
+            continue
+
+        libres = disponibles - usados - (separador if incluidos else 0)
+        texto = unir_frases(piezas)
+        tokens = contar(texto)
+        recortado = tokens > libres
+        if recortado:
+            # Recorte por frases: las que quepan, en orden; si queda poco sitio no merece la pena
+            while piezas and tokens > libres and libres >= MIN_TOKENS_RECORTE:
+                piezas.pop()
+                texto = unir_frases(piezas)
+                tokens = contar(texto) if piezas else 0
+            if not piezas or libres < MIN_TOKENS_RECORTE:
+                descartados += len(chunks) - posicion
+                break
+            recortados += 1
+
+        vistas.update(clave_frase(f) for _, f in piezas)
+        usados += tokens + (separador if incluidos else 0)
+        incluidos.append(texto)
+        if recortado:
+            descartados += len(chunks) - posicion - 1
+            break
+
+    # Cuenta exacta del prompt final (la suma por partes puede diferir en algún token de frontera)
+    tokens_prompt = contar(plantilla(incluidos)) + RESERVA_FORMATO
+    return {
+        "chunks": incluidos,
+        "tokens_prompt": tokens_prompt,
+        "tokens_contexto": tokens_prompt - fijos,
+        "incluidos": len(incluidos),
+        "recortados": recortados,
+        "descartados": descartados,
+        "frases_duplicadas": duplicadas,
+    }
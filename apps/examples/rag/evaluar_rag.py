@@ -0,0 +1,152 @@
+# examples/rag/evaluar_rag.py
+"""
+Evaluación del RAG en lote.
+
+Todas las preguntas se codifican en una sola llamada a encode() y se buscan en FAISS con
+una única matriz de consultas; después las peticiones a /generate se envían concurrentemente
+con una sesión aiohttp compartida (keep-alive), un límite de concurrencia y reintentos con
+backoff exponencial. Cada resultado se escribe en JSONL en cuanto llega.
+
+rag.py (índice, modelo de embeddings y tokenizer) solo se importa si no se inyectan la
+recuperación y la construcción del prompt, así que evaluar() se puede probar sin él.
+
+Uso:
+    python evaluar_rag.py --preguntas preguntas.txt --concurrencia 8
+    python stub_modelo.py &  python evaluar_rag.py --url http://localhost:8001/generate   # sin modelo real
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+AUTH_TOKEN = os.getenv("AUTH_TOKEN")
+
+# === Configuración ===
+CONCURRENCIA = 8
+REINTENTOS = 3
+BACKOFF_BASE = 0.5
+TIMEOUT = 300
+# Códigos ante los que merece la pena reintentar
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# === Recuperación en lote ===
+def recuperar_contextos(preguntas, top_k):
+    """Codifica todas las preguntas de una vez y hace una sola búsqueda en FAISS (más BM25 y reranking)"""
+    from rag import retrieve_many
+    return retrieve_many(preguntas, top_k)
+
+def construir_prompt_rag(pregunta, contexto):
+    """Prompt con el presupuesto de tokens del modelo: (prompt, {"tokens_prompt": ...})"""
+    from rag import build_budgeted_prompt
+    return build_budgeted_prompt(pregunta, contexto)
+
+# === Generación concurrente ===
+async def generar(session, semaforo, url, prompt, reintentos=REINTENTOS):
+    """
+    POST a /generate con reintentos y backoff exponencial (con jitter).
+
+    Returns:
+        dict: {"respuesta": ...} o {"error": ...}
+    """
+    ultimo_error = None
+    for intento in range(reintentos + 1):
+        if intento:
+            await asyncio.sleep(BACKOFF_BASE * 2 ** (intento - 1) * (1 + random.random()))
+        try:
+            async with semaforo:
+                async with session.post(url, json={"instruction": prompt}) as response:
+                    if response.status == 200:
+                        datos = await response.json()
+                        return {"respuesta": datos.get("respuesta", datos)}
+                    ultimo_error = f"{response.status}: {await response.text()}"
+                    if response.status not in CODIGOS_REINTENTABLES:
+                        break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            ultimo_error = f"{type(e).__name__}: {e}"
+    return {"error": ultimo_error}
+
+async def evaluar(preguntas, url=None, salida_jsonl="rag_resultados.jsonl",
+                  concurrencia=CONCURRENCIA, reintentos=REINTENTOS, top_k=None,
+                  recuperar=recuperar_contextos, construir_prompt=construir_prompt_rag):
+    """
+    Ejecuta todas las preguntas y devuelve los resultados en el orden de entrada.
+    Cada resultado se añade a `salida_jsonl` según termina (con su índice).
+
+    Args:
+        url, top_k: por defecto MODEL_API_URL y TOP_K de rag.py
+        recuperar (callable): (preguntas, top_k) -> chunks de cada pregunta
+        construir_prompt (callable): (pregunta, chunks) -> (prompt, {"tokens_prompt": ...})
+    """
+    if not preguntas:
+        print("⚠️  No hay preguntas que evaluar")
+        return []
+    if url is None or top_k is None:
+        from rag import MODEL_API_URL, TOP_K
+        url = url or MODEL_API_URL
+        top_k = top_k or TOP_K
+
+    inicio = time.perf_counter()
+    contextos = recuperar(preguntas, top_k)
+    tiempo_recuperacion = time.perf_counter() - inicio
+    print(f"🔎 {len(preguntas)} preguntas recuperadas en {1000 * tiempo_recuperacion:.1f} ms")
+
+    headers = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+    semaforo = asyncio.Semaphore(concurrencia)
+    conector = aiohttp.TCPConnector(limit=concurrencia)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    resultados = [None] * len(preguntas)
+
+    async with aiohttp.ClientSession(headers=headers, connector=conector, timeout=timeout) as session:
+        async def procesar(i):
+            inicio_pregunta = time.perf_counter()
+            prompt, contexto = construir_prompt(preguntas[i], contextos[i])
+            resultado = await generar(session, semaforo, url, prompt, reintentos)
+            resultado = dict({"pregunta": preguntas[i]}, **resultado, tokens_prompt=contexto["tokens_prompt"])
+            return i, resultado, time.perf_counter() - inicio_pregunta
+
+        with open(salida_jsonl, "w", encoding="utf-8") as f:
+            for tarea in asyncio.as_completed([procesar(i) for i in range(len(preguntas))]):
+                i, resultado, duracion = await tarea
+                resultados[i] = resultado
+                f.write(json.dumps(dict(resultado, indice=i, segundos=round(duracion, 3)), ensure_ascii=False) + "\n")
+                f.flush()
+                estado = "✅" if "respuesta" in resultado else f"❌ {resultado['error']}"
+                print(f"🔹 Pregunta {i + 1} ({duracion:.1f}s): {estado}")
+
+    total = time.perf_counter() - inicio
+    errores = sum(1 for r in resultados if "error" in r)
+    tokens = sum(r["tokens_prompt"] for r in resultados)
+    print(f"⏱️  {len(preguntas)} preguntas en {total:.1f}s ({len(preguntas) / total:.2f} preguntas/s), {errores} errores")
+    print(f"🧮 {tokens} tokens de prompt ({tokens / len(preguntas):.0f} por pregunta)")
+    return resultados
+
+def leer_preguntas(path):
+    with open(path, encoding="utf-8") as f:
+        return [linea.strip() for linea in f if linea.strip()]
+
+# === Ejecución desde línea de comandos ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluación concurrente del RAG")
+    parser.add_argument("--preguntas", required=True, help="Archivo con una pregunta por línea")
+    parser.add_argument("--url", help="Por defecto, MODEL_API_URL de rag.py")
+    parser.add_argument("--salida", default="rag_resultados.json")
+    parser.add_argument("--salida-jsonl", default="rag_resultados.jsonl", help="Resultados según van llegando")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA)
+    parser.add_argument("--reintentos", type=int, default=REINTENTOS)
+    parser.add_argument("--top-k", type=int, help="Por defecto, TOP_K de rag.py")
+    args = parser.parse_args()
+
+    resultados = asyncio.run(evaluar(
+        leer_preguntas(args.preguntas), args.url, args.salida_jsonl,
+        args.concurrencia, args.reintentos, args.top_k
+    ))
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 Resultados guardados en {args.salida}")
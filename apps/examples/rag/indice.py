@@ -0,0 +1,474 @@
+# examples/rag/indice.py
+"""
+Índice FAISS persistente para el ejemplo RAG.
+
+En lugar de trocear y codificar documento.md en cada arranque, se construye una vez:
+    python indice.py                      # documento.md -> indice/
+    python indice.py --documento otro.md --directorio indice_otro
+
+En disco quedan el índice FAISS, los textos de los chunks, sus embeddings y un manifiesto
+con el hash de cada chunk. Al reconstruir solo se codifican los chunks nuevos o modificados;
+al consultar el índice se abre con mmap y el modelo de embeddings solo se carga al codificar
+la primera pregunta.
+
+El tipo de índice se elige según el tamaño del corpus (--tipo auto): búsqueda exacta (Flat)
+para un documento, HNSW o IVF-Flat para miles de chunks e IVF-PQ para corpus grandes.
+Ver benchmark_indices.py para el compromiso recall / latencia / memoria de cada uno.
+
+Los embeddings se normalizan (norma L2 = 1) al ingerirlos y se busca por producto interno,
+es decir, por similitud coseno, que es para lo que están entrenados los modelos de
+sentence-transformers. Los vectores del índice pueden guardarse en float16 o int8 (scalar
+quantization); en ese caso los mejores candidatos se reordenan con el producto exacto en
+float32 leyendo embeddings.npy con mmap.
+
+Junto al índice FAISS se guarda un índice BM25 de los mismos chunks (bm25.py, bm25.npz)
+para la búsqueda híbrida densa + léxica de rag.py.
+"""
+
+from markdown import markdown
+from bs4 import BeautifulSoup
+from pathlib import Path
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+import faiss
+import hashlib
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from bm25 import IndiceBM25
+from chunker import SOLAPAMIENTO, contador_tokens, trocear_markdown
+
+# === Configuración ===
+DOCUMENT_PATH = "documento.md"
+INDEX_DIR = "indice"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Tamaño máximo de chunk: tokens con el chunker "estructura", caracteres con "html"
+CHUNK_SIZE = 200
+# "estructura": chunker.py (por encabezados, en tokens, con solapamiento)
+# "html": load_and_chunk_markdown (Markdown -> HTML -> texto, por caracteres)
+CHUNKERS = ("estructura", "html")
+CHUNKER = "estructura"
+
+ARCHIVO_INDICE = "indice.faiss"
+ARCHIVO_CHUNKS = "chunks.json"
+ARCHIVO_METADATOS = "metadatos.json"
+ARCHIVO_EMBEDDINGS = "embeddings.npy"
+ARCHIVO_BM25 = "bm25.npz"
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+
+# === Tipos de índice ===
+TIPOS_INDICE = ("auto", "flat", "hnsw", "ivf_flat", "ivf_pq")
+# Umbrales (número de vectores) de la elección automática
+UMBRAL_HNSW = 10_000
+UMBRAL_IVF = 100_000
+UMBRAL_PQ = 2_000_000
+HNSW_M = 32
+# Bytes por vector de PQ (subcuantizadores de 8 bits); debe dividir la dimensión
+PQ_M = 48
+# Codificación de los vectores dentro del índice (PQ ya comprime por sí mismo)
+ALMACENAMIENTOS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+# Con almacenamiento comprimido se piden FACTOR_RERANK * k candidatos y se reordenan en float32
+FACTOR_RERANK = 4
+# Versión de la métrica del índice; los manifiestos sin ella son índices L2 sin normalizar
+METRICA = "coseno"
+# Parámetros de búsqueda por defecto (más alto = más recall y más latencia)
+NPROBE = 16
+EF_SEARCH = 64
+# Consultas cuyo embedding se conserva en CacheEmbeddings
+MAX_CONSULTAS_CACHE = 4096
+# FAISS necesita unos 39 puntos por centroide para entrenar k-means
+PUNTOS_POR_CENTROIDE = 39
+MAX_MUESTRA_ENTRENAMIENTO = 256 * 1024
+
+# === Cargar y chunkear el documento ===
+def load_and_chunk_markdown(path, chunk_size=CHUNK_SIZE):
+    text = Path(path).read_text(encoding='utf-8')
+    html = markdown(text)
+    soup = BeautifulSoup(html, 'html.parser')
+    plain_text = soup.get_text()
+    paragraphs = [p.strip() for p in re.split(r'\n+', plain_text) if p.strip()]
+    chunks = []
+    current = ""
+    for p in paragraphs:
+        if len(current) + len(p) < chunk_size:
+            current += " " + p
+        else:
+            chunks.append(current.strip())
+            current = p
+    if current:
+        chunks.append(current.strip())
+    return chunks
+
+def trocear(documento, chunker=CHUNKER, chunk_size=CHUNK_SIZE, modelo=EMBEDDING_MODEL):
+    """
+    Returns:
+        tuple: (textos de los chunks, metadatos {"seccion", "linea"} de cada uno)
+    """
+    if chunker == "html":
+        chunks = load_and_chunk_markdown(documento, chunk_size)
+        return chunks, [{"seccion": [], "linea": None} for _ in chunks]
+    if chunker != "estructura":
+        raise ValueError(f"Chunker desconocido: {chunker} (opciones: {', '.join(CHUNKERS)})")
+
+    # Los tokens se cuentan con el tokenizer del propio modelo de embeddings
+    tokenizer = modelo if "/" in modelo else f"sentence-transformers/{modelo}"
+    chunks, metadatos = [], []
+    for chunk in trocear_markdown(documento, chunk_size, SOLAPAMIENTO, contador_tokens(tokenizer)):
+        chunks.append(chunk["texto"])
+        metadatos.append({"seccion": chunk["seccion"], "linea": chunk["linea"]})
+    return chunks, metadatos
+
+# === Utilidades ===
+def hash_texto(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def hash_archivo(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+@lru_cache(maxsize=None)
+def modelo_embeddings(nombre=EMBEDDING_MODEL):
+    """Carga perezosa del modelo de embeddings (solo hace falta para codificar)"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(nombre)
+
+def normalizar(vectores):
+    """Copia float32 contigua con norma L2 = 1 (el producto interno pasa a ser el coseno)"""
+    vectores = np.array(vectores, dtype=np.float32, order='C')
+    faiss.normalize_L2(vectores)
+    return vectores
+
+def codificar(textos, modelo=EMBEDDING_MODEL, batch_size=64):
+    """Embeddings normalizados de una lista de textos"""
+    return normalizar(modelo_embeddings(modelo).encode(textos, convert_to_numpy=True, batch_size=batch_size))
+
+def normalizar_consulta(texto):
+    """Clave de caché de una consulta: NFC, minúsculas y espacios colapsados (MiniLM no distingue mayúsculas)"""
+    return " ".join(unicodedata.normalize("NFC", texto).lower().split())
+
+class CacheEmbeddings:
+    """LRU acotado de embeddings de consultas; solo se codifican (en una llamada) las que faltan"""
+
+    def __init__(self, modelo=EMBEDDING_MODEL, max_entradas=MAX_CONSULTAS_CACHE):
+        self.modelo = modelo
+        self.max_entradas = max_entradas
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def codificar(self, consultas):
+        """Embeddings normalizados (n_consultas, dim) en el orden de entrada"""
+        claves = [normalizar_consulta(c) for c in consultas]
+        vectores = {}
+        with self.lock:
+            for clave in claves:
+                if clave in self.cache:
+                    self.cache.move_to_end(clave)
+                    vectores[clave] = self.cache[clave]
+            self.aciertos += sum(1 for clave in claves if clave in vectores)
+        # Cada texto distinto que falta se codifica una sola vez
+        pendientes = list(dict.fromkeys(clave for clave in claves if clave not in vectores))
+        if pendientes:
+            nuevos = dict(zip(pendientes, codificar(pendientes, self.modelo)))
+            vectores.update(nuevos)
+            with self.lock:
+                self.fallos += len(pendientes)
+                self.cache.update(nuevos)
+                while len(self.cache) > self.max_entradas:
+                    self.cache.popitem(last=False)
+        return np.stack([vectores[clave] for clave in claves])
+
+    def vaciar(self):
+        with self.lock:
+            self.cache.clear()
+
+    def metricas(self):
+        with self.lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self.cache),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 3) if consultas else None,
+            }
+
+def escribir_atomico(path, escribir):
+    """Escribe en un temporal y lo renombra, para no dejar un índice a medias si se interrumpe"""
+    tmp = f"{path}.tmp"
+    escribir(tmp)
+    os.replace(tmp, path)
+
+def guardar_npy(path, array):
+    # Con un nombre, np.save añadiría ".npy" al temporal
+    with open(path, 'wb') as f:
+        np.save(f, array)
+
+def leer_manifiesto(directorio):
+    path = Path(directorio) / ARCHIVO_MANIFIESTO
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+def elegir_tipo(n):
+    """Tipo de índice razonable para n vectores"""
+    if n < UMBRAL_HNSW:
+        return "flat"
+    if n < UMBRAL_IVF:
+        return "hnsw"
+    if n < UMBRAL_PQ:
+        return "ivf_flat"
+    return "ivf_pq"
+
+def descripcion_indice(tipo, n, dim, nlist=None, pq_m=PQ_M, hnsw_m=HNSW_M, almacenamiento="float32"):
+    """Cadena de faiss.index_factory para el tipo y la codificación pedidos"""
+    if tipo == "auto":
+        tipo = elegir_tipo(n)
+    if almacenamiento not in ALMACENAMIENTOS:
+        raise ValueError(f"Almacenamiento desconocido: {almacenamiento} (opciones: {', '.join(ALMACENAMIENTOS)})")
+    codificacion = ALMACENAMIENTOS[almacenamiento]
+    # Regla habitual: del orden de 4·sqrt(n) listas, sin superar lo que se puede entrenar
+    nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // PUNTOS_POR_CENTROIDE or 1))
+    if tipo == "flat":
+        return codificacion
+    if tipo == "hnsw":
+        return f"HNSW{hnsw_m}" if codificacion == "Flat" else f"HNSW{hnsw_m}_{codificacion}"
+    if tipo == "ivf_flat":
+        return f"IVF{nlist},{codificacion}"
+    if tipo == "ivf_pq":
+        if dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} debe dividir la dimensión {dim}")
+        return f"IVF{nlist},PQ{pq_m}"
+    raise ValueError(f"Tipo de índice desconocido: {tipo} (opciones: {', '.join(TIPOS_INDICE)})")
+
+def crear_indice(embeddings, descripcion, metrica=faiss.METRIC_INNER_PRODUCT, semilla=0):
+    """
+    Crea el índice, lo entrena (si lo necesita) con una muestra y añade todos los vectores.
+    """
+    n, dim = embeddings.shape
+    faiss_index = faiss.index_factory(dim, descripcion, metrica)
+    if not faiss_index.is_trained:
+        rng = np.random.default_rng(semilla)
+        tamano = min(n, MAX_MUESTRA_ENTRENAMIENTO)
+        muestra = embeddings[rng.choice(n, tamano, replace=False)] if tamano < n else embeddings
+        faiss_index.train(np.ascontiguousarray(muestra))
+    faiss_index.add(embeddings)
+    return faiss_index
+
+def ajustar_busqueda(faiss_index, nprobe=NPROBE, ef_search=EF_SEARCH):
+    """Aplica nprobe (IVF) y efSearch (HNSW); se ignoran en los tipos que no los tienen"""
+    espacio = faiss.ParameterSpace()
+    for nombre, valor in (("nprobe", nprobe), ("efSearch", ef_search)):
+        if valor is None:
+            continue
+        try:
+            espacio.set_index_parameter(faiss_index, nombre, valor)
+        except RuntimeError:
+            pass
+    return faiss_index
+
+def bytes_por_vector(faiss_index):
+    """Memoria del índice serializado dividida entre el número de vectores"""
+    return faiss.serialize_index(faiss_index).nbytes / max(1, faiss_index.ntotal)
+
+def necesita_rerank(descripcion):
+    """Los índices con vectores comprimidos (SQ, PQ) devuelven similitudes aproximadas"""
+    return "SQ" in descripcion or "PQ" in descripcion
+
+def buscar(faiss_index, consultas, k, embeddings=None, factor_rerank=FACTOR_RERANK):
+    """
+    Busca las consultas (ya normalizadas). Si se pasan los embeddings float32, se piden
+    factor_rerank * k candidatos al índice y se reordenan con el producto interno exacto.
+
+    Returns:
+        tuple: (similitudes, ids) de forma (n_consultas, k); ids = -1 donde no hay resultado
+    """
+    if embeddings is None:
+        return faiss_index.search(consultas, k)
+
+    _, candidatos = faiss_index.search(consultas, k * factor_rerank)
+    similitudes = np.full((len(consultas), k), -np.inf, dtype=np.float32)
+    ids = np.full((len(consultas), k), -1, dtype=np.int64)
+    for fila, (consulta, cand) in enumerate(zip(consultas, candidatos)):
+        # Ordenados para que la lectura del mmap sea secuencial
+        cand = np.sort(cand[cand >= 0])
+        if not len(cand):
+            continue
+        exactas = embeddings[cand] @ consulta
+        orden = np.argsort(-exactas)[:k]
+        similitudes[fila, :len(orden)] = exactas[orden]
+        ids[fila, :len(orden)] = cand[orden]
+    return similitudes, ids
+
+# === Construir / actualizar el índice ===
+def embeddings_previos(directorio, modelo=EMBEDDING_MODEL):
+    """Embeddings del índice anterior reutilizables (mismo modelo), indexados por hash del chunk"""
+    directorio = Path(directorio)
+    anterior = leer_manifiesto(directorio)
+    if not anterior or anterior.get("modelo") != modelo or not (directorio / ARCHIVO_EMBEDDINGS).exists():
+        return {}
+    embeddings = np.load(directorio / ARCHIVO_EMBEDDINGS)
+    return {h: embeddings[i] for i, h in enumerate(anterior["hashes"])}
+
+def guardar_indice(directorio, faiss_index, embeddings, chunks, metadatos, manifiesto):
+    """Escribe índice FAISS, embeddings, chunks, metadatos, índice BM25 y manifiesto (este el último)"""
+    directorio = Path(directorio)
+    escribir_atomico(directorio / ARCHIVO_INDICE, lambda p: faiss.write_index(faiss_index, str(p)))
+    escribir_atomico(directorio / ARCHIVO_EMBEDDINGS, lambda p: guardar_npy(p, embeddings))
+    escribir_atomico(directorio / ARCHIVO_CHUNKS,
+                     lambda p: Path(p).write_text(json.dumps(chunks, ensure_ascii=False), encoding='utf-8'))
+    escribir_atomico(directorio / ARCHIVO_METADATOS,
+                     lambda p: Path(p).write_text(json.dumps(metadatos, ensure_ascii=False), encoding='utf-8'))
+    guardar_bm25(directorio, IndiceBM25.construir(chunks))
+    # El manifiesto va el último: si existe, el resto de archivos está completo
+    escribir_atomico(directorio / ARCHIVO_MANIFIESTO,
+                     lambda p: Path(p).write_text(json.dumps(manifiesto, ensure_ascii=False, indent=2),
+                                                  encoding='utf-8'))
+
+def construir_indice(documento=DOCUMENT_PATH, directorio=INDEX_DIR, modelo=EMBEDDING_MODEL,
+                     chunk_size=CHUNK_SIZE, tipo="auto", almacenamiento="float32", chunker=CHUNKER):
+    """
+    Trocea el documento y guarda índice, chunks, embeddings y manifiesto en `directorio`.
+    Los embeddings de los chunks cuyo hash ya estaba en el manifiesto anterior (con el mismo
+    modelo) se reutilizan; solo se codifican los nuevos o modificados. Los índices que se
+    entrenan (IVF) se vuelven a entrenar con todos los vectores.
+
+    Returns:
+        dict: manifiesto escrito
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+
+    chunks, metadatos = trocear(documento, chunker, chunk_size, modelo)
+    hashes = [hash_texto(c) for c in chunks]
+
+    previos = embeddings_previos(directorio, modelo)
+    pendientes = [i for i, h in enumerate(hashes) if h not in previos]
+    nuevos = {}
+    if pendientes:
+        codificados = codificar([chunks[i] for i in pendientes], modelo)
+        nuevos = dict(zip(pendientes, codificados))
+
+    # Se normaliza también lo reutilizado: los índices anteriores guardaban vectores sin normalizar
+    embeddings = normalizar(np.stack([
+        nuevos[i] if i in nuevos else previos[h] for i, h in enumerate(hashes)
+    ]))
+    descripcion = descripcion_indice(tipo, *embeddings.shape, almacenamiento=almacenamiento)
+    faiss_index = crear_indice(embeddings, descripcion)
+
+    manifiesto = {
+        "documento": str(documento),
+        "hash_documento": hash_archivo(documento),
+        "modelo": modelo,
+        "chunker": chunker,
+        "chunk_size": chunk_size,
+        "dimension": int(embeddings.shape[1]),
+        "tipo_indice": tipo,
+        "almacenamiento": almacenamiento,
+        "metrica": METRICA,
+        "indice": descripcion,
+        "hashes": hashes,
+    }
+    guardar_indice(directorio, faiss_index, embeddings, chunks, metadatos, manifiesto)
+
+    print(f"🗂️  Índice {descripcion} en {directorio}: {len(chunks)} chunks, "
+          f"{len(pendientes)} codificados, {len(chunks) - len(pendientes)} reutilizados, "
+          f"{bytes_por_vector(faiss_index):.0f} bytes/vector")
+    return manifiesto
+
+# === Cargar el índice ===
+def leer_indice_faiss(path):
+    """Abre el índice con mmap (sin copiarlo a memoria); si esta versión de FAISS no lo admite, lo lee entero"""
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+def cargar_indice(directorio=INDEX_DIR, nprobe=NPROBE, ef_search=EF_SEARCH):
+    """
+    Returns:
+        tuple: (faiss_index, chunks, manifiesto)
+    """
+    directorio = Path(directorio)
+    manifiesto = leer_manifiesto(directorio)
+    if manifiesto is None:
+        raise FileNotFoundError(f"No hay índice en {directorio}; ejecuta python indice.py")
+    faiss_index = ajustar_busqueda(leer_indice_faiss(directorio / ARCHIVO_INDICE), nprobe, ef_search)
+    chunks = json.loads((directorio / ARCHIVO_CHUNKS).read_text(encoding='utf-8'))
+    return faiss_index, chunks, manifiesto
+
+def cargar_metadatos(directorio=INDEX_DIR):
+    """Sección y línea de origen de cada chunk (mismo orden que chunks.json)"""
+    path = Path(directorio) / ARCHIVO_METADATOS
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+def guardar_bm25(directorio, bm25):
+    def escribir(path):
+        with open(path, 'wb') as f:
+            bm25.guardar(f)
+    escribir_atomico(Path(directorio) / ARCHIVO_BM25, escribir)
+
+def cargar_bm25(directorio=INDEX_DIR):
+    """Índice BM25 de los chunks; los índices anteriores a BM25 lo construyen aquí una vez"""
+    path = Path(directorio) / ARCHIVO_BM25
+    if not path.exists():
+        chunks = json.loads((Path(directorio) / ARCHIVO_CHUNKS).read_text(encoding='utf-8'))
+        guardar_bm25(directorio, IndiceBM25.construir(chunks))
+    return IndiceBM25.cargar(path)
+
+def cargar_embeddings(directorio=INDEX_DIR):
+    """Embeddings float32 abiertos con mmap: solo se leen las filas que se reordenan"""
+    return np.load(Path(directorio) / ARCHIVO_EMBEDDINGS, mmap_mode='r')
+
+def indice_actualizado(documento=DOCUMENT_PATH, directorio=INDEX_DIR, modelo=EMBEDDING_MODEL,
+                       chunk_size=CHUNK_SIZE, tipo="auto", almacenamiento="float32", chunker=CHUNKER):
+    """True si el índice guardado corresponde al documento y configuración actuales"""
+    manifiesto = leer_manifiesto(directorio)
+    return bool(manifiesto) and (
+        manifiesto.get("hash_documento") == hash_archivo(documento)
+        and manifiesto["modelo"] == modelo
+        and manifiesto["chunk_size"] == chunk_size
+        and manifiesto.get("chunker", "html") == chunker
+        and manifiesto.get("tipo_indice", "auto") == tipo
+        and manifiesto.get("almacenamiento", "float32") == almacenamiento
+        and manifiesto.get("metrica") == METRICA
+    )
+
+def cargar_o_construir(documento=DOCUMENT_PATH, directorio=INDEX_DIR, modelo=EMBEDDING_MODEL,
+                       chunk_size=CHUNK_SIZE, tipo="auto", nprobe=NPROBE, ef_search=EF_SEARCH,
+                       almacenamiento="float32", chunker=CHUNKER):
+    """Carga el índice guardado, actualizándolo antes (incrementalmente) si el documento ha cambiado"""
+    if not indice_actualizado(documento, directorio, modelo, chunk_size, tipo, almacenamiento, chunker):
+        construir_indice(documento, directorio, modelo, chunk_size, tipo, almacenamiento, chunker)
+    return cargar_indice(directorio, nprobe, ef_search)
+
+# === Construcción desde línea de comandos ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye o actualiza el índice FAISS del RAG")
+    parser.add_argument("--documento", default=DOCUMENT_PATH)
+    parser.add_argument("--directorio", default=INDEX_DIR)
+    parser.add_argument("--modelo", default=EMBEDDING_MODEL)
+    parser.add_argument("--chunker", choices=CHUNKERS, default=CHUNKER)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Tokens por chunk (estructura) o caracteres (html)")
+    parser.add_argument("--tipo", choices=TIPOS_INDICE, default="auto",
+                        help="Tipo de índice (auto: según el número de chunks)")
+    parser.add_argument("--almacenamiento", choices=list(ALMACENAMIENTOS), default="float32",
+                        help="Codificación de los vectores en el índice")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    construir_indice(args.documento, args.directorio, args.modelo, args.chunk_size, args.tipo,
+                     args.almacenamiento, args.chunker)
+    print(f"⏱️  Construcción: {time.perf_counter() - inicio:.2f}s")
+
+    inicio = time.perf_counter()
+    cargar_indice(args.directorio)
+    print(f"⏱️  Carga: {1000 * (time.perf_counter() - inicio):.1f} ms")
@@ -0,0 +1,264 @@
+# examples/rag/ingesta_corpus.py
+"""
+Ingesta de un corpus de Markdown (varios documentos) en un único índice FAISS.
+
+Recorre un directorio buscando *.md, incluidas las carpetas de artefactos de
+process_document.py (de ellas se toma texto_final.md, con las descripciones de las
+imágenes, y no texto.md). El troceado se reparte en un pool de procesos y, según llegan
+los chunks, se codifican en bloques grandes (batch_size alto y, opcionalmente, varios
+procesos de encode de sentence-transformers) mientras el resto de documentos se sigue
+troceando.
+
+Cada vector lleva en metadatos.json su doc_id (posición en manifiesto["documentos"]),
+el documento, su offset (número de chunk dentro del documento), la sección y la línea.
+Como en indice.py, al reingerir se reutilizan los chunks de los documentos sin cambios
+y los embeddings de cualquier chunk ya codificado.
+
+Uso:
+    python ingesta_corpus.py --corpus ../../extractor-documentos-docling --directorio indice_corpus
+    python ingesta_corpus.py --corpus docs/ --procesos 8 --batch-size 512 --procesos-encode 4
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from indice import (ALMACENAMIENTOS, ARCHIVO_CHUNKS, CHUNK_SIZE, CHUNKER, CHUNKERS,
+                    EF_SEARCH, EMBEDDING_MODEL, METRICA, NPROBE, TIPOS_INDICE, bytes_por_vector,
+                    cargar_indice, cargar_metadatos, crear_indice, descripcion_indice, embeddings_previos,
+                    guardar_indice, hash_archivo, hash_texto, leer_manifiesto, modelo_embeddings,
+                    normalizar, trocear)
+
+# === Configuración ===
+CORPUS_DIR = "corpus"
+INDEX_DIR = "indice_corpus"
+PATRON = "*.md"
+# process_document.py deja ambos en la misma carpeta; texto_final.md sustituye a texto.md
+ARCHIVO_FINAL = "texto_final.md"
+ARCHIVO_ORIGINAL = "texto.md"
+PROCESOS = os.cpu_count() or 1
+# Batch del modelo de embeddings: en GPU, cuanto mayor mejor hasta llenar la memoria
+BATCH_SIZE = 256
+# Chunks acumulados antes de llamar a encode (varios batches por llamada)
+BLOQUE_CODIFICACION = 8192
+
+# === Documentos ===
+def listar_documentos(corpus, patron=PATRON):
+    """Markdown del corpus en orden estable, sin los texto.md que tienen un texto_final.md al lado"""
+    rutas = sorted(Path(corpus).rglob(patron))
+    con_final = {r.parent for r in rutas if r.name == ARCHIVO_FINAL}
+    return [r for r in rutas if not (r.name == ARCHIVO_ORIGINAL and r.parent in con_final)]
+
+def trocear_documento(tarea):
+    """Trabajador del pool: (ruta, chunker, chunk_size, modelo) -> (ruta, chunks, metadatos)"""
+    ruta, chunker, chunk_size, modelo = tarea
+    chunks, metadatos = trocear(ruta, chunker, chunk_size, modelo)
+    return ruta, chunks, metadatos
+
+def documentos_reutilizables(directorio, modelo, chunker, chunk_size):
+    """
+    Documentos de la ingesta anterior con la misma configuración de troceado.
+
+    Returns:
+        tuple: ({ruta: documento del manifiesto}, chunks anteriores, metadatos anteriores)
+    """
+    anterior = leer_manifiesto(directorio)
+    if not anterior or "documentos" not in anterior or (
+            anterior["modelo"], anterior["chunker"], anterior["chunk_size"]) != (modelo, chunker, chunk_size):
+        return {}, [], []
+    chunks = json.loads((Path(directorio) / ARCHIVO_CHUNKS).read_text(encoding='utf-8'))
+    metadatos = cargar_metadatos(directorio) or []
+    if len(metadatos) != len(chunks):
+        return {}, [], []
+    return {d["ruta"]: d for d in anterior["documentos"]}, chunks, metadatos
+
+# === Codificación ===
+def codificar_bloque(textos, modelo, batch_size, pool=None):
+    """Embeddings normalizados; con `pool` se reparten entre los procesos de sentence-transformers"""
+    modelo = modelo_embeddings(modelo)
+    if pool is not None:
+        return normalizar(modelo.encode_multi_process(textos, pool, batch_size=batch_size))
+    return normalizar(modelo.encode(textos, convert_to_numpy=True, batch_size=batch_size))
+
+# === Ingesta ===
+def ingerir_corpus(corpus=CORPUS_DIR, directorio=INDEX_DIR, modelo=EMBEDDING_MODEL, chunk_size=CHUNK_SIZE,
+                   tipo="auto", almacenamiento="float32", chunker=CHUNKER, procesos=PROCESOS,
+                   batch_size=BATCH_SIZE, procesos_encode=1, dispositivos=None):
+    """
+    Trocea y codifica todos los documentos del corpus y escribe un único índice en `directorio`.
+
+    Args:
+        procesos: procesos de troceado (1 = en el propio proceso)
+        procesos_encode: procesos de encode de sentence-transformers (1 = el modelo cargado aquí)
+        dispositivos: dispositivos de esos procesos, p. ej. ["cuda:0", "cuda:1"] (por defecto CPU)
+
+    Returns:
+        dict: manifiesto escrito
+    """
+    inicio = time.perf_counter()
+    corpus = Path(corpus)
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+
+    rutas = listar_documentos(corpus)
+    if not rutas:
+        raise FileNotFoundError(f"No hay archivos {PATRON} en {corpus}")
+    relativas = [r.relative_to(corpus).as_posix() for r in rutas]
+    hashes_documento = [hash_archivo(r) for r in rutas]
+
+    previos = embeddings_previos(directorio, modelo)
+    reutilizables, chunks_previos, metadatos_previos = documentos_reutilizables(directorio, modelo, chunker,
+                                                                                 chunk_size)
+    # Por documento: (chunks, metadatos del chunker)
+    troceados = {}
+    for relativa, h in zip(relativas, hashes_documento):
+        anterior = reutilizables.get(relativa)
+        if anterior and anterior["hash"] == h:
+            tramo = slice(anterior["inicio"], anterior["inicio"] + anterior["chunks"])
+            troceados[relativa] = (chunks_previos[tramo],
+                                   [{"seccion": m.get("seccion", []), "linea": m.get("linea")}
+                                    for m in metadatos_previos[tramo]])
+    tareas = [(str(r), chunker, chunk_size, modelo)
+              for r, relativa in zip(rutas, relativas) if relativa not in troceados]
+
+    # Chunks sin embedding previo, codificados por bloques según termina su documento
+    nuevos = {}
+    cola, en_cola = [], set()
+    tiempo_codificacion = 0.0
+    pool_encode = None
+    if procesos_encode > 1 or dispositivos:
+        pool_encode = modelo_embeddings(modelo).start_multi_process_pool(dispositivos or ["cpu"] * procesos_encode)
+
+    def vaciar_cola():
+        nonlocal cola, en_cola, tiempo_codificacion
+        if not cola:
+            return
+        inicio_bloque = time.perf_counter()
+        vectores = codificar_bloque(cola, modelo, batch_size, pool_encode)
+        nuevos.update(zip((hash_texto(t) for t in cola), vectores))
+        tiempo_codificacion += time.perf_counter() - inicio_bloque
+        cola, en_cola = [], set()
+
+    def encolar(chunks_documento):
+        for texto in chunks_documento:
+            h = hash_texto(texto)
+            if h not in previos and h not in nuevos and h not in en_cola:
+                cola.append(texto)
+                en_cola.add(h)
+        if len(cola) >= BLOQUE_CODIFICACION:
+            vaciar_cola()
+
+    try:
+        for relativa in relativas:
+            if relativa in troceados:
+                encolar(troceados[relativa][0])
+
+        # map() entrega los documentos en orden mientras los demás procesos siguen troceando
+        procesos = max(1, min(procesos, len(tareas)))
+        pool = ProcessPoolExecutor(procesos) if procesos > 1 else None
+        try:
+            resultados = pool.map(trocear_documento, tareas) if pool else map(trocear_documento, tareas)
+            for ruta, chunks_documento, metadatos_documento in resultados:
+                troceados[Path(ruta).relative_to(corpus).as_posix()] = (chunks_documento, metadatos_documento)
+                encolar(chunks_documento)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        vaciar_cola()
+    finally:
+        if pool_encode is not None:
+            modelo_embeddings(modelo).stop_multi_process_pool(pool_encode)
+    tiempo_troceado = time.perf_counter() - inicio - tiempo_codificacion
+
+    # Ensamblar en el orden de los documentos, con doc_id y offset por vector
+    chunks, metadatos, documentos = [], [], []
+    for doc_id, (relativa, h) in enumerate(zip(relativas, hashes_documento)):
+        chunks_documento, metadatos_documento = troceados[relativa]
+        documentos.append({"ruta": relativa, "hash": h, "inicio": len(chunks), "chunks": len(chunks_documento)})
+        for offset, meta in enumerate(metadatos_documento):
+            metadatos.append({"doc_id": doc_id, "documento": relativa, "offset": offset,
+                              "seccion": meta["seccion"], "linea": meta["linea"]})
+        chunks.extend(chunks_documento)
+    if not chunks:
+        raise ValueError(f"Los documentos de {corpus} no contienen texto")
+    hashes = [hash_texto(c) for c in chunks]
+
+    inicio_indice = time.perf_counter()
+    embeddings = normalizar(np.stack([nuevos[h] if h in nuevos else previos[h] for h in hashes]))
+    descripcion = descripcion_indice(tipo, *embeddings.shape, almacenamiento=almacenamiento)
+    faiss_index = crear_indice(embeddings, descripcion)
+    manifiesto = {
+        "corpus": str(corpus),
+        "documentos": documentos,
+        "modelo": modelo,
+        "chunker": chunker,
+        "chunk_size": chunk_size,
+        "dimension": int(embeddings.shape[1]),
+        "tipo_indice": tipo,
+        "almacenamiento": almacenamiento,
+        "metrica": METRICA,
+        "indice": descripcion,
+        "hashes": hashes,
+    }
+    guardar_indice(directorio, faiss_index, embeddings, chunks, metadatos, manifiesto)
+    tiempo_indice = time.perf_counter() - inicio_indice
+
+    total = time.perf_counter() - inicio
+    print(f"🗂️  Índice {descripcion} en {directorio}: {len(documentos)} documentos "
+          f"({len(tareas)} troceados), {len(chunks)} chunks, {len(nuevos)} codificados, "
+          f"{bytes_por_vector(faiss_index):.0f} bytes/vector")
+    print(f"📈 {len(chunks) / total:.0f} chunks/s en total ({total:.1f}s): troceado {tiempo_troceado:.1f}s, "
+          f"codificación {tiempo_codificacion:.1f}s ({len(nuevos) / max(tiempo_codificacion, 1e-9):.0f} chunks/s), "
+          f"índice {tiempo_indice:.1f}s")
+    return manifiesto
+
+# === Cargar el índice del corpus ===
+def corpus_actualizado(corpus=CORPUS_DIR, directorio=INDEX_DIR, modelo=EMBEDDING_MODEL, chunk_size=CHUNK_SIZE,
+                       tipo="auto", almacenamiento="float32", chunker=CHUNKER):
+    """True si el índice guardado corresponde a los documentos y configuración actuales"""
+    manifiesto = leer_manifiesto(directorio)
+    if not manifiesto or "documentos" not in manifiesto:
+        return False
+    rutas = listar_documentos(corpus)
+    actuales = [(r.relative_to(corpus).as_posix(), hash_archivo(r)) for r in rutas]
+    return (
+        [(d["ruta"], d["hash"]) for d in manifiesto["documentos"]] == actuales
+        and manifiesto["modelo"] == modelo
+        and manifiesto["chunk_size"] == chunk_size
+        and manifiesto["chunker"] == chunker
+        and manifiesto["tipo_indice"] == tipo
+        and manifiesto["almacenamiento"] == almacenamiento
+        and manifiesto.get("metrica") == METRICA
+    )
+
+def cargar_o_ingerir(corpus=CORPUS_DIR, directorio=INDEX_DIR, modelo=EMBEDDING_MODEL, chunk_size=CHUNK_SIZE,
+                     tipo="auto", nprobe=NPROBE, ef_search=EF_SEARCH, almacenamiento="float32", chunker=CHUNKER):
+    """Carga el índice del corpus, reingiriendo antes (incrementalmente) si algún documento ha cambiado"""
+    if not corpus_actualizado(corpus, directorio, modelo, chunk_size, tipo, almacenamiento, chunker):
+        ingerir_corpus(corpus, directorio, modelo, chunk_size, tipo, almacenamiento, chunker)
+    return cargar_indice(directorio, nprobe, ef_search)
+
+# === Ingesta desde línea de comandos ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta un directorio de Markdown en un índice FAISS")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Directorio con los .md (se recorre recursivamente)")
+    parser.add_argument("--directorio", default=INDEX_DIR)
+    parser.add_argument("--modelo", default=EMBEDDING_MODEL)
+    parser.add_argument("--chunker", choices=CHUNKERS, default=CHUNKER)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--tipo", choices=TIPOS_INDICE, default="auto")
+    parser.add_argument("--almacenamiento", choices=list(ALMACENAMIENTOS), default="float32")
+    parser.add_argument("--procesos", type=int, default=PROCESOS, help="Procesos de troceado")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Batch del modelo de embeddings")
+    parser.add_argument("--procesos-encode", type=int, default=1,
+                        help="Procesos de encode de sentence-transformers (útil con varias GPU o muchas CPU)")
+    parser.add_argument("--dispositivos", nargs="+", help="Dispositivos de esos procesos, p. ej. cuda:0 cuda:1")
+    args = parser.parse_args()
+
+    ingerir_corpus(args.corpus, args.directorio, args.modelo, args.chunk_size, args.tipo, args.almacenamiento,
+                   args.chunker, args.procesos, args.batch_size, args.procesos_encode, args.dispositivos)
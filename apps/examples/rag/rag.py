@@ -1,62 +1,95 @@
 # examples/rag/rag.py
 
-from sentence_transformers import SentenceTransformer
-from markdown import markdown
-from bs4 import BeautifulSoup
-from pathlib import Path
-import numpy as np
-import faiss
-import re
 import requests
 import os
 from dotenv import load_dotenv
+from bm25 import fusion_rrf
+from contexto import CUTOFF_LEN, MAX_NEW_TOKENS, construir_contexto
+from reranker import CANDIDATOS_RERANK, Reranker
+from indice import DOCUMENT_PATH, INDEX_DIR, EMBEDDING_MODEL, CHUNK_SIZE, CHUNKER, NPROBE, EF_SEARCH, CacheEmbeddings, buscar, cargar_bm25, cargar_embeddings, cargar_o_construir, necesita_rerank
 
 # === Cargar token desde .env ===
 load_dotenv()
 AUTH_TOKEN = os.getenv("AUTH_TOKEN")
 
 # === Configuración ===
-DOCUMENT_PATH = "documento.md"
 MODEL_API_URL = "http://35.233.84.123:8000/generate"
-CHUNK_SIZE = 200
 TOP_K = 3
-
-# === Cargar y chunkear el documento ===
-def load_and_chunk_markdown(path, chunk_size=CHUNK_SIZE):
-    text = Path(path).read_text(encoding='utf-8')
-    html = markdown(text)
-    soup = BeautifulSoup(html, 'html.parser')
-    plain_text = soup.get_text()
-    paragraphs = [p.strip() for p in re.split(r'\n+', plain_text) if p.strip()]
-    chunks = []
-    current = ""
-    for p in paragraphs:
-        if len(current) + len(p) < chunk_size:
-            current += " " + p
-        else:
-            chunks.append(current.strip())
-            current = p
-    if current:
-        chunks.append(current.strip())
-    return chunks
-
-# === Crear embeddings e indexar con FAISS ===
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-chunks = load_and_chunk_markdown(DOCUMENT_PATH)
-embeddings = embedding_model.encode(chunks, convert_to_numpy=True)
-dim = embeddings.shape[1]
-faiss_index = faiss.IndexFlatL2(dim)
-faiss_index.add(embeddings)
+# "auto" elige Flat / HNSW / IVF según el número de chunks; NPROBE y EF_SEARCH ajustan la búsqueda aproximada
+INDEX_TYPE = "auto"
+# float16 / int8 reducen a la mitad / a la cuarta parte la RAM del índice (con reordenación exacta en float32)
+INDEX_STORAGE = "float32"
+# Directorio de Markdown (python ingesta_corpus.py); None = solo DOCUMENT_PATH
+CORPUS_DIR = None
+CORPUS_INDEX_DIR = "indice_corpus"
+# "denso" (FAISS), "lexico" (BM25) o "hibrido" (ambos fusionados con RRF)
+MODOS_RECUPERACION = ("denso", "lexico", "hibrido")
+RETRIEVAL_MODE = "hibrido"
+# Candidatos que aporta cada buscador a la fusión
+CANDIDATOS_FUSION = 20
+# Tokens máximos del prompt completo: el adaptador se entrenó con cutoff_len 2048 y hay que dejar sitio a la respuesta
+CONTEXT_BUDGET = CUTOFF_LEN - MAX_NEW_TOKENS
+# Reordenar CANDIDATOS_RERANK candidatos con un cross-encoder (con presupuesto de latencia)
+RERANK = False
+
+# === Cargar el índice FAISS guardado (python indice.py / ingesta_corpus.py) ===
+# Solo se vuelve a codificar si el documento (o el corpus) ha cambiado, y únicamente los chunks modificados
+if CORPUS_DIR:
+    from ingesta_corpus import cargar_o_ingerir
+    INDEX_DIR = CORPUS_INDEX_DIR
+    faiss_index, chunks, manifiesto = cargar_o_ingerir(CORPUS_DIR, INDEX_DIR, EMBEDDING_MODEL, CHUNK_SIZE,
+                                                       INDEX_TYPE, NPROBE, EF_SEARCH, INDEX_STORAGE, CHUNKER)
+else:
+    faiss_index, chunks, manifiesto = cargar_o_construir(DOCUMENT_PATH, INDEX_DIR, EMBEDDING_MODEL, CHUNK_SIZE,
+                                                         INDEX_TYPE, NPROBE, EF_SEARCH, INDEX_STORAGE, CHUNKER)
+embeddings = cargar_embeddings(INDEX_DIR) if necesita_rerank(manifiesto["indice"]) else None
+bm25 = cargar_bm25(INDEX_DIR)
+reranker = Reranker() if RERANK else None
+# Embeddings de las consultas ya vistas (las preguntas de evaluación se repiten entre ejecuciones)
+cache_embeddings = CacheEmbeddings(EMBEDDING_MODEL)
+
+# === Búsqueda densa + léxica ===
+def hybrid_search(queries, top_k=TOP_K, mode=RETRIEVAL_MODE, vectors=None):
+    """
+    Ids de los chunks más relevantes para cada consulta. Las consultas densas se codifican y
+    buscan en FAISS en una sola llamada (o se usan `vectors` si ya están codificadas); en modo
+    híbrido cada buscador aporta CANDIDATOS_FUSION candidatos y se fusionan con RRF.
+    """
+    if mode not in MODOS_RECUPERACION:
+        raise ValueError(f"Modo de recuperación desconocido: {mode} (opciones: {', '.join(MODOS_RECUPERACION)})")
+    candidatos = top_k if mode == "denso" else max(top_k, CANDIDATOS_FUSION)
+
+    if mode != "lexico":
+        if vectors is None:
+            vectors = cache_embeddings.codificar(queries)
+        _, indices = buscar(faiss_index, vectors, candidatos, embeddings)
+        # Los índices aproximados devuelven -1 si no encuentran suficientes vecinos
+        densos = [[int(i) for i in fila if i >= 0] for fila in indices]
+        if mode == "denso":
+            return densos
+    lexicos = [bm25.buscar(query, candidatos)[1].tolist() for query in queries]
+    if mode == "lexico":
+        return [fila[:top_k] for fila in lexicos]
+    return [fusion_rrf([d, l], top_k) for d, l in zip(densos, lexicos)]
 
 # === Recuperar chunks relevantes ===
+def retrieve_ids(queries, top_k=TOP_K, vectors=None):
+    """Búsqueda híbrida y, si RERANK, reordenación con el cross-encoder de los candidatos"""
+    if reranker is None:
+        return hybrid_search(queries, top_k, vectors=vectors)
+    candidatos = hybrid_search(queries, max(top_k, CANDIDATOS_RERANK), vectors=vectors)
+    return [reranker.reordenar(query, ids, [chunks[i] for i in ids], top_k)
+            for query, ids in zip(queries, candidatos)]
+
+def retrieve_many(queries, top_k=TOP_K):
+    """Chunks relevantes de varias consultas: un solo encode y una sola búsqueda en FAISS"""
+    return [[chunks[i] for i in ids] for ids in retrieve_ids(queries, top_k)]
+
 def retrieve_relevant_chunks(query, top_k=TOP_K):
-    query_vec = embedding_model.encode([query])
-    distances, indices = faiss_index.search(query_vec, top_k)
-    return [chunks[i] for i in indices[0]]
+    return retrieve_many([query], top_k)[0]
 
-# === Enviar al modelo vía API ===
-def ask_rag(query):
-    relevant_chunks = retrieve_relevant_chunks(query)
+# === Construir el prompt RAG ===
+def build_prompt(query, relevant_chunks):
     context = "\n\n".join(relevant_chunks)
 
     prompt = f"""
@@ -70,6 +103,24 @@ Contesta la siguiente pregunta utilizando el contexto del documento y tu conocim
 
 ### Respuesta:
 """
+    return prompt.strip()
+
+def build_budgeted_prompt(query, relevant_chunks, budget=CONTEXT_BUDGET):
+    """
+    Prompt con los chunks (por relevancia) que caben en `budget` tokens del modelo generador,
+    sin frases repetidas y recortando por frases el último.
+
+    Returns:
+        tuple: (prompt, estadísticas: tokens_prompt, tokens_contexto, incluidos, recortados, ...)
+    """
+    contexto = construir_contexto(relevant_chunks, lambda c: build_prompt(query, c), budget)
+    return build_prompt(query, contexto.pop("chunks")), contexto
+
+# === Enviar al modelo vía API ===
+def ask_rag(query):
+    prompt, contexto = build_budgeted_prompt(query, retrieve_relevant_chunks(query))
+    print(f"🧮 Prompt de {contexto['tokens_prompt']} tokens ({contexto['incluidos']} chunks, "
+          f"{contexto['tokens_contexto']} de contexto)")
 
     headers = {
         "Authorization": f"Bearer {AUTH_TOKEN}",
@@ -77,14 +128,14 @@ Contesta la siguiente pregunta utilizando el contexto del documento y tu conocim
     }
 
     data = {
-        "instruction": prompt.strip()
+        "instruction": prompt
     }
 
     response = requests.post(MODEL_API_URL, headers=headers, json=data)
 
     try:
         response.raise_for_status()
-        return response.json()
+        return dict(response.json(), contexto=contexto)
     except requests.exceptions.HTTPError:
         print(f"❌ Error {response.status_code} - {response.text}")
         return {"error": response.json()}
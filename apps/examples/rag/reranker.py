@@ -0,0 +1,140 @@
+# examples/rag/reranker.py
+"""
+Reordenación de candidatos con un cross-encoder, con presupuesto de latencia.
+
+La búsqueda (densa o híbrida) devuelve muchos candidatos, por ejemplo 50. El cross-encoder
+puntúa cada par (pregunta, chunk) leyendo ambos textos a la vez, y eso es bastante más
+preciso que comparar embeddings. Así bastan 3 chunks buenos en el prompt, con un contexto
+más corto y menos tokens generados.
+
+Los pares se puntúan por lotes, empezando por los mejores candidatos de la búsqueda. El
+modelo se carga al crear el Reranker, no en la primera consulta, y se mide con un lote de
+calentamiento de chunks de tamaño real. Cada lote, también el primero, se recorta a los
+pares que caben en lo que queda de presupuesto según el tiempo medio por par observado; si
+no cabe ninguno, se para. Los candidatos puntuados se ordenan por el cross-encoder y detrás
+van los que no dio tiempo a puntuar, en el orden de la búsqueda. Las puntuaciones se cachean
+por (hash de la pregunta, id del chunk), así que las preguntas repetidas no vuelven a pasar
+por el modelo. Los ids son posiciones en chunks.json: el Reranker vive junto al índice cargado.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import threading
+import time
+
+from bm25 import normalizar_termino
+from chunker import MAX_TOKENS
+
+# === Configuración ===
+# Cross-encoder pequeño y multilingüe (los de MS MARCO en inglés puntúan peor en español)
+RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+CANDIDATOS_RERANK = 50
+BATCH_RERANK = 16
+PRESUPUESTO_MS = 200
+MAX_ENTRADAS_CACHE = 50_000
+
+# Peso de cada lote nuevo en la media móvil del tiempo por par
+SUAVIZADO_TIEMPO = 0.2
+# Par de calentamiento con un chunk de unos MAX_TOKENS tokens: el coste depende de la longitud
+PREGUNTA_CALENTAMIENTO = "¿Cómo dirige la mirada del mago la atención del público?"
+CHUNK_CALENTAMIENTO = " ".join(["La mirada del mago dirige la atención del público hacia la mano vacía."]
+                               * (MAX_TOKENS // 12 + 1))
+
+@lru_cache(maxsize=None)
+def modelo_reranker(nombre=RERANK_MODEL):
+    """Carga del cross-encoder (una vez por proceso)"""
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(nombre)
+
+def hash_consulta(consulta):
+    """Hash de la pregunta normalizada (minúsculas, sin tildes ni espacios sobrantes)"""
+    return hashlib.sha256(" ".join(normalizar_termino(consulta).split()).encode('utf-8')).hexdigest()
+
+class Reranker:
+    """Cross-encoder con caché LRU de puntuaciones y vuelta al orden de la búsqueda si se agota el tiempo"""
+
+    def __init__(self, modelo=RERANK_MODEL, batch_size=BATCH_RERANK, presupuesto_ms=PRESUPUESTO_MS,
+                 max_entradas=MAX_ENTRADAS_CACHE):
+        self.modelo = modelo
+        self.batch_size = batch_size
+        self.presupuesto_ms = presupuesto_ms
+        self.max_entradas = max_entradas
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Carga y calentamiento fuera de las consultas: el primer lote medido fija la estimación
+        self.cross_encoder = modelo_reranker(modelo)
+        inicio = time.perf_counter()
+        self.cross_encoder.predict([(PREGUNTA_CALENTAMIENTO, CHUNK_CALENTAMIENTO)] * batch_size,
+                                   batch_size=batch_size, show_progress_bar=False)
+        self.segundos_por_par = (time.perf_counter() - inicio) / batch_size
+
+        # Métricas
+        self.consultas = 0
+        self.fuera_de_presupuesto = 0
+        self.aciertos_cache = 0
+        self.pares_puntuados = 0
+
+    def reordenar(self, consulta, ids, textos, k):
+        """
+        Args:
+            ids: ids de los candidatos en el orden de la búsqueda
+            textos: texto de cada candidato
+
+        Returns:
+            list: los k mejores ids; si no hubo tiempo para todos, los puntuados ordenados por el
+                cross-encoder seguidos de los demás en el orden de la búsqueda
+        """
+        inicio = time.perf_counter()
+        limite = inicio + self.presupuesto_ms / 1000
+        clave = hash_consulta(consulta)
+
+        puntuaciones = {}
+        with self.lock:
+            self.consultas += 1
+            for i in ids:
+                if (clave, i) in self.cache:
+                    self.cache.move_to_end((clave, i))
+                    puntuaciones[i] = self.cache[clave, i]
+            self.aciertos_cache += len(puntuaciones)
+        pendientes = [(i, texto) for i, texto in zip(ids, textos) if i not in puntuaciones]
+
+        desde = 0
+        while desde < len(pendientes):
+            # Solo los pares que caben en lo que queda de presupuesto (también en el primer lote)
+            caben = int((limite - time.perf_counter()) / self.segundos_por_par)
+            if caben < 1:
+                with self.lock:
+                    self.fuera_de_presupuesto += 1
+                break
+            lote = pendientes[desde:desde + min(self.batch_size, caben)]
+            desde += len(lote)
+            inicio_lote = time.perf_counter()
+            resultado = self.cross_encoder.predict([(consulta, texto) for _, texto in lote],
+                                                   batch_size=self.batch_size, show_progress_bar=False)
+            por_par = (time.perf_counter() - inicio_lote) / len(lote)
+            nuevas = {i: float(p) for (i, _), p in zip(lote, resultado)}
+            puntuaciones.update(nuevas)
+            # Lo puntuado se cachea aunque luego se agote el presupuesto
+            with self.lock:
+                self.segundos_por_par += SUAVIZADO_TIEMPO * (por_par - self.segundos_por_par)
+                self.pares_puntuados += len(nuevas)
+                for i, p in nuevas.items():
+                    self.cache[clave, i] = p
+                while len(self.cache) > self.max_entradas:
+                    self.cache.popitem(last=False)
+
+        puntuados = sorted((i for i in ids if i in puntuaciones), key=puntuaciones.get, reverse=True)
+        return (puntuados + [i for i in ids if i not in puntuaciones])[:k]
+
+    def metricas(self):
+        with self.lock:
+            return {
+                'entradas_cache': len(self.cache),
+                'consultas': self.consultas,
+                'fuera_de_presupuesto': self.fuera_de_presupuesto,
+                'aciertos_cache': self.aciertos_cache,
+                'pares_puntuados': self.pares_puntuados,
+                'ms_por_par': round(1000 * self.segundos_por_par, 2),
+            }
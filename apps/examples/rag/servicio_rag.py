@@ -0,0 +1,244 @@
+# examples/rag/servicio_rag.py
+"""
+Servicio HTTP asíncrono del RAG.
+
+El índice, el BM25 y el modelo de embeddings se cargan una vez al arrancar (al importar rag.py),
+en lugar de en cada script que importa el módulo.
+
+    POST /retrieve  {"pregunta": "...", "top_k": 3}  ->  {"chunks": [...], "tiempos_ms": {...}}
+    POST /ask       {"pregunta": "...", "top_k": 3}  ->  {"respuesta": "...", "tokens_prompt": N, "tiempos_ms": {...}}
+    GET  /metrics   ->  latencia p50 / p95 / p99 por etapa (embed, search, contexto, generate)
+
+Las preguntas que llegan a la vez se agrupan (micro-batching): se espera hasta ESPERA_MS o
+hasta MAX_LOTE preguntas y se codifican con un único encode y una única búsqueda en FAISS.
+Las llamadas a /generate usan una sesión aiohttp compartida (keep-alive, límite de
+conexiones, timeout y reintentos con backoff de evaluar_rag.py).
+
+Uso:
+    python servicio_rag.py --port 8002 --url http://localhost:8000/generate
+    curl -X POST localhost:8002/ask -H 'Content-Type: application/json' -d '{"pregunta": "¿Qué es el misdirection?"}'
+"""
+
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import threading
+import time
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from evaluar_rag import CONCURRENCIA, REINTENTOS, TIMEOUT, generar
+from rag import AUTH_TOKEN, MODEL_API_URL, TOP_K, build_budgeted_prompt, cache_embeddings, chunks, retrieve_ids
+
+# === Configuración ===
+MAX_LOTE = 32
+ESPERA_MS = 5
+MAX_TOP_K = 50
+# Muestras por etapa con las que se calculan los percentiles de /metrics
+VENTANA_METRICAS = 2000
+
+# El modelo de embeddings, FAISS y los tokenizers se usan desde un único hilo: las peticiones
+# concurrentes se agrupan en vez de competir por la CPU / GPU
+ejecutor = ThreadPoolExecutor(max_workers=1)
+
+# === Métricas por etapa ===
+class MetricasEtapas:
+    """Se registra desde el hilo del ejecutor y se resume desde el bucle de eventos (con lock)"""
+
+    def __init__(self, ventana=VENTANA_METRICAS):
+        self.muestras = defaultdict(lambda: deque(maxlen=ventana))
+        self.totales = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def registrar(self, etapa, ms):
+        with self.lock:
+            self.muestras[etapa].append(ms)
+            self.totales[etapa] += 1
+
+    def resumen(self):
+        # Copia bajo el lock; los percentiles se calculan fuera para no bloquear el registro
+        with self.lock:
+            copia = {etapa: (self.totales[etapa], list(muestras)) for etapa, muestras in self.muestras.items()}
+        return {
+            etapa: {
+                'llamadas': llamadas,
+                'p50_ms': round(float(np.percentile(muestras, 50)), 2),
+                'p95_ms': round(float(np.percentile(muestras, 95)), 2),
+                'p99_ms': round(float(np.percentile(muestras, 99)), 2),
+            }
+            for etapa, (llamadas, muestras) in copia.items() if muestras
+        }
+
+# === Micro-batching de consultas ===
+class BatcherConsultas:
+    """Agrupa las preguntas concurrentes y las recupera con un encode y una búsqueda por lote"""
+
+    def __init__(self, metricas, max_lote=MAX_LOTE, espera_ms=ESPERA_MS):
+        self.metricas = metricas
+        self.max_lote = max_lote
+        self.espera_ms = espera_ms
+        self.cola = asyncio.Queue()
+        self.tamanos_lote = deque(maxlen=VENTANA_METRICAS)
+
+    async def recuperar(self, pregunta, top_k):
+        """
+        Returns:
+            tuple: (ids de los chunks, tiempos_ms {"embed", "search"} del lote)
+        """
+        futuro = asyncio.get_running_loop().create_future()
+        await self.cola.put((pregunta, top_k, futuro))
+        return await futuro
+
+    async def bucle(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self.cola.get()]
+            limite = loop.time() + self.espera_ms / 1000
+            while len(lote) < self.max_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self.cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            self.tamanos_lote.append(len(lote))
+            try:
+                resultados = await loop.run_in_executor(ejecutor, self.procesar, lote)
+            except Exception as e:
+                for _, _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            for (_, _, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+    def procesar(self, lote):
+        """Codifica todas las preguntas del lote y busca por grupos de top_k (en el hilo del ejecutor)"""
+        preguntas = [pregunta for pregunta, _, _ in lote]
+        inicio = time.perf_counter()
+        vectores = cache_embeddings.codificar(preguntas)
+        ms_embed = 1000 * (time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        ids = [None] * len(lote)
+        grupos = defaultdict(list)
+        for posicion, (_, top_k, _) in enumerate(lote):
+            grupos[top_k].append(posicion)
+        for top_k, posiciones in grupos.items():
+            encontrados = retrieve_ids([preguntas[p] for p in posiciones], top_k, vectores[posiciones])
+            for p, fila in zip(posiciones, encontrados):
+                ids[p] = fila
+        ms_search = 1000 * (time.perf_counter() - inicio)
+
+        self.metricas.registrar("embed", ms_embed)
+        self.metricas.registrar("search", ms_search)
+        tiempos = {"embed": round(ms_embed, 2), "search": round(ms_search, 2), "lote": len(lote)}
+        return [(fila, tiempos) for fila in ids]
+
+# === Aplicación ===
+def crear_app(url=MODEL_API_URL, concurrencia=CONCURRENCIA, reintentos=REINTENTOS, max_lote=MAX_LOTE,
+              espera_ms=ESPERA_MS):
+    metricas = MetricasEtapas()
+    batcher = BatcherConsultas(metricas, max_lote, espera_ms)
+    app = web.Application()
+
+    async def arrancar(app):
+        # Sesión compartida: las conexiones al servidor del modelo se reutilizan (keep-alive)
+        app["session"] = aiohttp.ClientSession(
+            headers={"Authorization": f"Bearer {AUTH_TOKEN}"},
+            connector=aiohttp.TCPConnector(limit=concurrencia, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=TIMEOUT),
+        )
+        app["semaforo"] = asyncio.Semaphore(concurrencia)
+        app["batcher"] = asyncio.create_task(batcher.bucle())
+
+    async def cerrar(app):
+        app["batcher"].cancel()
+        await app["session"].close()
+
+    async def leer_pregunta(request):
+        """
+        Returns:
+            tuple: (pregunta, top_k, None) o (None, None, respuesta de error)
+        """
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return None, None, web.json_response({"error": "El cuerpo debe ser un objeto JSON"}, status=400)
+        pregunta = str(data.get("pregunta", "")).strip()
+        if not pregunta:
+            return None, None, web.json_response({"error": "Falta el parámetro pregunta"}, status=400)
+        try:
+            top_k = int(data.get("top_k", TOP_K))
+        except (TypeError, ValueError):
+            return None, None, web.json_response({"error": "top_k debe ser un entero"}, status=400)
+        return pregunta, max(1, min(top_k, MAX_TOP_K)), None
+
+    async def retrieve(request):
+        pregunta, top_k, error = await leer_pregunta(request)
+        if error:
+            return error
+        ids, tiempos = await batcher.recuperar(pregunta, top_k)
+        return web.json_response({"chunks": [chunks[i] for i in ids], "ids": ids, "tiempos_ms": tiempos})
+
+    async def ask(request):
+        pregunta, top_k, error = await leer_pregunta(request)
+        if error:
+            return error
+        ids, tiempos = await batcher.recuperar(pregunta, top_k)
+        tiempos = dict(tiempos)
+
+        inicio = time.perf_counter()
+        prompt, contexto = await asyncio.get_running_loop().run_in_executor(
+            ejecutor, build_budgeted_prompt, pregunta, [chunks[i] for i in ids])
+        tiempos["contexto"] = round(1000 * (time.perf_counter() - inicio), 2)
+        metricas.registrar("contexto", tiempos["contexto"])
+
+        inicio = time.perf_counter()
+        resultado = await generar(app["session"], app["semaforo"], url, prompt, reintentos)
+        tiempos["generate"] = round(1000 * (time.perf_counter() - inicio), 2)
+        metricas.registrar("generate", tiempos["generate"])
+
+        if "error" in resultado:
+            return web.json_response(dict(resultado, tiempos_ms=tiempos), status=502)
+        return web.json_response(dict(resultado, ids=ids, tokens_prompt=contexto["tokens_prompt"],
+                                      tiempos_ms=tiempos))
+
+    async def metrics(request):
+        lotes = batcher.tamanos_lote
+        return web.json_response({
+            "etapas": metricas.resumen(),
+            "lote_medio": round(sum(lotes) / len(lotes), 2) if lotes else None,
+            "cola": batcher.cola.qsize(),
+            "cache_embeddings": cache_embeddings.metricas(),
+        })
+
+    app.on_startup.append(arrancar)
+    app.on_cleanup.append(cerrar)
+    app.router.add_post("/retrieve", retrieve)
+    app.router.add_post("/ask", ask)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP del RAG (/retrieve, /ask, /metrics)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--url", default=MODEL_API_URL, help="Endpoint /generate del servidor del modelo")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA,
+                        help="Peticiones simultáneas máximas a /generate")
+    parser.add_argument("--reintentos", type=int, default=REINTENTOS)
+    parser.add_argument("--max-lote", type=int, default=MAX_LOTE, help="Preguntas máximas por lote de embeddings")
+    parser.add_argument("--espera-ms", type=float, default=ESPERA_MS,
+                        help="Espera máxima para completar un lote de embeddings")
+    args = parser.parse_args()
+    web.run_app(crear_app(args.url, args.concurrencia, args.reintentos, args.max_lote, args.espera_ms),
+                host=args.host, port=args.port)
@@ -0,0 +1,60 @@
+# examples/rag/stub_modelo.py
+"""
+Servidor falso con el contrato de /generate (scripts/server.py) para probar el RAG
+sin GPU: espera una latencia configurable y devuelve un eco de la pregunta.
+
+Uso:
+    python stub_modelo.py --port 8001 --latencia-ms 200 --tasa-error 0.1
+    python evaluar_rag.py --preguntas preguntas.txt --url http://localhost:8001/generate
+"""
+
+import argparse
+import asyncio
+import os
+import random
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+AUTH_TOKEN = os.getenv("AUTH_TOKEN", "123")
+
+def crear_app(latencia_ms=200, tasa_error=0.0):
+    estado = {"peticiones": 0, "en_curso": 0, "max_en_curso": 0}
+
+    async def generate(request):
+        if request.headers.get("Authorization") != f"Bearer {AUTH_TOKEN}":
+            return web.json_response({"error": "Token de autenticación inválido"}, status=401)
+        data = await request.json()
+        if not str(data.get("instruction", "")).strip():
+            return web.json_response({"error": "Falta el parámetro instruction"}, status=400)
+
+        estado["peticiones"] += 1
+        estado["en_curso"] += 1
+        estado["max_en_curso"] = max(estado["max_en_curso"], estado["en_curso"])
+        try:
+            await asyncio.sleep(latencia_ms / 1000 * random.uniform(0.5, 1.5))
+            # Errores transitorios para ejercitar los reintentos del cliente
+            if random.random() < tasa_error:
+                return web.json_response({"error": "Error simulado"}, status=503)
+            pregunta = data["instruction"].split("### Pregunta:")[-1].split("### Respuesta:")[0].strip()
+            return web.json_response({"respuesta": f"[stub] {pregunta}", "tokens_generados": 0})
+        finally:
+            estado["en_curso"] -= 1
+
+    async def metrics(request):
+        return web.json_response(estado)
+
+    app = web.Application()
+    app.router.add_post("/generate", generate)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub del servidor del modelo para pruebas del RAG")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latencia-ms", type=float, default=200)
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(crear_app(args.latencia_ms, args.tasa_error), host=args.host, port=args.port)
@@ -0,0 +1,106 @@
+# examples/rag/test_evaluar_stub.py
+"""
+Ejecuta evaluar_rag contra stub_modelo (levantado en este mismo proceso, en un puerto libre)
+y comprueba los resultados: una respuesta por pregunta en el orden de entrada, los reintentos
+ante los errores simulados del stub, el JSONL incremental y el límite de concurrencia.
+
+La recuperación y el prompt son falsos y deterministas: no se importa rag.py, así que no se
+carga ni se escribe el índice, no se descargan modelos y no depende del directorio actual.
+
+Uso:
+    python test_evaluar_stub.py
+    python -m pytest test_evaluar_stub.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+
+import aiohttp
+from aiohttp import web
+
+# El cliente (evaluar_rag.py) y el stub leen el mismo token: sin AUTH_TOKEN en el entorno, el del stub
+os.environ.setdefault("AUTH_TOKEN", "123")
+
+from evaluar_rag import evaluar  # noqa: E402
+from stub_modelo import AUTH_TOKEN, crear_app  # noqa: E402
+
+PREGUNTAS = [
+    "¿Cuál es la función de la mirada antes del pase secreto en una técnica mágica?",
+    "¿Por qué se considera efectiva la técnica de “no mirar” durante una técnica oculta?",
+    "Explica el papel de la “idea obnubilante” en el desvío de atención.",
+    "¿Qué efecto tiene en los espectadores el cambio súbito de mirada en una actuación?",
+    "¿Cómo se combinan la mirada y las palabras para reforzar el misdirection durante una técnica?",
+] * 4
+CONCURRENCIA = 4
+# Con errores simulados del 20 % y 5 reintentos, que una pregunta falle es prácticamente imposible
+TASA_ERROR = 0.2
+REINTENTOS = 5
+TOP_K = 3
+TOKENS_PROMPT = 100
+
+def recuperar_falso(preguntas, top_k):
+    return [[f"chunk {n} de la pregunta {i}" for n in range(top_k)] for i in range(len(preguntas))]
+
+def prompt_falso(pregunta, contexto):
+    """Mismo formato que build_prompt (el stub devuelve lo que hay tras "### Pregunta:")"""
+    prompt = "### Contexto:\n" + "\n\n".join(contexto) + f"\n\n### Pregunta:\n{pregunta}\n\n### Respuesta:"
+    return prompt, {"tokens_prompt": TOKENS_PROMPT}
+
+async def evaluar_contra_stub(salida_jsonl):
+    """
+    Returns:
+        tuple: (resultados de evaluar, métricas del stub)
+    """
+    runner = web.AppRunner(crear_app(latencia_ms=20, tasa_error=TASA_ERROR))
+    await runner.setup()
+    # Puerto libre elegido por el sistema
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    puerto = sock.getsockname()[1]
+    await web.SockSite(runner, sock).start()
+    try:
+        resultados = await evaluar(PREGUNTAS, f"http://127.0.0.1:{puerto}/generate", salida_jsonl,
+                                   concurrencia=CONCURRENCIA, reintentos=REINTENTOS, top_k=TOP_K,
+                                   recuperar=recuperar_falso, construir_prompt=prompt_falso)
+        async with aiohttp.ClientSession(headers={"Authorization": f"Bearer {AUTH_TOKEN}"}) as session:
+            async with session.get(f"http://127.0.0.1:{puerto}/metrics") as response:
+                metricas = await response.json()
+    finally:
+        await runner.cleanup()
+    return resultados, metricas
+
+def test_evaluar_contra_stub():
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directorio:
+        salida_jsonl = os.path.join(directorio, "resultados.jsonl")
+        resultados, metricas = asyncio.run(evaluar_contra_stub(salida_jsonl))
+        with open(salida_jsonl, encoding="utf-8") as f:
+            lineas = [json.loads(linea) for linea in f]
+
+    # Una respuesta por pregunta, en el orden de entrada: el stub devuelve el eco de la pregunta
+    assert len(resultados) == len(PREGUNTAS)
+    for pregunta, resultado in zip(PREGUNTAS, resultados):
+        assert "error" not in resultado, resultado
+        assert resultado["pregunta"] == pregunta
+        assert resultado["respuesta"] == f"[stub] {pregunta}"
+        assert resultado["tokens_prompt"] == TOKENS_PROMPT
+    # Hermético: ni índice ni modelos
+    assert "rag" not in sys.modules
+
+    # El JSONL se escribe según llegan los resultados, con el índice de cada pregunta
+    assert sorted(linea["indice"] for linea in lineas) == list(range(len(PREGUNTAS)))
+    for linea in lineas:
+        assert linea["respuesta"] == resultados[linea["indice"]]["respuesta"]
+
+    # Los errores simulados se reintentan sin pasar del límite de concurrencia
+    assert metricas["peticiones"] >= len(PREGUNTAS)
+    assert metricas["max_en_curso"] <= CONCURRENCIA
+    print(f"✅ {len(PREGUNTAS)} preguntas evaluadas contra el stub ({metricas})")
+
+if __name__ == "__main__":
+    test_evaluar_contra_stub()
@@ -1,7 +1,6 @@
-import os
-import requests
-from dotenv import load_dotenv
-from rag import retrieve_relevant_chunks, MODEL_API_URL, AUTH_TOKEN
+import asyncio
+import json
+from evaluar_rag import evaluar
 
 # === Preguntas de validación ===
 questions = [
@@ -12,48 +11,18 @@ questions = [
     "¿Cómo se combinan la mirada y las palabras para reforzar el misdirection durante una técnica?"
 ]
 
-# === Cargar token desde .env ===
-load_dotenv()
-
-# === Headers para la API ===
-headers = {
-    "Authorization": f"Bearer {AUTH_TOKEN}",
-    "Content-Type": "application/json"
-}
-
 # === Ejecutar preguntas ===
-results = []
-
-for i, query in enumerate(questions, 1):
-    chunks = retrieve_relevant_chunks(query)
-    context = "\n\n".join(chunks)
-
-    prompt = f"""
-Contesta la siguiente pregunta utilizando el contexto del documento y tu conocimiento especializado.
+# Recuperación en una sola búsqueda y peticiones concurrentes (ver evaluar_rag.py)
+results = asyncio.run(evaluar(questions))
 
-### Contexto:
-{context}
-
-### Pregunta:
-{query}
-
-### Respuesta:
-"""
-
-    data = {"instruction": prompt.strip()}
-    print(f"\n🔹 Pregunta {i}: {query}")
-    response = requests.post(MODEL_API_URL, headers=headers, json=data)
-
-    if response.status_code == 200:
-        content = response.json().get("respuesta", response.json())
-        print(f"✅ Respuesta: {content}\n")
-        results.append({"pregunta": query, "respuesta": content})
+for i, result in enumerate(results, 1):
+    print(f"\n🔹 Pregunta {i}: {result['pregunta']}")
+    if "respuesta" in result:
+        print(f"✅ Respuesta: {result['respuesta']}\n")
     else:
-        print(f"❌ Error {response.status_code}: {response.text}")
-        results.append({"pregunta": query, "error": response.text})
+        print(f"❌ Error {result['error']}")
 
 # === Guardar resultados (opcional)
-import json
 with open("rag_resultados.json", "w", encoding="utf-8") as f:
     json.dump(results, f, ensure_ascii=False, indent=2)
 
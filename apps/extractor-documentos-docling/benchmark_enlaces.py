@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la reescritura de enlaces de imágenes sobre un markdown sintético.
+
+Compara la implementación anterior (un patrón tras otro, el documento entero reconstruido por
+cada enlace y la descripción leída del disco en cada coincidencia) con la actual (una sola
+alternancia, descripciones precargadas y un único re.sub). La anterior es cuadrática, así que
+se mide sobre un prefijo más pequeño del mismo documento (--mb-anterior).
+
+Uso:
+    python benchmark_enlaces.py                            # 50 MB, un enlace cada 10 KB
+    python benchmark_enlaces.py --mb 50 --imagenes 2000 --cada-kb 5 --mb-anterior 2
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+from process_document import corregir_enlaces, insertar_descripciones
+
+PALABRAS = ("la mirada del mago dirige la atención del público hacia la mano que no esconde nada "
+            "mientras la otra realiza el pase secreto con naturalidad y sin prisa").split()
+# Formatos de enlace que reconoce insertar_descripciones
+FORMATOS = (
+    "![Figura {n}](imagenes_extraidas/image{n}.png)",
+    "[ver figura](imagenes_extraidas/image{n}.png)",
+    '<img src="imagenes_extraidas/image{n}.png" alt="Imagen {n}">',
+    "(véase image{n}.png)",
+)
+# Enlace tal como lo deja docling, con una ruta temporal
+FORMATOS_DOCLING = ("![Image](/tmp/docling/picture_{n}.png)",)
+
+def generar_markdown(mb, imagenes, cada_kb, formatos=FORMATOS, semilla=0):
+    """Párrafos de texto con un enlace a una imagen aleatoria cada cada_kb KB aproximadamente"""
+    aleatorio = random.Random(semilla)
+    partes, tamano, siguiente_enlace = [], 0, cada_kb * 1024
+    while tamano < mb * 1024 * 1024:
+        parrafo = " ".join(aleatorio.choice(PALABRAS) for _ in range(80)) + ".\n\n"
+        if tamano >= siguiente_enlace:
+            enlace = aleatorio.choice(formatos).format(n=aleatorio.randint(1, imagenes))
+            parrafo = f"{enlace}\n\n{parrafo}"
+            siguiente_enlace += cada_kb * 1024
+        partes.append(parrafo)
+        tamano += len(parrafo)
+    return "".join(partes)
+
+def escribir_descripciones(directorio, imagenes):
+    """Archivos image_descriptions/imageN.md con el formato de guardar_descripcion"""
+    for n in range(1, imagenes + 1):
+        with open(os.path.join(directorio, f"image{n}.md"), 'w', encoding='utf-8') as f:
+            f.write(f"# Descripción de image{n}\n\n**Imagen:** image{n}.png\n\n"
+                    f"**Descripción:**\n\n{json.dumps({'response': f'El mago mira al público (figura {n}).'})}\n")
+
+def leer_descripcion(directorio, imagen_name):
+    """Lectura equivalente a DocumentProcessor.leer_descripcion (archivo + intento de JSON)"""
+    with open(os.path.join(directorio, f"{imagen_name}.md"), 'r', encoding='utf-8') as f:
+        descripcion = ' '.join(f.read().split("**Descripción:**")[1].split())
+    try:
+        return json.loads(descripcion)['response']
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return descripcion
+
+# === Implementación anterior (referencia) ===
+def insertar_anterior(contenido, directorio):
+    patrones_imagen = [
+        r'!\[.*?\]\(.*?image(\d+)\.png.*?\)',
+        r'\[.*?\]\(.*?image(\d+)\.png.*?\)',
+        r'<img.*?src=".*?image(\d+)\.png.*?".*?>',
+        r'image(\d+)\.png',
+    ]
+    contenido_modificado = contenido
+    for patron in patrones_imagen:
+        for match in reversed(list(re.finditer(patron, contenido_modificado))):
+            descripcion = leer_descripcion(directorio, f"image{match.group(1)}")
+            if descripcion:
+                contenido_modificado = (contenido_modificado[:match.start()] + descripcion +
+                                        contenido_modificado[match.end():])
+    return contenido_modificado
+
+def corregir_anterior(contenido, imagenes_reales):
+    patron = r'!\[([^\]]*)\]\([^)]*\.(png|jpg|jpeg|gif|bmp|webp)\)'
+    contenido_modificado = contenido
+    imagen_counter = 0
+    for match in re.finditer(patron, contenido_modificado, re.IGNORECASE):
+        if imagen_counter < len(imagenes_reales):
+            nuevo_enlace = f"![{match.group(1)}](imagenes_extraidas/{imagenes_reales[imagen_counter]})"
+            contenido_modificado = contenido_modificado.replace(match.group(0), nuevo_enlace, 1)
+            imagen_counter += 1
+    return contenido_modificado
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+def informe(nombre, texto, segundos):
+    mb = len(texto) / 1024 / 1024
+    print(f"{nombre:<34} {mb:>7.1f} MB {segundos:>9.2f} s {mb / segundos:>9.1f} MB/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Reescritura de enlaces: implementación anterior vs una pasada")
+    parser.add_argument("--mb", type=float, default=50, help="Tamaño del markdown sintético")
+    parser.add_argument("--imagenes", type=int, default=1000, help="Imágenes distintas enlazadas")
+    parser.add_argument("--cada-kb", type=float, default=10, help="Un enlace cada tantos KB")
+    parser.add_argument("--mb-anterior", type=float, default=5,
+                        help="Tamaño con el que se mide la implementación anterior (cuadrática)")
+    args = parser.parse_args()
+
+    contenido = generar_markdown(args.mb, args.imagenes, args.cada_kb)
+    prefijo = contenido[:int(args.mb_anterior * 1024 * 1024)]
+    enlaces = len(re.findall(r'image\d+\.png', contenido))
+    print(f"📄 Markdown sintético: {len(contenido) / 1024 / 1024:.1f} MB, "
+          f"{enlaces} enlaces a {args.imagenes} imágenes\n")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        escribir_descripciones(directorio, args.imagenes)
+        print(f"{'implementación':<34} {'tamaño':>10} {'tiempo':>11} {'velocidad':>14}")
+
+        # Inserción de descripciones
+        esperado, segundos = medir(insertar_anterior, prefijo, directorio)
+        informe("insertar (anterior)", prefijo, segundos)
+        descripciones, segundos_carga = medir(
+            lambda: {f"image{n}": leer_descripcion(directorio, f"image{n}") for n in range(1, args.imagenes + 1)})
+        (obtenido, _, _), segundos = medir(insertar_descripciones, prefijo, descripciones)
+        informe("insertar (una pasada)", prefijo, segundos + segundos_carga)
+        print(f"   mismo resultado que la anterior: {'sí' if obtenido == esperado else 'no'}")
+        _, segundos = medir(insertar_descripciones, contenido, descripciones)
+        informe("insertar (una pasada)", contenido, segundos + segundos_carga)
+
+    # Corrección de enlaces (markdown de docling con rutas temporales)
+    docling = generar_markdown(args.mb, args.imagenes, args.cada_kb, FORMATOS_DOCLING, semilla=1)
+    imagenes_reales = [f"image{n}.png" for n in range(1, docling.count('/tmp/docling/') + 1)]
+    prefijo = docling[:int(args.mb_anterior * 1024 * 1024)]
+    esperado, segundos = medir(corregir_anterior, prefijo, imagenes_reales)
+    informe("corregir enlaces (anterior)", prefijo, segundos)
+    (obtenido, _), segundos = medir(corregir_enlaces, prefijo, imagenes_reales)
+    informe("corregir enlaces (una pasada)", prefijo, segundos)
+    print(f"   mismo resultado que la anterior: {'sí' if obtenido == esperado else 'no'}")
+    _, segundos = medir(corregir_enlaces, docling, imagenes_reales)
+    informe("corregir enlaces (una pasada)", docling, segundos)
+
+if __name__ == "__main__":
+    main()
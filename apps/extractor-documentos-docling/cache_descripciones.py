@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Caché global de descripciones de imágenes, compartida entre documentos.
+
+Los mismos logos, diagramas y adornos de página aparecen en muchos PDFs, y cada uno era una
+llamada al modelo de visión. Las descripciones se guardan en una base SQLite (fuera de las
+carpetas artifacts_*) con dos claves:
+    - exacta: SHA-256 de los bytes de la imagen y del prompt; un acierto se reutiliza siempre;
+    - perceptual: dHash de 64 bits de la imagen; con DISTANCIA_SIMILAR > 0 se reutiliza la
+      descripción de una imagen casi idéntica (misma figura recomprimida o reescalada) si la
+      distancia de Hamming no supera el umbral. Por defecto está desactivado.
+El tamaño está acotado: al superar MAX_ENTRADAS se eliminan las menos usadas recientemente (LRU).
+
+Solo se guardan descripciones válidas: las respuestas de error del servidor de imágenes
+({"success": false} o una respuesta "Error: ...") no se cachean.
+
+Uso:
+    python cache_descripciones.py                          # estadísticas de la caché
+    python cache_descripciones.py --vaciar                 # borrar todas las descripciones
+    python cache_descripciones.py --olvidar img1.png ...   # borrar las descripciones de esas imágenes
+    python cache_descripciones.py --purgar-errores         # borrar respuestas de error ya guardadas
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# Ruta de la base (se puede cambiar con CACHE_DESCRIPCIONES en .env)
+RUTA_CACHE = os.path.join(Path.home(), ".cache", "extractor-documentos", "descripciones.sqlite")
+MAX_ENTRADAS = 20000
+# Distancia de Hamming máxima entre dHash para reutilizar una imagen casi idéntica (0 = solo exactas)
+DISTANCIA_SIMILAR = 0
+# Lado de la miniatura del dHash: (LADO + 1) x LADO píxeles -> LADO * LADO bits
+LADO_DHASH = 8
+
+def dhash(image_data: bytes, lado: int = LADO_DHASH) -> Optional[int]:
+    """
+    Hash perceptual por diferencias: miniatura en grises y un bit por cada par de píxeles vecinos
+
+    Args:
+        image_data (bytes): Contenido del archivo de imagen
+
+    Returns:
+        Optional[int]: Hash de lado*lado bits, o None si Pillow no está o la imagen no se puede leer
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_data)) as imagen:
+            pixeles = list(imagen.convert("L").resize((lado + 1, lado)).getdata())
+    except Exception:
+        return None
+    valor = 0
+    for fila in range(lado):
+        for columna in range(lado):
+            izquierda = pixeles[fila * (lado + 1) + columna]
+            derecha = pixeles[fila * (lado + 1) + columna + 1]
+            valor = (valor << 1) | (izquierda > derecha)
+    return valor
+
+def distancia_hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def error_respuesta(descripcion: str) -> Optional[str]:
+    """
+    Comprueba si la respuesta del servidor de imágenes es un error en lugar de una descripción.
+    El servidor responde con código 200 y {"success": true, "response": "Error: ..."} cuando
+    falla la generación (modelo no cargado, falta de memoria...)
+
+    Args:
+        descripcion (str): Cuerpo de la respuesta (JSON o texto plano)
+
+    Returns:
+        Optional[str]: Motivo del error, o None si es una descripción válida
+    """
+    try:
+        datos = json.loads(descripcion)
+    except (json.JSONDecodeError, TypeError):
+        datos = None
+    if isinstance(datos, dict):
+        if datos.get('success') is False:
+            return str(datos.get('error') or "success = false")
+        texto = datos.get('response', descripcion)
+    else:
+        texto = descripcion
+    if isinstance(texto, str) and texto.strip().startswith("Error"):
+        return texto.strip()[:200]
+    return None
+
+class CacheDescripciones:
+    """Descripciones por (imagen, prompt) en SQLite, con búsqueda exacta y por similitud y desalojo LRU"""
+
+    def __init__(self, ruta: Optional[str] = None, max_entradas: int = MAX_ENTRADAS,
+                 distancia_similar: int = DISTANCIA_SIMILAR):
+        self.ruta = ruta or RUTA_CACHE
+        self.max_entradas = max_entradas
+        self.distancia_similar = distancia_similar
+        self.lock = threading.Lock()
+
+        Path(self.ruta).parent.mkdir(parents=True, exist_ok=True)
+        # Una conexión compartida por los hilos de procesar_imagenes (protegida con el lock);
+        # el timeout cubre otros procesos escribiendo a la vez
+        self.conexion = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("""
+            CREATE TABLE IF NOT EXISTS descripciones (
+                clave TEXT PRIMARY KEY,
+                hash_prompt TEXT NOT NULL,
+                dhash TEXT,
+                descripcion TEXT NOT NULL,
+                creada REAL NOT NULL,
+                usada REAL NOT NULL
+            )
+        """)
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS idx_prompt ON descripciones (hash_prompt)")
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS idx_usada ON descripciones (usada)")
+        self.conexion.commit()
+
+        # Métricas
+        self.aciertos_exactos = 0
+        self.aciertos_similares = 0
+        self.fallos = 0
+        self.guardadas = 0
+        self.desalojadas = 0
+
+    @staticmethod
+    def claves(image_data: bytes, prompt: str):
+        """
+        Returns:
+            tuple: (clave exacta, hash del prompt)
+        """
+        hash_prompt = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return CacheDescripciones.clave_exacta(image_data, hash_prompt), hash_prompt
+
+    @staticmethod
+    def clave_exacta(image_data: bytes, hash_prompt: str) -> str:
+        return hashlib.sha256(image_data + b"\0" + hash_prompt.encode()).hexdigest()
+
+    def buscar(self, image_data: bytes, prompt: str) -> Optional[str]:
+        """
+        Args:
+            image_data (bytes): Contenido del archivo de imagen
+            prompt (str): Prompt con el que se generaría la descripción
+
+        Returns:
+            Optional[str]: Descripción cacheada (exacta o de una imagen casi idéntica) o None
+        """
+        clave, hash_prompt = self.claves(image_data, prompt)
+        huella = dhash(image_data) if self.distancia_similar > 0 else None
+
+        with self.lock:
+            fila = self.conexion.execute(
+                "SELECT descripcion FROM descripciones WHERE clave = ?", (clave,)).fetchone()
+            if fila:
+                self.aciertos_exactos += 1
+            elif huella is not None:
+                # Vecino más cercano entre las imágenes descritas con el mismo prompt
+                mejor = None
+                for otra_clave, otro_dhash in self.conexion.execute(
+                        "SELECT clave, dhash FROM descripciones WHERE hash_prompt = ? AND dhash IS NOT NULL",
+                        (hash_prompt,)):
+                    distancia = distancia_hamming(huella, int(otro_dhash, 16))
+                    if distancia <= self.distancia_similar and (mejor is None or distancia < mejor[0]):
+                        mejor = (distancia, otra_clave)
+                if mejor:
+                    clave = mejor[1]
+                    fila = self.conexion.execute(
+                        "SELECT descripcion FROM descripciones WHERE clave = ?", (clave,)).fetchone()
+                    self.aciertos_similares += 1
+
+            if not fila:
+                self.fallos += 1
+                return None
+            self.conexion.execute("UPDATE descripciones SET usada = ? WHERE clave = ?", (time.time(), clave))
+            self.conexion.commit()
+            return fila[0]
+
+    def guardar(self, image_data: bytes, prompt: str, descripcion: str):
+        clave, hash_prompt = self.claves(image_data, prompt)
+        huella = dhash(image_data)
+        ahora = time.time()
+
+        with self.lock:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO descripciones VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, hash_prompt, None if huella is None else f"{huella:016x}", descripcion, ahora, ahora))
+            self.guardadas += 1
+            sobrantes = self.conexion.execute("SELECT COUNT(*) FROM descripciones").fetchone()[0] - self.max_entradas
+            if sobrantes > 0:
+                self.conexion.execute(
+                    "DELETE FROM descripciones WHERE clave IN "
+                    "(SELECT clave FROM descripciones ORDER BY usada LIMIT ?)", (sobrantes,))
+                self.desalojadas += sobrantes
+            self.conexion.commit()
+
+    def olvidar(self, image_data: bytes, prompt: Optional[str] = None) -> int:
+        """
+        Borra la descripción de una imagen con ese prompt, o con cualquier prompt si es None
+
+        Returns:
+            int: Número de descripciones borradas
+        """
+        with self.lock:
+            if prompt is None:
+                hashes_prompt = [fila[0] for fila in self.conexion.execute(
+                    "SELECT DISTINCT hash_prompt FROM descripciones")]
+            else:
+                hashes_prompt = [self.claves(image_data, prompt)[1]]
+            borradas = self.conexion.executemany(
+                "DELETE FROM descripciones WHERE clave = ?",
+                [(self.clave_exacta(image_data, h),) for h in hashes_prompt]).rowcount
+            self.conexion.commit()
+            return borradas
+
+    def purgar_errores(self) -> int:
+        """Borra las respuestas de error guardadas antes de que se filtraran. Returns: número borradas"""
+        with self.lock:
+            claves = [(clave,) for clave, descripcion in self.conexion.execute(
+                "SELECT clave, descripcion FROM descripciones") if error_respuesta(descripcion)]
+            self.conexion.executemany("DELETE FROM descripciones WHERE clave = ?", claves)
+            self.conexion.commit()
+            return len(claves)
+
+    def vaciar(self):
+        with self.lock:
+            self.conexion.execute("DELETE FROM descripciones")
+            self.conexion.commit()
+
+    def metricas(self) -> dict:
+        with self.lock:
+            entradas = self.conexion.execute("SELECT COUNT(*) FROM descripciones").fetchone()[0]
+            return {
+                'entradas': entradas,
+                'aciertos_exactos': self.aciertos_exactos,
+                'aciertos_similares': self.aciertos_similares,
+                'fallos': self.fallos,
+                'guardadas': self.guardadas,
+                'desalojadas': self.desalojadas,
+            }
+
+    def cerrar(self):
+        with self.lock:
+            self.conexion.close()
+
+if __name__ == "__main__":
+    cache = CacheDescripciones(os.getenv('CACHE_DESCRIPCIONES'))
+    if "--vaciar" in sys.argv[1:]:
+        cache.vaciar()
+        print(f"🧹 Caché vaciada: {cache.ruta}")
+    elif "--olvidar" in sys.argv[1:]:
+        for imagen_path in sys.argv[sys.argv.index("--olvidar") + 1:]:
+            with open(imagen_path, 'rb') as f:
+                borradas = cache.olvidar(f.read())
+            print(f"🧹 {imagen_path}: {borradas} descripciones borradas")
+    elif "--purgar-errores" in sys.argv[1:]:
+        print(f"🧹 Respuestas de error borradas: {cache.purgar_errores()}")
+    else:
+        print(f"🗃️  Caché de descripciones: {cache.ruta}")
+        print(f"📊 Entradas: {cache.metricas()['entradas']} (máximo {cache.max_entradas})")
+    cache.cerrar()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Conversión de PDFs con docling como librería, dentro del proceso.
+
+El modo CLI lanza python docling_cli.py, que a su vez lanza el CLI de docling: cada documento paga
+dos arranques de intérprete y la carga de los modelos de layout/OCR. Aquí un único
+DocumentConverter se carga una vez y se mantiene caliente en un hilo trabajador que atiende
+una cola de PDFs. El markdown y las imágenes (PNG) se devuelven en memoria y se escriben
+directamente como texto.md e imagenes_extraidas/imageN.png, sin directorio temporal que
+recorrer, renombrar y mover.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Escala de las imágenes exportadas respecto a la página (1.0 = 72 ppp)
+ESCALA_IMAGENES = 2.0
+MARCADOR_IMAGEN = "<!-- image -->"
+
+def crear_conversor():
+    """DocumentConverter para PDF con extracción de las imágenes de las figuras"""
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    opciones = PdfPipelineOptions()
+    opciones.generate_picture_images = True
+    opciones.images_scale = ESCALA_IMAGENES
+    return DocumentConverter(format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=opciones)})
+
+def convertir_en_memoria(conversor, pdf_file: str) -> Tuple[str, List[bytes]]:
+    """
+    Convierte un PDF con un DocumentConverter ya cargado
+
+    Args:
+        conversor: DocumentConverter de crear_conversor()
+        pdf_file (str): Ruta al archivo PDF
+
+    Returns:
+        Tuple[str, List[bytes]]: (markdown con enlaces a imagenes_extraidas/imageN.png, PNG de cada imagen)
+    """
+    from docling_core.types.doc import ImageRefMode, PictureItem
+
+    documento = conversor.convert(pdf_file).document
+
+    # Figuras en orden de lectura: el mismo en que aparecen los marcadores en el markdown
+    figuras = []
+    for elemento, _ in documento.iterate_items():
+        if isinstance(elemento, PictureItem):
+            imagen = elemento.get_image(documento)
+            if imagen is None:
+                figuras.append(None)
+                continue
+            buffer = io.BytesIO()
+            imagen.save(buffer, format="PNG")
+            figuras.append(buffer.getvalue())
+
+    markdown = documento.export_to_markdown(image_mode=ImageRefMode.PLACEHOLDER,
+                                            image_placeholder=MARCADOR_IMAGEN)
+    # Cada marcador se sustituye por el enlace a su imagen (las figuras sin imagen desaparecen)
+    trozos = markdown.split(MARCADOR_IMAGEN)
+    partes, imagenes = [trozos[0]], []
+    for numero, trozo in enumerate(trozos[1:]):
+        datos = figuras[numero] if numero < len(figuras) else None
+        if datos:
+            imagenes.append(datos)
+            partes.append(f"![Image](imagenes_extraidas/image{len(imagenes)}.png)")
+        partes.append(trozo)
+    return "".join(partes), imagenes
+
+def guardar_conversion(markdown: str, imagenes: List[bytes], artifacts_dir: str):
+    """Escribe texto.md e imagenes_extraidas/imageN.png con los nombres definitivos"""
+    imagenes_dir = os.path.join(artifacts_dir, "imagenes_extraidas")
+    Path(imagenes_dir).mkdir(parents=True, exist_ok=True)
+    for numero, datos in enumerate(imagenes, 1):
+        with open(os.path.join(imagenes_dir, f"image{numero}.png"), 'wb') as f:
+            f.write(datos)
+    with open(os.path.join(artifacts_dir, "texto.md"), 'w', encoding='utf-8', newline='') as f:
+        f.write(markdown)
+
+class ConversorDocling:
+    """DocumentConverter residente en un hilo trabajador que convierte una cola de PDFs en orden"""
+
+    def __init__(self):
+        # Un solo hilo: el conversor (y sus modelos) se usa siempre desde el mismo sitio
+        self.ejecutor = ThreadPoolExecutor(max_workers=1)
+        self.conversor = None
+        self.pendientes: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    def trabajar(self, pdf_file: str) -> Tuple[str, List[bytes]]:
+        if self.conversor is None:
+            self.conversor = crear_conversor()
+        return convertir_en_memoria(self.conversor, pdf_file)
+
+    def encolar(self, pdf_file: str) -> Future:
+        """Añade el PDF a la cola (si no estaba ya) sin esperar a que se convierta"""
+        clave = os.path.abspath(pdf_file)
+        with self.lock:
+            if clave not in self.pendientes:
+                self.pendientes[clave] = self.ejecutor.submit(self.trabajar, pdf_file)
+            return self.pendientes[clave]
+
+    def convertir(self, pdf_file: str) -> Tuple[str, List[bytes]]:
+        """
+        Returns:
+            Tuple[str, List[bytes]]: (markdown, PNG de cada imagen), ver convertir_en_memoria
+        """
+        futuro = self.encolar(pdf_file)
+        try:
+            return futuro.result()
+        finally:
+            with self.lock:
+                self.pendientes.pop(os.path.abspath(pdf_file), None)
+
+    def cerrar(self):
+        self.ejecutor.shutdown(wait=True)
+
+@lru_cache(maxsize=None)
+def conversor_compartido() -> ConversorDocling:
+    """Conversor único del proceso: los modelos se cargan con el primer documento y se reutilizan"""
+    return ConversorDocling()
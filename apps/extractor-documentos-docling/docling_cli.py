@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Script para procesar PDFs con docling y extraer texto e imágenes
+Siempre convierte de PDF a MD con imágenes PNG
+
+Con --tramos el PDF se divide en rangos de páginas que se convierten en paralelo (un proceso
+docling por tramo); el markdown se une en orden de páginas y las imágenes se numeran de forma
+global (image1.png, image2.png, ...), igual que en la conversión de un solo proceso.
+"""
+
+import os
+import re
+import sys
+import math
+import time
+import subprocess
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from datetime import datetime
+
+# Páginas mínimas por tramo: cada proceso docling carga sus propios modelos (varios segundos y
+# memoria), así que no compensa repartir documentos cortos
+PAGINAS_MIN_TRAMO = 20
+# Enlaces a imágenes en el markdown de docling: ![Image](ruta/image_000000_<hash>.png)
+RE_ENLACE_PNG = re.compile(r'\(([^)\s]*\.png)\)')
+
+def leer_tramos(valor):
+    """
+    Interpreta --tramos / DOCLING_TRAMOS
+    
+    Returns:
+        int: Número de tramos (0 = auto)
+    
+    Raises:
+        ValueError: Si no es "auto" ni un entero positivo
+    """
+    if valor.strip().lower() == "auto":
+        return 0
+    if not valor.strip().isdigit() or int(valor) < 1:
+        raise ValueError(f"--tramos debe ser un entero positivo o 'auto' (recibido: '{valor}')")
+    return int(valor)
+
+def comando_docling(pdf_file, output_dir):
+    """Comando docling con valores fijos: from pdf, to md, imágenes PNG"""
+    return [
+        "docling",
+        pdf_file,
+        "--from", "pdf",
+        "--to", "md",
+        "--image-export-mode", "referenced",
+        "--output", output_dir
+    ]
+
+def procesar_pdf(pdf_file, artifacts_dir="artifacts"):
+    """
+    Procesa un PDF usando docling y extrae texto e imágenes
+    Siempre convierte de PDF a MD con imágenes PNG
+    
+    Args:
+        pdf_file (str): Ruta al archivo PDF (obligatorio)
+        artifacts_dir (str): Directorio principal de salida (se creará imagenes_extraidas dentro)
+    
+    Returns:
+        bool: True si el procesamiento fue exitoso, False en caso contrario
+    """
+    
+    # Verificar que el archivo PDF existe
+    if not os.path.exists(pdf_file):
+        print(f"❌ Error: El archivo {pdf_file} no existe")
+        return False
+    
+    # Crear directorio de salida para imágenes
+    output_dir = os.path.join(artifacts_dir, "imagenes_extraidas")
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    
+    # Comando docling con valores fijos: from pdf, to md, imágenes PNG
+    cmd = comando_docling(pdf_file, output_dir)
+    
+    print(f"🔄 Ejecutando: {' '.join(cmd)}")
+    
+    try:
+        # Ejecutar el comando
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        
+        print("✅ Procesamiento completado exitosamente")
+        print(f"📁 Contenido guardado en: {output_dir}")
+        
+        # Renombrar imágenes y mover archivo de texto
+        renombrar_archivos_generados(output_dir, artifacts_dir)
+        
+        return True
+        
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error al ejecutar docling: {e}")
+        print(f"Salida de error: {e.stderr}")
+        return False
+    except FileNotFoundError:
+        print("❌ Error: No se encontró el comando 'docling'")
+        print("Asegúrate de que docling esté instalado y disponible en el PATH")
+        return False
+
+def nucleos_disponibles():
+    """Núcleos que puede usar este proceso (respeta la afinidad de CPU, p. ej. en contenedores)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def dividir_pdf(pdf_file, tramos_dir, tramos):
+    """
+    Divide el PDF en rangos de páginas consecutivas (con pypdfium2, que ya instala docling)
+    
+    Args:
+        pdf_file (str): Ruta al archivo PDF
+        tramos_dir (str): Directorio donde se escriben los PDFs de cada tramo
+        tramos (int): Número de tramos
+    
+    Returns:
+        list: (ruta del PDF del tramo, primera página, última página), en orden de páginas
+    """
+    import pypdfium2 as pdfium
+    
+    origen = pdfium.PdfDocument(pdf_file)
+    paginas = len(origen)
+    tamano = math.ceil(paginas / tramos)
+    resultado = []
+    for numero, inicio in enumerate(range(0, paginas, tamano), 1):
+        fin = min(inicio + tamano, paginas)
+        destino = pdfium.PdfDocument.new()
+        destino.import_pages(origen, pages=list(range(inicio, fin)))
+        ruta = os.path.join(tramos_dir, f"tramo_{numero:03d}.pdf")
+        destino.save(ruta)
+        destino.close()
+        resultado.append((ruta, inicio + 1, fin))
+    origen.close()
+    return resultado
+
+def convertir_tramo(tramo_pdf, output_dir, hilos):
+    """Convierte un tramo con el CLI de docling, limitando sus hilos para no saturar la CPU"""
+    env = dict(os.environ, OMP_NUM_THREADS=str(hilos))
+    subprocess.run(comando_docling(tramo_pdf, output_dir), capture_output=True, text=True, check=True, env=env)
+
+def fusionar_tramos(salidas, artifacts_dir):
+    """
+    Une el markdown de los tramos en orden de páginas y numera sus imágenes de forma global
+    
+    Args:
+        salidas (list): Directorios de salida de docling de cada tramo, en orden de páginas
+        artifacts_dir (str): Directorio principal de artifacts
+    
+    Returns:
+        int: Número total de imágenes
+    """
+    imagenes_dir = os.path.join(artifacts_dir, "imagenes_extraidas")
+    Path(imagenes_dir).mkdir(parents=True, exist_ok=True)
+    
+    partes = []
+    numero = 0
+    for directorio in salidas:
+        imagen_files, md_files = [], []
+        for root, dirs, files in os.walk(directorio):
+            for file in files:
+                if file.endswith('.png'):
+                    imagen_files.append(os.path.join(root, file))
+                elif file.endswith('.md'):
+                    md_files.append(os.path.join(root, file))
+        
+        # Mismo orden que renombrar_archivos_generados, continuando la numeración del tramo anterior
+        nombres = {}
+        for old_path in sorted(imagen_files):
+            numero += 1
+            nombres[os.path.basename(old_path)] = f"image{numero}.png"
+            shutil.move(old_path, os.path.join(imagenes_dir, f"image{numero}.png"))
+        
+        if md_files:
+            with open(md_files[0], 'r', encoding='utf-8') as f:
+                texto = f.read()
+            # Los enlaces del tramo apuntan ya a la imagen con su nombre global
+            texto = RE_ENLACE_PNG.sub(
+                lambda m: f"(imagenes_extraidas/{nombres[os.path.basename(m.group(1))]})"
+                if os.path.basename(m.group(1)) in nombres else m.group(0),
+                texto
+            )
+            partes.append(texto.strip())
+    
+    with open(os.path.join(artifacts_dir, "texto.md"), 'w', encoding='utf-8', newline='') as f:
+        f.write("\n\n".join(partes) + "\n")
+    return numero
+
+def procesar_pdf_por_tramos(pdf_file, artifacts_dir="artifacts", tramos=0):
+    """
+    Procesa un PDF grande dividiéndolo en tramos de páginas que se convierten en paralelo
+    
+    Args:
+        pdf_file (str): Ruta al archivo PDF (obligatorio)
+        artifacts_dir (str): Directorio principal de salida (se creará imagenes_extraidas dentro)
+        tramos (int): Número de tramos; 0 = según los núcleos disponibles y PAGINAS_MIN_TRAMO
+    
+    Returns:
+        bool: True si el procesamiento fue exitoso, False en caso contrario
+    """
+    if not os.path.exists(pdf_file):
+        print(f"❌ Error: El archivo {pdf_file} no existe")
+        return False
+    
+    try:
+        import pypdfium2 as pdfium
+        documento = pdfium.PdfDocument(pdf_file)
+        paginas = len(documento)
+        documento.close()
+    except ImportError:
+        print("⚠️  pypdfium2 no está instalado, se convierte el PDF en un solo proceso")
+        return procesar_pdf(pdf_file, artifacts_dir)
+    
+    nucleos = nucleos_disponibles()
+    if tramos:
+        tramos = min(tramos, paginas)
+    else:
+        tramos = min(nucleos, math.ceil(paginas / PAGINAS_MIN_TRAMO))
+    if tramos <= 1:
+        print(f"ℹ️  {paginas} páginas: no compensa dividir el PDF, se convierte en un solo proceso")
+        return procesar_pdf(pdf_file, artifacts_dir)
+    
+    tramos_dir = os.path.join(artifacts_dir, "tramos")
+    inicio = time.perf_counter()
+    # Los PDF divididos y las salidas parciales se borran también si falla algún tramo
+    try:
+        Path(tramos_dir).mkdir(parents=True, exist_ok=True)
+        rangos = dividir_pdf(pdf_file, tramos_dir, tramos)
+        hilos = max(1, nucleos // len(rangos))
+        print(f"🔀 {paginas} páginas en {len(rangos)} tramos ({hilos} hilos por proceso docling)")
+        
+        salidas = [os.path.join(tramos_dir, Path(ruta).stem) for ruta, _, _ in rangos]
+        # Cada tramo es un proceso docling; los hilos solo esperan a que terminen
+        with ThreadPoolExecutor(max_workers=len(rangos)) as executor:
+            futuros = [executor.submit(convertir_tramo, ruta, salida, hilos)
+                       for (ruta, _, _), salida in zip(rangos, salidas)]
+            try:
+                for (ruta, desde, hasta), futuro in zip(rangos, futuros):
+                    futuro.result()
+                    print(f"   ✅ Páginas {desde}-{hasta} convertidas")
+            except BaseException:
+                # No lanzar los tramos que aún no han empezado
+                for futuro in futuros:
+                    futuro.cancel()
+                raise
+        
+        total_imagenes = fusionar_tramos(salidas, artifacts_dir)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error al ejecutar docling en un tramo: {e}")
+        print(f"Salida de error: {e.stderr}")
+        return False
+    except FileNotFoundError:
+        print("❌ Error: No se encontró el comando 'docling'")
+        print("Asegúrate de que docling esté instalado y disponible en el PATH")
+        return False
+    finally:
+        shutil.rmtree(tramos_dir, ignore_errors=True)
+    
+    segundos = time.perf_counter() - inicio
+    print(f"✅ Procesamiento completado en {segundos:.1f}s ({paginas / segundos:.2f} páginas/s)")
+    print(f"🖼️  {total_imagenes} imágenes numeradas de forma global")
+    return True
+
+def renombrar_archivos_generados(output_dir, artifacts_dir):
+    """
+    Renombra las imágenes generadas a image1.png, image2.png, etc.
+    y mueve el archivo de texto a texto.md en el directorio artifacts
+    
+    Args:
+        output_dir (str): Directorio donde están los archivos generados
+        artifacts_dir (str): Directorio principal de artifacts
+    """
+    try:
+        # Buscar archivos de imagen PNG en el directorio (incluyendo subdirectorios)
+        imagen_files = []
+        for root, dirs, files in os.walk(output_dir):
+            for file in files:
+                if file.endswith('.png'):
+                    imagen_files.append(os.path.join(root, file))
+        
+        # Ordenar por nombre de archivo
+        imagen_files.sort()
+        
+        print(f"🖼️  Renombrando {len(imagen_files)} imágenes...")
+        
+        # Renombrar imágenes correlativamente
+        for i, old_path in enumerate(imagen_files, 1):
+            new_name = f"image{i}.png"
+            new_path = os.path.join(output_dir, new_name)
+            
+            # Mover archivo al directorio principal si está en subdirectorio
+            if os.path.dirname(old_path) != output_dir:
+                shutil.move(old_path, new_path)
+                print(f"   📄 {os.path.basename(old_path)} → {new_name} (movido)")
+            elif old_path != new_path:
+                os.rename(old_path, new_path)
+                print(f"   📄 {os.path.basename(old_path)} → {new_name}")
+        
+        # Buscar y mover el archivo de texto (incluyendo subdirectorios)
+        md_files = []
+        for root, dirs, files in os.walk(output_dir):
+            for file in files:
+                if file.endswith('.md'):
+                    md_files.append(os.path.join(root, file))
+        
+        if md_files:
+            md_file = md_files[0]  # Tomar el primer archivo MD encontrado
+            new_md_path = os.path.join(artifacts_dir, "texto.md")
+            
+            # Crear directorio artifacts si no existe
+            Path(artifacts_dir).mkdir(exist_ok=True)
+            
+            # Mover el archivo de texto a la carpeta artifacts
+            shutil.move(md_file, new_md_path)
+            print(f"📄 Archivo de texto movido: {os.path.basename(md_file)} → {new_md_path}")
+        
+        # Limpiar subdirectorios vacíos si existen
+        for root, dirs, files in os.walk(output_dir, topdown=False):
+            for dir_name in dirs:
+                dir_path = os.path.join(root, dir_name)
+                try:
+                    if not os.listdir(dir_path):  # Si está vacío
+                        os.rmdir(dir_path)
+                        print(f"🗑️  Eliminado subdirectorio vacío: {dir_path}")
+                except OSError:
+                    pass  # Ignorar errores al eliminar directorios
+        
+        print(f"✅ Renombrado completado: {len(imagen_files)} imágenes")
+        
+    except Exception as e:
+        print(f"⚠️  Advertencia: Error al renombrar archivos: {e}")
+
+def main():
+    """Función principal"""
+    
+    # Verificar que se proporcione el archivo PDF como parámetro obligatorio
+    if len(sys.argv) < 2:
+        print("❌ Error: Debes proporcionar el archivo PDF como parámetro")
+        print("Uso: python docling_cli.py <archivo_pdf> [artifacts_dir] [--tramos N|auto]")
+        print("Ejemplo: python docling_cli.py documento.pdf")
+        print("         python docling_cli.py documento.pdf artifacts_20240101_123456")
+        print("         python docling_cli.py libro.pdf artifacts_20240101_123456 --tramos auto")
+        print("")
+        print("El script siempre convierte:")
+        print("  - FROM: PDF")
+        print("  - TO: MD (Markdown)")
+        print("  - Imágenes: PNG (image1.png, image2.png, ...)")
+        print("  - Texto: artifacts_dir/texto.md")
+        sys.exit(1)
+    
+    # --tramos N|auto: conversión en paralelo por rangos de páginas
+    argumentos = sys.argv[1:]
+    tramos = None
+    if "--tramos" in argumentos:
+        posicion = argumentos.index("--tramos")
+        valor = argumentos[posicion + 1] if posicion + 1 < len(argumentos) else "auto"
+        try:
+            tramos = leer_tramos(valor)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        del argumentos[posicion:posicion + 2]
+    
+    pdf_file = argumentos[0]
+    artifacts_dir = argumentos[1] if len(argumentos) > 1 else "artifacts"
+    
+    print(f"📄 Archivo PDF: {pdf_file}")
+    print(f"📂 Directorio de salida: {artifacts_dir}/")
+    print(f"🔄 Conversión: PDF → MD con imágenes PNG")
+    print("-" * 50)
+    
+    # Procesar el PDF
+    if tramos is None:
+        success = procesar_pdf(pdf_file, artifacts_dir)
+    else:
+        success = procesar_pdf_por_tramos(pdf_file, artifacts_dir, tramos)
+    
+    if success:
+        print("\n🎉 ¡Procesamiento completado!")
+        print(f"📁 Imágenes guardadas en: {artifacts_dir}/imagenes_extraidas/")
+        print(f"📄 Archivo de texto: {artifacts_dir}/texto.md")
+        print(f"🖼️  Imágenes: {artifacts_dir}/imagenes_extraidas/image*.png")
+    else:
+        print("\n💥 Error en el procesamiento")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main() 
\ No newline at end of file
@@ -9,11 +9,23 @@ import sys
 import subprocess
 import requests
 import re
+import glob
+import hashlib
+import json
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from cache_descripciones import CacheDescripciones, DISTANCIA_SIMILAR, MAX_ENTRADAS, error_respuesta
+from conversor_docling import conversor_compartido, guardar_conversion
+from docling_cli import leer_tramos
 
 # Configurar logging primero
 logging.basicConfig(
@@ -46,16 +58,188 @@ else:
     logger.warning(f"⚠️ Archivo .env no encontrado en: {env_path}")
     logger.info("ℹ️  Se usarán valores por defecto para configuración")
 
+# Peticiones simultáneas a la API de descripciones (conviene igualarlo al tamaño de lote del servidor)
+MAX_EN_VUELO = 4
+REINTENTOS = 3
+BACKOFF_BASE = 1.0
+TIMEOUT_API = 60
+# Códigos ante los que merece la pena reintentar (servidor saturado o reiniciándose)
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+PROMPT_DESCRIPCION = "Las imágenes se basan en una situación de una actuación de magia e ilusionismo. Quiero que describas lo que ves, haciendo hincapié en flechas, hacia dónde se dirigen, qué hacen o qué intención quiere aportar la imagen."
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+# cli: subproceso docling_cli.py -> CLI de docling; libreria: DocumentConverter residente en este proceso
+MODOS_DOCLING = ("cli", "libreria")
+
+def hash_bytes(datos: bytes) -> str:
+    return hashlib.sha256(datos).hexdigest()
+
+def hash_archivo(path: str) -> str:
+    """sha256 del contenido de un archivo (leído por bloques)"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+# Enlaces a imágenes en texto.md, en una sola alternancia: el texto se recorre una vez y en cada
+# posición gana la primera alternativa que coincide (enlace markdown, <img>, imageN.png suelto)
+RE_ENLACE_DESCRIPCION = re.compile(
+    r'!?\[.*?\]\(.*?image(\d+)\.png.*?\)'      # ![alt](path/image1.png) o [alt](path/image1.png)
+    r'|<img.*?src=".*?image(\d+)\.png.*?".*?>'   # <img src="path/image1.png">
+    r'|image(\d+)\.png'                         # image1.png simple
+)
+# Todo enlace de RE_ENLACE_DESCRIPCION está en una sola línea y contiene este literal: solo se
+# aplica la alternancia a las líneas que lo tienen (el literal se busca mucho más rápido)
+RE_IMAGEN_PNG = re.compile(r'image\d+\.png')
+# Enlaces generados por docling con rutas temporales o genéricas
+RE_ENLACE_IMAGEN = re.compile(
+    r'(!?)\[([^\]]*)\]\([^)]*\.(?:png|jpg|jpeg|gif|bmp|webp)\)'
+    r'|<img[^>]*src="[^"]*\.(?:png|jpg|jpeg|gif|bmp|webp)"[^>]*>',
+    re.IGNORECASE
+)
+
+def insertar_descripciones(contenido: str, descripciones: Dict[str, str]) -> Tuple[str, int, List[str]]:
+    """
+    Sustituye cada enlace a imageN.png por la descripción de imageN en una sola pasada: el
+    resultado se construye uniendo los tramos sin enlaces y las líneas reescritas
+    
+    Args:
+        contenido (str): Texto de texto.md
+        descripciones (Dict[str, str]): Descripción por nombre de imagen (ej: image1)
+        
+    Returns:
+        Tuple[str, int, List[str]]: (texto final, enlaces reemplazados, imágenes sin descripción)
+    """
+    reemplazados = 0
+    sin_descripcion = set()
+    
+    def sustituir(match):
+        nonlocal reemplazados
+        imagen_name = f"image{match.group(match.lastindex)}"
+        descripcion = descripciones.get(imagen_name)
+        if not descripcion:
+            sin_descripcion.add(imagen_name)
+            return match.group(0)
+        reemplazados += 1
+        return descripcion
+    
+    partes, previo = [], 0
+    for match in RE_IMAGEN_PNG.finditer(contenido):
+        if match.start() < previo:  # línea ya reescrita
+            continue
+        inicio = contenido.rfind('\n', 0, match.start()) + 1
+        fin = contenido.find('\n', match.end())
+        fin = len(contenido) if fin == -1 else fin
+        partes.append(contenido[previo:inicio])
+        partes.append(RE_ENLACE_DESCRIPCION.sub(sustituir, contenido[inicio:fin]))
+        previo = fin
+    partes.append(contenido[previo:])
+    return "".join(partes), reemplazados, sorted(sin_descripcion)
+
+def corregir_enlaces(contenido: str, imagenes_reales: List[str]) -> Tuple[str, int]:
+    """
+    Reescribe los enlaces de imágenes, en orden de aparición, para que apunten a imagenes_extraidas/
+    
+    Args:
+        contenido (str): Texto de texto.md
+        imagenes_reales (List[str]): Nombres de las imágenes extraídas, en orden
+        
+    Returns:
+        Tuple[str, int]: (texto corregido, enlaces corregidos)
+    """
+    corregidos = 0
+    
+    def sustituir(match):
+        nonlocal corregidos
+        if corregidos >= len(imagenes_reales):
+            return match.group(0)
+        ruta_imagen_real = f"imagenes_extraidas/{imagenes_reales[corregidos]}"
+        corregidos += 1
+        if match.group(1) is None:  # HTML img
+            return f'<img src="{ruta_imagen_real}" alt="Imagen {corregidos}">'
+        texto = match.group(2) or f"Imagen {corregidos}"
+        return f"{match.group(1)}[{texto}]({ruta_imagen_real})"
+    
+    texto = RE_ENLACE_IMAGEN.sub(sustituir, contenido)
+    return texto, corregidos
+
+class ManifiestoTrabajo:
+    """
+    Estado del procesamiento de un documento, guardado en artifacts_dir/manifiesto.json.
+    
+    Para cada paso (docling, enlaces, insertar) y cada imagen se guarda el hash del contenido
+    de entrada y el estado. Al reanudar, un paso se salta si su entrada no ha cambiado, y de
+    las imágenes solo se vuelven a enviar las que fallaron o no llegaron a procesarse.
+    """
+    
+    def __init__(self, artifacts_dir: str):
+        self.path = os.path.join(artifacts_dir, ARCHIVO_MANIFIESTO)
+        self.datos = {"pasos": {}, "imagenes": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.datos = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"⚠️ Manifiesto ilegible en {self.path}, se empieza de cero: {e}")
+    
+    def guardar(self):
+        """Escritura atómica: si el proceso muere a mitad, el manifiesto anterior sigue siendo válido"""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.datos, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+    
+    def paso_vigente(self, nombre: str, entrada: str) -> bool:
+        """True si el paso terminó con esta misma entrada, o si la entrada es ya su propia salida"""
+        paso = self.datos["pasos"].get(nombre)
+        return bool(paso) and paso["estado"] == "completado" and entrada in (paso["entrada"], paso.get("salida"))
+    
+    def marcar_paso(self, nombre: str, entrada: str, estado: str = "completado", salida: Optional[str] = None):
+        self.datos["pasos"][nombre] = {
+            "entrada": entrada, "salida": salida, "estado": estado, "fecha": datetime.now().isoformat()
+        }
+        self.guardar()
+    
+    def imagen_vigente(self, nombre: str, entrada: str) -> bool:
+        imagen = self.datos["imagenes"].get(nombre)
+        return bool(imagen) and imagen["estado"] == "completado" and imagen["entrada"] == entrada
+    
+    def marcar_imagen(self, nombre: str, entrada: str, estado: str, error: Optional[str] = None):
+        anterior = self.datos["imagenes"].get(nombre, {})
+        self.datos["imagenes"][nombre] = {
+            "entrada": entrada, "estado": estado, "error": error,
+            "intentos": anterior.get("intentos", 0) + 1, "fecha": datetime.now().isoformat()
+        }
+        self.guardar()
+
+def buscar_artifacts_reanudable(hash_pdf: str) -> Optional[str]:
+    """Carpeta artifacts_* más reciente cuyo manifiesto corresponde a este PDF"""
+    for carpeta in sorted(glob.glob("artifacts_*"), reverse=True):
+        manifiesto = ManifiestoTrabajo(carpeta)
+        if manifiesto.datos.get("hash_pdf") == hash_pdf:
+            return carpeta
+    return None
+
 class DocumentProcessor:
     """Clase para procesar documentos PDF y generar descripciones de imágenes"""
     
-    def __init__(self, api_url: Optional[str] = None, auth_token: Optional[str] = None):
+    def __init__(self, api_url: Optional[str] = None, auth_token: Optional[str] = None,
+                 max_en_vuelo: Optional[int] = None, reintentos: Optional[int] = None,
+                 artifacts_dir: Optional[str] = None, usar_cache: bool = True,
+                 modo_docling: Optional[str] = None):
         """
         Inicializa el procesador de documentos
         
         Args:
             api_url (str): URL del endpoint de la API
             auth_token (str): Token de autenticación
+            max_en_vuelo (int): Imágenes enviadas a la API a la vez
+            reintentos (int): Reintentos por imagen ante timeouts, errores de conexión o 5xx/429
+            artifacts_dir (str): Carpeta existente en la que reanudar (por defecto, una nueva con timestamp)
+            usar_cache (bool): Reutilizar descripciones de la caché global compartida entre documentos
+            modo_docling (str): "cli" (subproceso, por defecto) o "libreria" (conversor residente)
         """
         # Usar variables de entorno si no se proporcionan valores
         self.api_url = api_url or os.getenv('API_URL', 'http://localhost:5000/analyze')
@@ -63,21 +247,51 @@ class DocumentProcessor:
         self.headers = {
             "Authorization": f"Bearer {self.auth_token}"
         }
+        self.max_en_vuelo = max(1, max_en_vuelo or int(os.getenv('MAX_EN_VUELO', MAX_EN_VUELO)))
+        self.reintentos = max(0, reintentos if reintentos is not None else int(os.getenv('REINTENTOS', REINTENTOS)))
+        self.modo_docling = modo_docling or os.getenv('MODO_DOCLING', 'cli')
+        if self.modo_docling not in MODOS_DOCLING:
+            logger.warning(f"⚠️ Modo de docling desconocido '{self.modo_docling}', se usa 'cli'")
+            self.modo_docling = "cli"
+        
+        # Sesión compartida: las conexiones con la API se reutilizan (keep-alive) entre imágenes
+        # y el pool tiene tantas conexiones como peticiones en vuelo
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=self.max_en_vuelo))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.max_en_vuelo))
         
         # Generar timestamp para la carpeta artifacts
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.artifacts_dir = f"artifacts_{self.timestamp}"
+        self.artifacts_dir = artifacts_dir or f"artifacts_{self.timestamp}"
+        self.manifiesto = None
+        
+        # Caché global de descripciones (misma imagen y prompt en cualquier documento)
+        self.cache = None
+        if usar_cache:
+            try:
+                self.cache = CacheDescripciones(
+                    os.getenv('CACHE_DESCRIPCIONES'),
+                    max_entradas=int(os.getenv('CACHE_MAX_ENTRADAS', MAX_ENTRADAS)),
+                    distancia_similar=int(os.getenv('DISTANCIA_SIMILAR', DISTANCIA_SIMILAR)),
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"⚠️ No se pudo abrir la caché de descripciones, se continúa sin ella: {e}")
         
         # Logging de configuración
         logger.info("🔧 Configuración del procesador:")
         logger.info(f"   - API URL: {self.api_url}")
         logger.info(f"   - Token: {'***' + self.auth_token[-4:] if len(self.auth_token) > 4 else '***'}")
+        logger.info(f"   - Peticiones en vuelo: {self.max_en_vuelo} (reintentos: {self.reintentos})")
+        logger.info(f"   - Conversión docling: {self.modo_docling}")
+        if self.cache:
+            logger.info(f"   - Caché de descripciones: {self.cache.ruta} "
+                        f"(distancia similar: {self.cache.distancia_similar})")
         logger.info(f"📁 Directorio de salida: {self.artifacts_dir}")
         logger.info(f"⏰ Timestamp generado: {self.timestamp}")
     
     def ejecutar_docling(self, pdf_file: str) -> bool:
         """
-        Ejecuta el script docling.py para procesar el PDF
+        Ejecuta el script docling_cli.py para procesar el PDF
         
         Args:
             pdf_file (str): Ruta al archivo PDF
@@ -85,29 +299,71 @@ class DocumentProcessor:
         Returns:
             bool: True si la ejecución fue exitosa
         """
+        if self.modo_docling == "libreria":
+            return self.ejecutar_docling_libreria(pdf_file)
+        
         try:
-            logger.info(f"🔄 Ejecutando docling.py con archivo: {pdf_file}")
+            logger.info(f"🔄 Ejecutando docling_cli.py con archivo: {pdf_file}")
             logger.info(f"📁 Directorio de salida: {self.artifacts_dir}")
             
-            # Ejecutar el script docling.py con directorio personalizado
+            # Ejecutar el script docling_cli.py con directorio personalizado
+            # (DOCLING_TRAMOS=N|auto en .env: conversión en paralelo por rangos de páginas)
+            cmd = [sys.executable, "docling_cli.py", pdf_file, self.artifacts_dir]
+            if os.getenv('DOCLING_TRAMOS'):
+                try:
+                    leer_tramos(os.getenv('DOCLING_TRAMOS'))
+                except ValueError as e:
+                    logger.error(f"❌ DOCLING_TRAMOS no válido en .env: {e}")
+                    return False
+                cmd += ["--tramos", os.getenv('DOCLING_TRAMOS')]
             result = subprocess.run(
-                [sys.executable, "docling.py", pdf_file, self.artifacts_dir],
+                cmd,
                 capture_output=True,
                 text=True,
                 check=True
             )
             
-            logger.info("✅ docling.py ejecutado exitosamente")
+            logger.info("✅ docling_cli.py ejecutado exitosamente")
             logger.debug(f"Salida: {result.stdout}")
             
             return True
             
         except subprocess.CalledProcessError as e:
-            logger.error(f"❌ Error al ejecutar docling.py: {e}")
+            logger.error(f"❌ Error al ejecutar docling_cli.py: {e}")
             logger.error(f"Salida de error: {e.stderr}")
             return False
         except FileNotFoundError:
-            logger.error("❌ No se encontró el archivo docling.py")
+            logger.error("❌ No se encontró el archivo docling_cli.py")
+            return False
+    
+    def ejecutar_docling_libreria(self, pdf_file: str) -> bool:
+        """
+        Convierte el PDF con el DocumentConverter residente del proceso (modelos ya cargados
+        a partir del segundo documento) y escribe texto.md e imágenes directamente
+        
+        Args:
+            pdf_file (str): Ruta al archivo PDF
+            
+        Returns:
+            bool: True si la conversión fue exitosa
+        """
+        try:
+            logger.info(f"🔄 Convirtiendo con docling en este proceso: {pdf_file}")
+            logger.info(f"📁 Directorio de salida: {self.artifacts_dir}")
+            
+            inicio = time.perf_counter()
+            markdown, imagenes = conversor_compartido().convertir(pdf_file)
+            guardar_conversion(markdown, imagenes, self.artifacts_dir)
+            
+            logger.info(f"✅ PDF convertido en {time.perf_counter() - inicio:.1f}s ({len(imagenes)} imágenes)")
+            return True
+            
+        except ImportError as e:
+            logger.warning(f"⚠️ No se pudo importar docling como librería ({e}), se usa el CLI")
+            self.modo_docling = "cli"
+            return self.ejecutar_docling(pdf_file)
+        except Exception as e:
+            logger.error(f"❌ Error al convertir {pdf_file} con docling: {e}")
             return False
     
     def obtener_imagenes(self) -> List[str]:
@@ -143,7 +399,7 @@ class DocumentProcessor:
             logger.error(f"❌ Error al obtener imágenes: {e}")
             return []
     
-    def procesar_imagen(self, imagen_path: str, prompt: str = "Las imágenes se basan en una situación de una actuación de magia e ilusionismo. Quiero que describas lo que ves, haciendo hincapié en flechas, hacia dónde se dirigen, qué hacen o qué intención quiere aportar la imagen.") -> Optional[str]:
+    def procesar_imagen(self, imagen_path: str, prompt: str = PROMPT_DESCRIPCION) -> Optional[str]:
         """
         Procesa una imagen enviándola al endpoint de la API
         
@@ -184,6 +440,16 @@ class DocumentProcessor:
             
             logger.info(f"📊 Tamaño de imagen: {len(image_data)} bytes")
             
+            # La misma imagen (o una casi idéntica) ya descrita con este prompt en otro documento
+            if self.cache:
+                descripcion = self.cache.buscar(image_data, prompt)
+                if descripcion and error_respuesta(descripcion):
+                    # Error guardado por una versión anterior: se descarta y se vuelve a pedir
+                    self.cache.olvidar(image_data, prompt)
+                elif descripcion:
+                    logger.info(f"🗃️ Descripción reutilizada de la caché para {imagen_path}")
+                    return descripcion
+            
             # Preparar los datos del formulario
             files = {
                 'image': (os.path.basename(imagen_path), image_data, mime_type)
@@ -199,14 +465,8 @@ class DocumentProcessor:
             
             logger.info("📤 Enviando petición al servidor...")
             
-            # Realizar la llamada POST
-            response = requests.post(
-                self.api_url,
-                files=files,
-                data=data,
-                headers=headers,
-                timeout=60  # Aumentado a 60 segundos
-            )
+            # Realizar la llamada POST (con reintentos y backoff)
+            response = self.enviar_con_reintentos(imagen_path, files, data, headers)
             
             logger.info(f"📥 Respuesta recibida - Código: {response.status_code}")
             logger.info(f"📏 Tamaño de respuesta: {len(response.text)} caracteres")
@@ -221,13 +481,22 @@ class DocumentProcessor:
                 logger.warning(f"⚠️ La respuesta está vacía para {imagen_path}")
                 return None
             
+            # El servidor devuelve 200 también cuando falla la generación: no es una descripción
+            error = error_respuesta(descripcion)
+            if error:
+                logger.error(f"❌ El servidor no pudo describir {imagen_path}: {error}")
+                return None
+            
             logger.info(f"✅ Descripción generada para {imagen_path}")
             logger.debug(f"📝 Descripción: {descripcion[:200]}...")
             
+            if self.cache:
+                self.cache.guardar(image_data, prompt, descripcion)
+            
             return descripcion
                 
         except requests.exceptions.Timeout:
-            logger.error(f"⏰ Timeout al procesar {imagen_path} - La API tardó más de 60 segundos")
+            logger.error(f"⏰ Timeout al procesar {imagen_path} - La API tardó más de {TIMEOUT_API} segundos")
             return None
         except requests.exceptions.ConnectionError:
             logger.error(f"🔌 Error de conexión al procesar {imagen_path} - Verifica que la API esté ejecutándose")
@@ -256,6 +525,96 @@ class DocumentProcessor:
             logger.error(f"🔍 Tipo de error: {type(e).__name__}")
             return None
     
+    def enviar_con_reintentos(self, imagen_path: str, files: dict, data: dict, headers: dict) -> requests.Response:
+        """
+        POST a la API con la sesión compartida, reintentando timeouts, errores de conexión
+        y respuestas 429/5xx con backoff exponencial y jitter (para que los hilos no reintenten a la vez)
+        
+        Returns:
+            requests.Response: Última respuesta recibida (puede ser un error no reintentable)
+        """
+        for intento in range(self.reintentos + 1):
+            if intento:
+                espera = BACKOFF_BASE * 2 ** (intento - 1) * (1 + random.random())
+                logger.warning(f"🔁 Reintento {intento}/{self.reintentos} para {imagen_path} en {espera:.1f}s")
+                time.sleep(espera)
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    files=files,
+                    data=data,
+                    headers=headers,
+                    timeout=TIMEOUT_API
+                )
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                if intento == self.reintentos:
+                    raise
+                continue
+            if response.status_code not in CODIGOS_REINTENTABLES or intento == self.reintentos:
+                return response
+            logger.warning(f"⚠️ La API respondió {response.status_code} para {imagen_path}")
+    
+    def procesar_imagenes(self, imagen_paths: List[str], prompt: str = PROMPT_DESCRIPCION) -> List[Optional[str]]:
+        """
+        Describe las imágenes concurrentemente (hasta max_en_vuelo peticiones a la vez) y guarda
+        cada descripción en cuanto llega. Con manifiesto, se saltan las imágenes ya descritas
+        con el mismo contenido y prompt, y se registra el estado de cada una.
+        
+        Args:
+            imagen_paths (List[str]): Rutas de las imágenes
+            prompt (str): Texto del prompt
+            
+        Returns:
+            List[Optional[str]]: Descripción de cada imagen, en el mismo orden (None si falló)
+        """
+        descripciones = [None] * len(imagen_paths)
+        hash_prompt = hash_bytes(prompt.encode('utf-8'))
+        entradas = [hash_bytes(f"{hash_archivo(path)}:{hash_prompt}".encode()) for path in imagen_paths]
+        
+        pendientes = []
+        for i, path in enumerate(imagen_paths):
+            nombre = Path(path).stem
+            descripcion_file = os.path.join(self.artifacts_dir, "image_descriptions", f"{nombre}.md")
+            if (self.manifiesto and self.manifiesto.imagen_vigente(nombre, entradas[i])
+                    and os.path.exists(descripcion_file)):
+                descripciones[i] = self.leer_descripcion(nombre)
+            else:
+                pendientes.append(i)
+        if len(pendientes) < len(imagen_paths):
+            logger.info(f"⏭️ {len(imagen_paths) - len(pendientes)} imágenes ya descritas, "
+                        f"{len(pendientes)} pendientes")
+        if not pendientes:
+            return descripciones
+        
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_en_vuelo) as executor:
+            futuros = {executor.submit(self.procesar_imagen, imagen_paths[i], prompt): i for i in pendientes}
+            for completadas, futuro in enumerate(as_completed(futuros), 1):
+                i = futuros[futuro]
+                imagen_path = imagen_paths[i]
+                descripcion = futuro.result()
+                error = None
+                if not descripcion:
+                    error = "sin descripción de la API"
+                    logger.warning(f"⚠️ No se pudo procesar {imagen_path}")
+                elif self.guardar_descripcion(imagen_path, descripcion):
+                    descripciones[i] = descripcion
+                else:
+                    error = "no se pudo guardar la descripción"
+                    logger.warning(f"⚠️ No se pudo guardar descripción para {imagen_path}")
+                # El manifiesto se escribe desde este hilo, tras cada imagen: un corte no pierde lo hecho
+                if self.manifiesto:
+                    self.manifiesto.marcar_imagen(Path(imagen_path).stem, entradas[i],
+                                                  "error" if error else "completado", error)
+                logger.info(f"📊 Progreso: {completadas}/{len(pendientes)} imágenes")
+        
+        segundos = time.perf_counter() - inicio
+        logger.info(f"⏱️ {len(pendientes)} imágenes en {segundos:.1f}s "
+                    f"({len(pendientes) / segundos:.2f} imágenes/s, {self.max_en_vuelo} en vuelo)")
+        if self.cache:
+            logger.info(f"🗃️ Caché de descripciones: {self.cache.metricas()}")
+        return descripciones
+    
     def extraer_descripcion_de_json(self, respuesta: str) -> str:
         """
         Extrae el campo 'response' de un JSON o devuelve el texto tal como está
@@ -400,6 +759,25 @@ class DocumentProcessor:
             logger.error(f"❌ Error al leer descripción de {imagen_name}: {e}")
             return None
     
+    def cargar_descripciones(self) -> Dict[str, str]:
+        """
+        Lee una sola vez todas las descripciones de image_descriptions/
+        
+        Returns:
+            Dict[str, str]: Descripción por nombre de imagen (ej: image1)
+        """
+        descriptions_dir = os.path.join(self.artifacts_dir, "image_descriptions")
+        descripciones = {}
+        if os.path.exists(descriptions_dir):
+            for archivo in sorted(os.listdir(descriptions_dir)):
+                if archivo.endswith(".md"):
+                    imagen_name = Path(archivo).stem
+                    descripcion = self.leer_descripcion(imagen_name)
+                    if descripcion:
+                        descripciones[imagen_name] = descripcion
+        logger.info(f"📚 {len(descripciones)} descripciones cargadas")
+        return descripciones
+    
     def insertar_descripciones_en_texto(self) -> bool:
         """
         Crea texto_final.md reemplazando completamente los enlaces de imágenes
@@ -422,45 +800,13 @@ class DocumentProcessor:
             with open(texto_file, 'r', encoding='utf-8', errors='replace') as f:
                 contenido = f.read()
             
-            # Patrones para encontrar enlaces a imágenes
-            patrones_imagen = [
-                r'!\[.*?\]\(.*?image(\d+)\.png.*?\)',  # ![alt](path/image1.png)
-                r'\[.*?\]\(.*?image(\d+)\.png.*?\)',   # [alt](path/image1.png)
-                r'<img.*?src=".*?image(\d+)\.png.*?".*?>',  # <img src="path/image1.png">
-                r'image(\d+)\.png',  # image1.png simple
-            ]
+            # Todas las descripciones se leen una vez; los enlaces se sustituyen en una sola pasada
+            descripciones = self.cargar_descripciones()
+            contenido_modificado, descripciones_insertadas, sin_descripcion = insertar_descripciones(
+                contenido, descripciones)
             
-            contenido_modificado = contenido
-            descripciones_insertadas = 0
-            
-            # Procesar cada patrón de imagen
-            for patron in patrones_imagen:
-                matches = list(re.finditer(patron, contenido_modificado))
-                
-                # Procesar matches de atrás hacia adelante para evitar problemas de índices
-                for match in reversed(matches):
-                    numero_imagen = match.group(1)
-                    imagen_name = f"image{numero_imagen}"
-                    
-                    # Leer la descripción correspondiente
-                    descripcion = self.leer_descripcion(imagen_name)
-                    
-                    if descripcion:
-                        # Reemplazar completamente el enlace por la descripción
-                        enlace_original = match.group(0)
-                        
-                        # Reemplazar el enlace por solo la descripción
-                        contenido_modificado = (
-                            contenido_modificado[:match.start()] +
-                            descripcion +
-                            contenido_modificado[match.end():]
-                        )
-                        
-                        descripciones_insertadas += 1
-                        logger.info(f"✅ Enlace reemplazado por descripción para {imagen_name}")
-                        logger.debug(f"🔄 {enlace_original} → {descripcion[:50]}...")
-                    else:
-                        logger.warning(f"⚠️ No se pudo obtener descripción para {imagen_name}")
+            for imagen_name in sin_descripcion:
+                logger.warning(f"⚠️ No se pudo obtener descripción para {imagen_name}")
             
             # Guardar el archivo final con codificación UTF-8 explícita
             with open(texto_final_file, 'w', encoding='utf-8', newline='') as f:
@@ -491,14 +837,29 @@ class DocumentProcessor:
         logger.info(f"📁 Directorio de salida: {self.artifacts_dir}")
         logger.info("=" * 60)
         
-        # Paso 1: Ejecutar docling.py
-        if not self.ejecutar_docling(pdf_file):
-            logger.error("❌ Falló la ejecución de docling.py")
+        # Manifiesto del trabajo: permite saltar los pasos cuya entrada no ha cambiado
+        self.manifiesto = ManifiestoTrabajo(self.artifacts_dir)
+        hash_pdf = hash_archivo(pdf_file)
+        self.manifiesto.datos.update(pdf=os.path.abspath(pdf_file), hash_pdf=hash_pdf)
+        texto_file = os.path.join(self.artifacts_dir, "texto.md")
+        
+        # Paso 1: Ejecutar docling_cli.py
+        if self.manifiesto.paso_vigente("docling", hash_pdf) and os.path.exists(texto_file):
+            logger.info("⏭️ docling ya ejecutado para este PDF, se reutiliza su salida")
+        elif self.ejecutar_docling(pdf_file):
+            self.manifiesto.marcar_paso("docling", hash_pdf)
+        else:
+            logger.error("❌ Falló la ejecución de docling_cli.py")
+            self.manifiesto.marcar_paso("docling", hash_pdf, estado="error")
             return False
         
-        # Paso 1.5: Corregir enlaces de imágenes en texto.md
-        if self.corregir_enlaces_imagenes():
+        # Paso 1.5: Corregir enlaces de imágenes en texto.md (modifica el archivo: su salida es la entrada del paso 4)
+        hash_texto = hash_archivo(texto_file)
+        if self.manifiesto.paso_vigente("enlaces", hash_texto):
+            logger.info("⏭️ Enlaces de imágenes ya corregidos en texto.md")
+        elif self.corregir_enlaces_imagenes():
             logger.info("✅ Enlaces de imágenes corregidos en texto.md")
+            self.manifiesto.marcar_paso("enlaces", hash_texto, salida=hash_archivo(texto_file))
         else:
             logger.warning("⚠️ No se pudieron corregir algunos enlaces de imágenes")
         
@@ -508,26 +869,26 @@ class DocumentProcessor:
             logger.error("❌ No se encontraron imágenes para procesar")
             return False
         
-        # Paso 3: Procesar cada imagen
-        logger.info(f"🔄 Procesando {len(imagen_paths)} imágenes...")
+        # Paso 3: Procesar las imágenes en paralelo (solo las pendientes o fallidas)
+        logger.info(f"🔄 Procesando {len(imagen_paths)} imágenes ({self.max_en_vuelo} en vuelo)...")
         
-        exitosos = 0
-        for imagen_path in imagen_paths:
-            descripcion = self.procesar_imagen(imagen_path)
-            if descripcion:
-                if self.guardar_descripcion(imagen_path, descripcion):
-                    exitosos += 1
-                else:
-                    logger.warning(f"⚠️ No se pudo guardar descripción para {imagen_path}")
-            else:
-                logger.warning(f"⚠️ No se pudo procesar {imagen_path}")
+        descripciones = self.procesar_imagenes(imagen_paths)
+        exitosos = sum(1 for descripcion in descripciones if descripcion)
         
         logger.info(f"✅ Procesamiento completado: {exitosos}/{len(imagen_paths)} imágenes procesadas")
+        if exitosos < len(imagen_paths):
+            logger.info(f"🔁 Para reintentar solo las {len(imagen_paths) - exitosos} imágenes fallidas: "
+                        f"python process_document.py {pdf_file} --reanudar {self.artifacts_dir}")
         
         # Paso 4: Crear texto_final.md con descripciones insertadas
         if exitosos > 0:
-            if self.insertar_descripciones_en_texto():
+            entrada = self.hash_entrada_insercion()
+            texto_final_file = os.path.join(self.artifacts_dir, "texto_final.md")
+            if self.manifiesto.paso_vigente("insertar", entrada) and os.path.exists(texto_final_file):
+                logger.info("⏭️ texto_final.md ya está al día")
+            elif self.insertar_descripciones_en_texto():
                 logger.info("✅ Archivo texto_final.md creado con descripciones insertadas")
+                self.manifiesto.marcar_paso("insertar", entrada)
             else:
                 logger.warning("⚠️ No se pudo crear texto_final.md con las descripciones")
         
@@ -540,6 +901,15 @@ class DocumentProcessor:
         
         return exitosos > 0
 
+    def hash_entrada_insercion(self) -> str:
+        """Hash de texto.md y de todas las descripciones (la entrada del paso de inserción)"""
+        h = hashlib.sha256(hash_archivo(os.path.join(self.artifacts_dir, "texto.md")).encode())
+        descriptions_dir = os.path.join(self.artifacts_dir, "image_descriptions")
+        if os.path.exists(descriptions_dir):
+            for nombre in sorted(os.listdir(descriptions_dir)):
+                h.update(f"{nombre}:{hash_archivo(os.path.join(descriptions_dir, nombre))}".encode())
+        return h.hexdigest()
+
     def verificar_configuracion(self) -> bool:
         """
         Verifica que la configuración esté correctamente establecida
@@ -691,45 +1061,10 @@ class DocumentProcessor:
             
             logger.info(f"🖼️ Imágenes encontradas: {imagenes_reales}")
             
-            # Patrones para encontrar enlaces de imágenes generados por docling
-            import re
-            
-            # Buscar patrones como ![figura](ruta_generica) y reemplazar con rutas reales
-            patrones_a_reemplazar = [
-                # Patrón típico de docling: ![algo](ruta_temporal_o_generica)
-                r'!\[([^\]]*)\]\([^)]*\.(png|jpg|jpeg|gif|bmp|webp)\)',
-                # Patrón de imagen referenciada
-                r'\[([^\]]*)\]\([^)]*\.(png|jpg|jpeg|gif|bmp|webp)\)',
-                # Imagen HTML
-                r'<img[^>]*src="([^"]*\.(png|jpg|jpeg|gif|bmp|webp))"[^>]*>'
-            ]
-            
-            contenido_modificado = contenido
-            imagen_counter = 0
-            enlaces_corregidos = 0
-            
-            for patron in patrones_a_reemplazar:
-                matches = re.finditer(patron, contenido_modificado, re.IGNORECASE)
-                for match in matches:
-                    if imagen_counter < len(imagenes_reales):
-                        imagen_real = imagenes_reales[imagen_counter]
-                        ruta_imagen_real = f"imagenes_extraidas/{imagen_real}"
-                        
-                        # Reconstruir el enlace con la ruta correcta
-                        if patron.startswith('!\\['):  # Markdown image
-                            alt_text = match.group(1) if match.group(1) else f"Imagen {imagen_counter + 1}"
-                            nuevo_enlace = f"![{alt_text}]({ruta_imagen_real})"
-                        elif patron.startswith('\\['):  # Markdown link
-                            link_text = match.group(1) if match.group(1) else f"Imagen {imagen_counter + 1}"
-                            nuevo_enlace = f"[{link_text}]({ruta_imagen_real})"
-                        else:  # HTML img
-                            nuevo_enlace = f'<img src="{ruta_imagen_real}" alt="Imagen {imagen_counter + 1}">'
-                        
-                        # Reemplazar el enlace original con el nuevo
-                        contenido_modificado = contenido_modificado.replace(match.group(0), nuevo_enlace, 1)
-                        
-                        enlaces_corregidos += 1
-                        imagen_counter += 1
+            # Enlaces de docling (![algo](ruta_temporal_o_generica), [algo](...), <img src="...">) en una
+            # sola pasada: cada enlace recibe la siguiente imagen real en orden de aparición
+            contenido_modificado, enlaces_corregidos = corregir_enlaces(contenido, imagenes_reales)
+            imagen_counter = enlaces_corregidos
             
             # Si no se encontraron patrones específicos, buscar cualquier mención de imagen
             if enlaces_corregidos == 0:
@@ -824,15 +1159,31 @@ class DocumentProcessor:
 def main():
     """Función principal"""
     
+    # --sin-cache: describir todas las imágenes con la API aunque estén en la caché global
+    usar_cache = "--sin-cache" not in sys.argv
+    if not usar_cache:
+        sys.argv.remove("--sin-cache")
+    
+    # --modo cli|libreria: cómo se ejecuta docling (por defecto, MODO_DOCLING del .env o cli)
+    modo_docling = None
+    if "--modo" in sys.argv:
+        posicion = sys.argv.index("--modo")
+        modo_docling = sys.argv[posicion + 1] if posicion + 1 < len(sys.argv) else None
+        del sys.argv[posicion:posicion + 2]
+    
     # Verificar argumentos
     if len(sys.argv) < 2:
         print("❌ Error: Debes proporcionar el archivo PDF como parámetro")
-        print("Uso: python process_document.py <archivo_pdf>")
+        print("Uso: python process_document.py <archivo_pdf> [<archivo_pdf> ...] [--reanudar [carpeta_artifacts]]")
+        print("                                    [--sin-cache] [--modo cli|libreria]")
         print("   o: python process_document.py --insert-descriptions")
         print("   o: python process_document.py --insert-descriptions-from <carpeta_artifacts>")
         print("   o: python process_document.py --check-config")
         print("   o: python process_document.py --test-image <ruta_imagen>")
         print("Ejemplo: python process_document.py documento.pdf")
+        print("         python process_document.py documento.pdf --reanudar")
+        print("         python process_document.py documento.pdf --reanudar artifacts_20240315_143022")
+        print("         python process_document.py libro1.pdf libro2.pdf libro3.pdf --modo libreria")
         print("         python process_document.py --insert-descriptions")
         print("         python process_document.py --insert-descriptions-from artifacts_20240315_143022")
         print("         python process_document.py --check-config")
@@ -844,7 +1195,7 @@ def main():
         sys.exit(1)
     
     # Crear procesador
-    processor = DocumentProcessor()
+    processor = DocumentProcessor(usar_cache=usar_cache, modo_docling=modo_docling)
     
     # Verificar qué modo se está ejecutando
     if sys.argv[1] == "--check-config":
@@ -919,27 +1270,74 @@ def main():
             print("\n💥 Error al crear texto_final.md")
             sys.exit(1)
     else:
-        # Modo normal: procesamiento completo
-        pdf_file = sys.argv[1]
+        # Modo normal: procesamiento completo de uno o varios PDFs
+        argumentos = sys.argv[1:]
+        
+        # --reanudar [carpeta]: reutilizar los pasos ya completados de una ejecución anterior
+        reanudar = "--reanudar" in argumentos
+        carpeta_reanudar = None
+        if reanudar:
+            posicion = argumentos.index("--reanudar")
+            if posicion + 1 < len(argumentos) and not argumentos[posicion + 1].lower().endswith(".pdf"):
+                carpeta_reanudar = argumentos.pop(posicion + 1)
+            argumentos.pop(posicion)
+        pdf_files = argumentos
         
-        # Verificar que el archivo PDF existe
-        if not os.path.exists(pdf_file):
-            print(f"❌ Error: El archivo {pdf_file} no existe")
+        if carpeta_reanudar and len(pdf_files) > 1:
+            print("❌ Error: --reanudar con carpeta solo admite un PDF (sin carpeta, cada PDF busca la suya)")
             sys.exit(1)
         
-        # Ejecutar procesamiento completo
-        success = processor.procesar_documento(pdf_file)
+        # Verificar que los archivos PDF existen
+        for pdf_file in pdf_files:
+            if not os.path.exists(pdf_file):
+                print(f"❌ Error: El archivo {pdf_file} no existe")
+                sys.exit(1)
         
-        if success:
-            print("\n🎉 ¡Procesamiento completado exitosamente!")
-            print(f"📁 Directorio generado: {processor.artifacts_dir}")
-            print("📁 Archivos generados:")
-            print(f"   - {processor.artifacts_dir}/texto.md (texto original extraído)")
-            print(f"   - {processor.artifacts_dir}/texto_final.md (texto con descripciones insertadas)")
-            print(f"   - {processor.artifacts_dir}/imagenes_extraidas/ (imágenes)")
-            print(f"   - {processor.artifacts_dir}/image_descriptions/ (descripciones)")
-        else:
-            print("\n💥 Error en el procesamiento")
+        # Modo librería: el conversor residente convierte el siguiente documento mientras se
+        # describen las imágenes del actual (al reanudar no, porque docling puede no hacer falta).
+        # Solo se adelanta uno: cada conversión terminada (markdown y PNG) queda en memoria
+        # hasta que le toca a su documento
+        adelantar = processor.modo_docling == "libreria" and len(pdf_files) > 1 and not reanudar
+        
+        fallidos = []
+        for numero, pdf_file in enumerate(pdf_files, 1):
+            if adelantar and numero < len(pdf_files):
+                # El actual primero (la cola es FIFO), luego el siguiente
+                conversor_compartido().encolar(pdf_file)
+                conversor_compartido().encolar(pdf_files[numero])
+            artifacts_dir = None
+            if reanudar:
+                artifacts_dir = carpeta_reanudar or buscar_artifacts_reanudable(hash_archivo(pdf_file))
+                if not artifacts_dir or not os.path.isdir(artifacts_dir):
+                    print(f"⚠️ No hay ninguna ejecución previa de {pdf_file} que reanudar, se empieza de cero")
+                    artifacts_dir = None
+                else:
+                    print(f"🔁 Reanudando desde: {artifacts_dir}")
+            if artifacts_dir is None and len(pdf_files) > 1:
+                # Una carpeta por documento aunque empiecen en el mismo segundo
+                artifacts_dir = f"artifacts_{processor.timestamp}_{numero}"
+            if artifacts_dir:
+                processor = DocumentProcessor(artifacts_dir=artifacts_dir, usar_cache=usar_cache,
+                                              modo_docling=processor.modo_docling)
+            
+            # Ejecutar procesamiento completo
+            success = processor.procesar_documento(pdf_file)
+            
+            if success:
+                print(f"\n🎉 ¡Procesamiento de {pdf_file} completado exitosamente!")
+                print(f"📁 Directorio generado: {processor.artifacts_dir}")
+                print("📁 Archivos generados:")
+                print(f"   - {processor.artifacts_dir}/texto.md (texto original extraído)")
+                print(f"   - {processor.artifacts_dir}/texto_final.md (texto con descripciones insertadas)")
+                print(f"   - {processor.artifacts_dir}/imagenes_extraidas/ (imágenes)")
+                print(f"   - {processor.artifacts_dir}/image_descriptions/ (descripciones)")
+            else:
+                print(f"\n💥 Error en el procesamiento de {pdf_file}")
+                fallidos.append(pdf_file)
+        
+        if fallidos:
+            if len(pdf_files) > 1:
+                print(f"\n💥 {len(fallidos)}/{len(pdf_files)} documentos con errores: {', '.join(fallidos)}")
             sys.exit(1)
 
 if __name__ == "__main__":
@@ -10,9 +10,11 @@ import io
 class QwenVLClient:
     """Cliente para interactuar con el servidor Qwen2-VL"""
     
-    def __init__(self, server_url="http://localhost:5000"):
+    def __init__(self, server_url="http://localhost:5000", seed=None):
         """Inicializar cliente con URL del servidor"""
         self.server_url = server_url.rstrip('/')
+        # Con semilla fija el servidor puede responder desde su caché en peticiones repetidas
+        self.seed = seed
         self.session = requests.Session()
         # Timeout más largo para T4 (es más lenta)
         self.session.timeout = 120
@@ -56,6 +58,8 @@ class QwenVLClient:
                 with open(image_path, 'rb') as f:
                     files = {'image': f}
                     data = {'text': text_prompt}
+                    if self.seed is not None:
+                        data['seed'] = self.seed
                     
                     response = self.session.post(
                         f"{self.server_url}/analyze",
@@ -67,7 +71,7 @@ class QwenVLClient:
                 if response.status_code == 200:
                     result = response.json()
                     if result.get('success'):
-                        print("✅ Análisis completado!")
+                        print("✅ Análisis completado!" + (" (caché)" if result.get('cache') else ""))
                         return result['response']
                     else:
                         print(f"❌ Error del servidor: {result.get('error')}")
@@ -86,6 +90,58 @@ class QwenVLClient:
         print("❌ Falló después de todos los intentos")
         return None
     
+    def analyze_image_stream(self, image_path, text_prompt):
+        """Analizar imagen desde archivo mostrando la respuesta según se genera (SSE)"""
+        if not os.path.exists(image_path):
+            print(f"❌ Error: Archivo no encontrado: {image_path}")
+            return None
+        
+        try:
+            with open(image_path, 'rb') as f:
+                response = self.session.post(
+                    f"{self.server_url}/analyze_stream",
+                    files={'image': f},
+                    data=dict({'text': text_prompt}, **({'seed': self.seed} if self.seed is not None else {})),
+                    stream=True,
+                    timeout=120  # Timeout más largo para T4
+                )
+            
+            if response.status_code != 200:
+                print(f"❌ Error HTTP {response.status_code}: {response.text}")
+                return None
+            
+            # Cada evento SSE: líneas "event: ..." / "data: {...}" terminadas en línea vacía
+            evento = None
+            partes = []
+            with response:
+                for linea in response.iter_lines(decode_unicode=True):
+                    if not linea:
+                        evento = None
+                        continue
+                    if linea.startswith('event:'):
+                        evento = linea[len('event:'):].strip()
+                        continue
+                    if not linea.startswith('data:'):
+                        continue
+                    
+                    datos = json.loads(linea[len('data:'):].strip())
+                    if evento == 'error':
+                        print(f"\n❌ Error del servidor: {datos.get('error')}")
+                        return None
+                    if evento == 'fin':
+                        print(f"\n⏱️  Primer token: {datos.get('tiempo_primer_token_ms')} ms, "
+                              f"total: {datos.get('tiempo_total_ms')} ms")
+                        return datos.get('response', ''.join(partes).strip())
+                    
+                    partes.append(datos['token'])
+                    print(datos['token'], end='', flush=True)
+            
+            return ''.join(partes).strip()
+            
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Error de conexión: {e}")
+            return None
+    
     def analyze_image_base64(self, image_path, text_prompt):
         """Analizar imagen usando base64"""
         try:
@@ -115,6 +171,8 @@ class QwenVLClient:
                 'image': f"data:image/jpeg;base64,{image_b64}",
                 'text': text_prompt
             }
+            if self.seed is not None:
+                payload['seed'] = self.seed
             
             response = self.session.post(
                 f"{self.server_url}/analyze_base64",
@@ -138,7 +196,7 @@ class QwenVLClient:
             print(f"❌ Error procesando imagen: {e}")
             return None
     
-    def interactive_mode(self):
+    def interactive_mode(self, stream=False):
         """Modo interactivo para hacer múltiples consultas"""
         print("🎯 Modo interactivo iniciado")
         print("📝 Comandos disponibles:")
@@ -181,6 +239,11 @@ class QwenVLClient:
                 
                 # Analizar imagen
                 print("\n" + "="*50)
+                if stream:
+                    print("🤖 Respuesta del modelo:")
+                    result = self.analyze_image_stream(image_path, text_prompt)
+                    print("="*50)
+                    continue
                 result = self.analyze_image_file(image_path, text_prompt)
                 
                 if result:
@@ -281,11 +344,15 @@ def main():
                        help='Usar método base64 en lugar de upload')
     parser.add_argument('--status', action='store_true', 
                        help='Solo verificar estado del servidor')
+    parser.add_argument('--stream', action='store_true', 
+                       help='Mostrar la respuesta según se genera (server-sent events)')
+    parser.add_argument('--seed', type=int, 
+                       help='Semilla de muestreo; permite al servidor cachear respuestas repetidas')
     
     args = parser.parse_args()
     
     # Crear cliente
-    client = QwenVLClient(args.server)
+    client = QwenVLClient(args.server, seed=args.seed)
     
     print(f"🌐 Conectando a: {args.server}")
     
@@ -301,7 +368,7 @@ def main():
     
     # Modo interactivo
     if args.interactive:
-        client.interactive_mode()
+        client.interactive_mode(stream=args.stream)
         return
     
     # Análisis en lote
@@ -316,7 +383,12 @@ def main():
         print(f"❓ Pregunta: {args.text}")
         print("-" * 50)
         
-        if args.base64:
+        if args.stream:
+            print("\n🤖 Respuesta:")
+            if client.analyze_image_stream(args.image, args.text) is None:
+                print("❌ No se pudo obtener respuesta")
+            return
+        elif args.base64:
             result = client.analyze_image_base64(args.image, args.text)
         else:
             result = client.analyze_image_file(args.image, args.text)
@@ -334,10 +406,12 @@ def main():
     print("  python client.py --image foto.jpg --text '¿Qué ves?'  # Análisis individual")
     print("  python client.py --batch ./imagenes --questions preguntas.txt  # Lote")
     print("  python client.py --status                         # Estado del servidor")
+    print("  python client.py --image foto.jpg --text '¿Qué ves?' --stream  # Respuesta en streaming")
     print("\nEjemplos:")
     print("  python client.py -i")
     print("  python client.py --image ejemplo.jpg --text 'Describe esta imagen'")
     print("  python client.py --batch ./fotos --questions mis_preguntas.txt")
+    print("  python client.py --batch ./fotos --questions mis_preguntas.txt --seed 0  # Reutiliza la caché del servidor")
 
 if __name__ == '__main__':
     main()
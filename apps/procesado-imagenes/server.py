@@ -1,11 +1,13 @@
 import json
 import os
 import base64
+import threading
+import time
 from io import BytesIO
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context
 from PIL import Image
 import torch
-from transformers import Qwen2VLForConditionalGeneration, AutoProcessor
+from transformers import Qwen2VLForConditionalGeneration, AutoProcessor, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 import logging
 from functools import wraps
 from dotenv import load_dotenv
@@ -22,10 +24,30 @@ app = Flask(__name__)
 # Token de autenticación desde variables de entorno
 AUTH_TOKEN = os.getenv('AUTH_TOKEN', '123')
 
+MODEL_NAME = "Qwen/Qwen2-VL-7B-Instruct"
+# Parámetros de muestreo fijos de generate (forman parte de la clave de la caché)
+PARAMETROS_MUESTREO = {"do_sample": True, "temperature": 0.7}
+
+# Caché de respuestas: CACHE_RESPUESTAS=<entradas> y opcionalmente CACHE_SQLITE=<ruta> para persistirla
+from cache_respuestas import CacheRespuestas, MAX_ENTRADAS_CACHE, clave_respuesta, hash_contenido
+
 # Variables globales para el modelo
 model = None
 processor = None
 device = None
+cache_respuestas = None
+# El generador aleatorio de torch es global: las generaciones van de una en una para que la
+# semilla de una petición no se mezcle con los muestreos de otra (y su respuesta sea cacheable)
+lock_generacion = threading.Lock()
+
+class DetenerSiCancelado(StoppingCriteria):
+    """Corta generate() cuando el cliente del streaming se desconecta"""
+    
+    def __init__(self, cancelado):
+        self.cancelado = cancelado
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.cancelado.is_set()
 
 def require_auth(f):
     """Decorator para requerir autenticación"""
@@ -67,7 +89,7 @@ def load_model():
     try:
         logger.info("🔄 Cargando modelo Qwen2-VL...")
         
-        model_name = "Qwen/Qwen2-VL-7B-Instruct"
+        model_name = MODEL_NAME
         
         # Detectar dispositivo
         device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -96,7 +118,7 @@ def load_model():
         return False
 
 def process_image_from_base64(image_data):
-    """Procesar imagen desde base64"""
+    """Procesar imagen desde base64. Devuelve (imagen, bytes) o (None, None)"""
     try:
         # Remover prefijo data:image si existe
         if ',' in image_data:
@@ -110,13 +132,65 @@ def process_image_from_base64(image_data):
         if image.mode != 'RGB':
             image = image.convert('RGB')
             
-        return image
+        return image, image_bytes
         
     except Exception as e:
         logger.error(f"Error procesando imagen: {e}")
+        return None, None
+
+def leer_seed(valor):
+    """Semilla opcional de la petición (form-data o JSON). Lanza ValueError si no es entera"""
+    if valor is None or valor == '':
+        return None
+    return int(valor)
+
+def clave_cache(image_bytes, text_prompt, max_length, seed):
+    """
+    Clave de la caché de respuestas, o None si no hay caché o la petición no es cacheable:
+    el modelo muestrea, así que solo se cachea cuando el cliente fija una semilla.
+    """
+    if not cache_respuestas:
         return None
+    parametros = dict(PARAMETROS_MUESTREO, max_new_tokens=max_length, seed=seed)
+    if not cache_respuestas.es_cacheable(parametros):
+        cache_respuestas.contar_no_cacheable()
+        return None
+    return clave_respuesta(MODEL_NAME, text_prompt, parametros, hash_imagen=hash_contenido(image_bytes))
+
+def preparar_entradas(image, text_prompt):
+    """Aplicar el template de chat y procesar imagen + texto para el modelo"""
+    # Preparar mensajes
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "image", "image": image},
+                {"type": "text", "text": text_prompt}
+            ]
+        }
+    ]
+    
+    # Aplicar template de chat
+    text = processor.apply_chat_template(
+        messages, 
+        tokenize=False, 
+        add_generation_prompt=True
+    )
+    
+    # Procesar entrada
+    inputs = processor(
+        text=[text], 
+        images=[image], 
+        return_tensors="pt"
+    )
+    
+    # Mover al dispositivo
+    if device == "cuda":
+        inputs = {k: v.to(device) if hasattr(v, 'to') else v for k, v in inputs.items()}
+    
+    return inputs
 
-def generate_response(image, text_prompt, max_length=512):
+def generate_response(image, text_prompt, max_length=512, seed=None):
     """Generar respuesta del modelo"""
     global model, processor
     
@@ -124,43 +198,17 @@ def generate_response(image, text_prompt, max_length=512):
         return "Error: Modelo no cargado"
     
     try:
-        # Preparar mensajes
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image", "image": image},
-                    {"type": "text", "text": text_prompt}
-                ]
-            }
-        ]
-        
-        # Aplicar template de chat
-        text = processor.apply_chat_template(
-            messages, 
-            tokenize=False, 
-            add_generation_prompt=True
-        )
-        
-        # Procesar entrada
-        inputs = processor(
-            text=[text], 
-            images=[image], 
-            return_tensors="pt"
-        )
-        
-        # Mover al dispositivo
-        if device == "cuda":
-            inputs = {k: v.to(device) if hasattr(v, 'to') else v for k, v in inputs.items()}
+        inputs = preparar_entradas(image, text_prompt)
         
         # Generar respuesta
-        with torch.no_grad():
+        with lock_generacion, torch.no_grad():
+            if seed is not None:
+                torch.manual_seed(seed)
             outputs = model.generate(
                 **inputs,
                 max_new_tokens=max_length,
-                temperature=0.7,
-                do_sample=True,
-                pad_token_id=processor.tokenizer.eos_token_id
+                pad_token_id=processor.tokenizer.eos_token_id,
+                **PARAMETROS_MUESTREO
             )
         
         # Decodificar respuesta
@@ -179,6 +227,53 @@ def generate_response(image, text_prompt, max_length=512):
         logger.error(f"Error generando respuesta: {e}")
         return f"Error: {str(e)}"
 
+def generate_response_stream(image, text_prompt, max_length=512, seed=None):
+    """
+    Generar respuesta del modelo devolviendo el texto a medida que se produce.
+    model.generate corre en un hilo aparte y escribe en un TextIteratorStreamer.
+    Si el cliente se desconecta, el generador se cierra y la generación se corta
+    (libera lock_generacion en vez de seguir hasta max_length).
+    """
+    inputs = preparar_entradas(image, text_prompt)
+    # skip_prompt evita tener que separar la respuesta por "assistant\n"
+    streamer = TextIteratorStreamer(processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+    cancelado = threading.Event()
+    errores = []
+    
+    def generar():
+        try:
+            with lock_generacion, torch.no_grad():
+                if seed is not None:
+                    torch.manual_seed(seed)
+                model.generate(
+                    **inputs,
+                    streamer=streamer,
+                    max_new_tokens=max_length,
+                    pad_token_id=processor.tokenizer.eos_token_id,
+                    stopping_criteria=StoppingCriteriaList([DetenerSiCancelado(cancelado)]),
+                    **PARAMETROS_MUESTREO
+                )
+        except Exception as e:
+            errores.append(e)
+            streamer.end()
+    
+    hilo = threading.Thread(target=generar, daemon=True)
+    hilo.start()
+    try:
+        for texto in streamer:
+            if texto:
+                yield texto
+    finally:
+        cancelado.set()
+    hilo.join()
+    if errores:
+        raise errores[0]
+
+def evento_sse(datos, evento=None):
+    """Formatear un evento server-sent events con datos JSON"""
+    cabecera = f"event: {evento}\n" if evento else ""
+    return f"{cabecera}data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
 # Plantilla HTML para la interfaz web
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -395,19 +490,37 @@ def analyze():
                 'error': 'No se proporcionó texto'
             }), 400
         
+        try:
+            seed = leer_seed(request.form.get('seed'))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'seed debe ser un entero'
+            }), 400
+        
         # Procesar imagen
-        image = Image.open(image_file.stream)
+        image_bytes = image_file.read()
+        clave = clave_cache(image_bytes, text_prompt, 512, seed)
+        guardada = cache_respuestas.obtener(clave) if clave else None
+        if guardada:
+            return jsonify(dict(guardada, cache=True))
+        
+        image = Image.open(BytesIO(image_bytes))
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
         # Generar respuesta
-        response = generate_response(image, text_prompt)
+        response = generate_response(image, text_prompt, seed=seed)
         
-        return jsonify({
+        resultado = {
             'success': True,
             'response': response,
             'prompt': text_prompt
-        })
+        }
+        # generate_response devuelve los errores como texto: no se cachean
+        if clave and not response.startswith('Error'):
+            cache_respuestas.guardar(clave, resultado)
+        return jsonify(dict(resultado, cache=False))
         
     except Exception as e:
         logger.error(f"Error en análisis: {e}")
@@ -416,6 +529,93 @@ def analyze():
             'error': str(e)
         }), 500
 
+@app.route('/analyze_stream', methods=['POST'])
+@require_auth
+def analyze_stream():
+    """
+    Endpoint para analizar imagen con texto devolviendo server-sent events:
+        data: {"token": "..."}                     por cada fragmento de texto
+        event: fin   data: {"response": "...", "tiempo_primer_token_ms": ...}
+        event: error data: {"error": "..."}
+    """
+    if model is None or processor is None:
+        return jsonify({
+            'success': False,
+            'error': 'Modelo no cargado'
+        }), 500
+    
+    if 'image' not in request.files or request.files['image'].filename == '':
+        return jsonify({
+            'success': False,
+            'error': 'No se proporcionó imagen'
+        }), 400
+    
+    text_prompt = request.form.get('text', '')
+    if not text_prompt.strip():
+        return jsonify({
+            'success': False,
+            'error': 'No se proporcionó texto'
+        }), 400
+    
+    try:
+        seed = leer_seed(request.form.get('seed'))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'seed debe ser un entero'
+        }), 400
+    
+    try:
+        image_bytes = request.files['image'].read()
+        image = Image.open(BytesIO(image_bytes))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Imagen no válida: {e}'
+        }), 400
+    
+    clave = clave_cache(image_bytes, text_prompt, 512, seed)
+    guardada = cache_respuestas.obtener(clave) if clave else None
+    
+    def eventos():
+        if guardada:
+            # Acierto de caché: la respuesta completa llega como un único fragmento
+            yield evento_sse({'token': guardada['response']})
+            yield evento_sse(dict(guardada, tiempo_primer_token_ms=0.0, tiempo_total_ms=0.0, cache=True), 'fin')
+            return
+        
+        inicio = time.perf_counter()
+        primer_token = None
+        partes = []
+        try:
+            for texto in generate_response_stream(image, text_prompt, seed=seed):
+                if primer_token is None:
+                    primer_token = time.perf_counter() - inicio
+                partes.append(texto)
+                yield evento_sse({'token': texto})
+        except Exception as e:
+            logger.error(f"Error en análisis streaming: {e}")
+            yield evento_sse({'error': str(e)}, 'error')
+            return
+        resultado = {
+            'success': True,
+            'response': ''.join(partes).strip(),
+            'prompt': text_prompt
+        }
+        if clave:
+            cache_respuestas.guardar(clave, resultado)
+        yield evento_sse(dict(
+            resultado,
+            tiempo_primer_token_ms=round(1000 * (primer_token or 0), 1),
+            tiempo_total_ms=round(1000 * (time.perf_counter() - inicio), 1),
+            cache=False
+        ), 'fin')
+    
+    return Response(stream_with_context(eventos()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/analyze_base64', methods=['POST'])
 @require_auth
 def analyze_base64():
@@ -429,22 +629,38 @@ def analyze_base64():
                 'error': 'Faltan parámetros: image y text requeridos'
             }), 400
         
+        try:
+            seed = leer_seed(data.get('seed'))
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'seed debe ser un entero'
+            }), 400
+        
         # Procesar imagen desde base64
-        image = process_image_from_base64(data['image'])
+        image, image_bytes = process_image_from_base64(data['image'])
         if image is None:
             return jsonify({
                 'success': False,
                 'error': 'Error procesando imagen base64'
             }), 400
         
+        clave = clave_cache(image_bytes, data['text'], 512, seed)
+        guardada = cache_respuestas.obtener(clave) if clave else None
+        if guardada:
+            return jsonify(dict(guardada, cache=True))
+        
         # Generar respuesta
-        response = generate_response(image, data['text'])
+        response = generate_response(image, data['text'], seed=seed)
         
-        return jsonify({
+        resultado = {
             'success': True,
             'response': response,
             'prompt': data['text']
-        })
+        }
+        if clave and not response.startswith('Error'):
+            cache_respuestas.guardar(clave, resultado)
+        return jsonify(dict(resultado, cache=False))
         
     except Exception as e:
         logger.error(f"Error en análisis base64: {e}")
@@ -462,10 +678,29 @@ def health():
         'device': str(device) if device else 'unknown'
     })
 
+@app.route('/metrics')
+def metrics():
+    """Aciertos y fallos de la caché de respuestas"""
+    return jsonify({
+        'cache_respuestas': cache_respuestas.metricas() if cache_respuestas else None
+    })
+
 def main():
     """Función principal"""
+    global cache_respuestas
+    
     logger.info("🚀 Iniciando servidor Qwen2-VL...")
     
+    # Caché de respuestas opcional
+    ruta_sqlite = os.environ.get('CACHE_SQLITE')
+    if os.environ.get('CACHE_RESPUESTAS') or ruta_sqlite:
+        # Las respuestas muestreadas con semilla son reproducibles: se generan de una en una
+        cache_respuestas = CacheRespuestas(
+            int(os.environ.get('CACHE_RESPUESTAS') or MAX_ENTRADAS_CACHE), ruta_sqlite,
+            cachear_con_semilla=True
+        )
+        logger.info(f"🗃️  Caché de respuestas activa ({ruta_sqlite or 'solo memoria'})")
+    
     # Cargar modelo al inicio
     if not load_model():
         logger.error("❌ No se pudo cargar el modelo. El servidor se iniciará sin modelo.")
@@ -481,7 +716,9 @@ def main():
     logger.info("  GET  / - Interfaz web (requiere auth)")
     logger.info("  GET  /status - Estado del servidor (requiere auth)")
     logger.info("  POST /analyze - Analizar imagen (form-data) (requiere auth)")
+    logger.info("  POST /analyze_stream - Analizar imagen en streaming SSE (requiere auth)")
     logger.info("  POST /analyze_base64 - Analizar imagen (base64) (requiere auth)")
+    logger.info("  GET  /metrics - Aciertos de la caché de respuestas (sin auth)")
     logger.info("  GET  /health - Estado de salud (sin auth)")
     
     # Iniciar servidor
@@ -0,0 +1,123 @@
+"""
+Varios adaptadores LoRA sobre un único modelo base residente en memoria.
+
+Los adaptadores se registran por nombre (p. ej. "magic1-v3" -> ./lora-phi4-magic1) y se
+cargan bajo demanda en el mismo PeftModel. Cuando se supera el número máximo de
+adaptadores cargados o su memoria, se descarga el menos usado recientemente.
+
+Un lote puede mezclar adaptadores: peft aplica a cada fila el suyo con `adapter_names`.
+"""
+
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MAX_ADAPTADORES = 4
+MAX_MB_ADAPTADORES = 4096
+
+
+class GestorAdaptadores:
+    """Registro y caché LRU de adaptadores LoRA sobre un modelo base compartido"""
+
+    def __init__(self, model_base, max_adaptadores=MAX_ADAPTADORES, max_mb=MAX_MB_ADAPTADORES):
+        self.model = model_base
+        self.max_adaptadores = max_adaptadores
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # nombre -> ruta del adaptador
+        self.rutas = {}
+        # nombre -> bytes, en orden de uso (el primero es el menos reciente)
+        self.cargados = OrderedDict()
+
+    def registrar(self, nombre, ruta):
+        """Registra un adaptador; no se carga hasta que una petición lo usa"""
+        if nombre in self.cargados and self.rutas.get(nombre) != ruta:
+            self._descargar(nombre)
+        self.rutas[nombre] = ruta
+        logger.info(f"📝 Adaptador registrado: {nombre} -> {ruta}")
+
+    def identificador(self, nombre):
+        """
+        "nombre=ruta": distingue un adaptador re-registrado con el mismo nombre y otros pesos.
+        Es la clave del adaptador en las cachés de prefijos y de respuestas.
+        """
+        return f"{nombre}={self.rutas[nombre]}"
+
+    def eliminar(self, nombre):
+        """Descarga (si está cargado) y olvida un adaptador"""
+        if nombre not in self.rutas:
+            raise KeyError(nombre)
+        if nombre in self.cargados:
+            if len(self.cargados) == 1:
+                raise ValueError("No se puede descargar el único adaptador cargado")
+            self._descargar(nombre)
+        del self.rutas[nombre]
+
+    def asegurar(self, nombres):
+        """
+        Garantiza que los adaptadores indicados están cargados, cargando los que falten
+        y expulsando por LRU otros si se supera el límite.
+
+        Raises:
+            KeyError: si algún nombre no está registrado
+        """
+        for nombre in nombres:
+            if nombre not in self.rutas:
+                raise KeyError(nombre)
+
+        for nombre in dict.fromkeys(nombres):
+            if nombre in self.cargados:
+                self.cargados.move_to_end(nombre)
+            else:
+                self._cargar(nombre)
+        self._expulsar(protegidos=set(nombres))
+
+    def kwargs_generacion(self, nombres):
+        """
+        Argumentos extra para generate() en un lote con los adaptadores `nombres` (uno por fila).
+        Si todo el lote usa el mismo se activa directamente, sin el coste del modo mixto.
+        """
+        if len(set(nombres)) == 1:
+            self.model.set_adapter(nombres[0])
+            return {}
+        return {"adapter_names": list(nombres)}
+
+    def _cargar(self, nombre):
+        from peft import PeftModel
+
+        ruta = self.rutas[nombre]
+        logger.info(f"🔄 Cargando adaptador {nombre} desde {ruta}...")
+        if isinstance(self.model, PeftModel):
+            self.model.load_adapter(ruta, adapter_name=nombre)
+        else:
+            # Primer adaptador: envuelve el modelo base
+            self.model = PeftModel.from_pretrained(self.model, ruta, adapter_name=nombre)
+        self.model.eval()
+
+        tamano = sum(
+            p.numel() * p.element_size()
+            for n, p in self.model.named_parameters()
+            if f".{nombre}." in n
+        )
+        self.cargados[nombre] = tamano
+        logger.info(f"✅ Adaptador {nombre} cargado ({tamano / 1024 / 1024:.1f} MB)")
+
+    def _descargar(self, nombre):
+        self.model.delete_adapter(nombre)
+        del self.cargados[nombre]
+        logger.info(f"🗑️  Adaptador {nombre} descargado")
+
+    def _expulsar(self, protegidos):
+        while len(self.cargados) > self.max_adaptadores or sum(self.cargados.values()) > self.max_bytes:
+            candidato = next((n for n in self.cargados if n not in protegidos), None)
+            if candidato is None:
+                break
+            self._descargar(candidato)
+
+    def estado(self):
+        return {
+            'registrados': dict(self.rutas),
+            'cargados': {n: round(b / 1024 / 1024, 1) for n, b in self.cargados.items()},
+            'max_adaptadores': self.max_adaptadores,
+            'max_mb': round(self.max_bytes / 1024 / 1024),
+        }
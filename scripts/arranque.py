@@ -0,0 +1,135 @@
+"""
+Arranque de la inferencia: detección de capacidades y perfil de tiempos.
+
+En lugar de intentar cargar el modelo en bfloat16, luego en float16 y luego en 4-bit
+(cada intento fallido cuesta una carga completa), se consulta antes qué soporta el
+hardware y cuánto ocupa el modelo, sin cargar pesos, y se elige una única ruta de carga.
+"""
+
+import importlib.util
+import json
+import os
+import struct
+import time
+from contextlib import contextmanager
+
+# Margen de VRAM que se deja libre para activaciones y KV cache
+MARGEN_VRAM = 0.85
+
+
+class PerfilArranque:
+    """Mide la duración de cada fase del arranque"""
+
+    def __init__(self, activo=True):
+        self.activo = activo
+        self.fases = []
+
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases.append((nombre, time.perf_counter() - inicio))
+
+    def imprimir(self):
+        if not self.activo or not self.fases:
+            return
+        total = sum(duracion for _, duracion in self.fases)
+        print("\n⏱️  Perfil de arranque:")
+        for nombre, duracion in self.fases:
+            print(f"   {nombre:<24} {duracion:8.2f}s  ({100 * duracion / total:5.1f}%)")
+        print(f"   {'total':<24} {total:8.2f}s")
+
+
+def _parametros_safetensors_local(model_dir):
+    """Cuenta parámetros leyendo solo la cabecera JSON de cada .safetensors"""
+    total = 0
+    archivos = [f for f in os.listdir(model_dir) if f.endswith(".safetensors")]
+    if not archivos:
+        return None
+    for archivo in archivos:
+        with open(os.path.join(model_dir, archivo), "rb") as f:
+            longitud_cabecera = struct.unpack("<Q", f.read(8))[0]
+            cabecera = json.loads(f.read(longitud_cabecera))
+        for nombre, info in cabecera.items():
+            if nombre == "__metadata__":
+                continue
+            n = 1
+            for dim in info["shape"]:
+                n *= dim
+            total += n
+    return total
+
+
+def contar_parametros(model_id):
+    """
+    Número de parámetros del modelo sin descargar ni cargar los pesos.
+
+    Returns:
+        int o None si no se puede determinar
+    """
+    try:
+        if os.path.isdir(model_id):
+            return _parametros_safetensors_local(model_id)
+        from huggingface_hub import get_safetensors_metadata
+        return sum(get_safetensors_metadata(model_id).parameter_count.values())
+    except Exception:
+        return None
+
+
+def detectar_capacidades():
+    """Qué soporta el hardware, sin cargar ningún modelo"""
+    import torch
+
+    capacidades = {
+        "cuda": torch.cuda.is_available(),
+        "bf16": False,
+        "vram_libre": 0,
+        "bitsandbytes": importlib.util.find_spec("bitsandbytes") is not None,
+    }
+    if capacidades["cuda"]:
+        capacidades["bf16"] = torch.cuda.is_bf16_supported()
+        capacidades["vram_libre"] = sum(
+            torch.cuda.mem_get_info(i)[0] for i in range(torch.cuda.device_count())
+        )
+    return capacidades
+
+
+def elegir_configuracion_carga(model_id, capacidades=None):
+    """
+    Elige una única forma de cargar el modelo.
+
+    Returns:
+        dict: {"descripcion": str, "kwargs": kwargs para from_pretrained}
+    """
+    import torch
+
+    capacidades = capacidades or detectar_capacidades()
+    parametros = contar_parametros(model_id)
+    # Los pesos se leen con mmap desde safetensors, sin copia intermedia en RAM
+    base = {"trust_remote_code": True, "use_safetensors": True, "low_cpu_mem_usage": True}
+
+    if not capacidades["cuda"]:
+        return {"descripcion": "CPU, bfloat16", "kwargs": dict(base, torch_dtype=torch.bfloat16)}
+
+    # En 16 bits cada parámetro ocupa 2 bytes; si no se conoce el tamaño se asume que cabe
+    cabe_16bits = parametros is None or parametros * 2 < capacidades["vram_libre"] * MARGEN_VRAM
+    base["device_map"] = "auto"
+
+    if cabe_16bits and capacidades["bf16"]:
+        return {"descripcion": "GPU, bfloat16", "kwargs": dict(base, torch_dtype=torch.bfloat16)}
+    if cabe_16bits:
+        # p. ej. Tesla T4: sin soporte nativo de bfloat16
+        return {"descripcion": "GPU, float16", "kwargs": dict(base, torch_dtype=torch.float16)}
+    if capacidades["bitsandbytes"]:
+        from transformers import BitsAndBytesConfig
+        return {
+            "descripcion": "GPU, 4-bit (no cabe en 16 bits)",
+            "kwargs": dict(base, quantization_config=BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.bfloat16 if capacidades["bf16"] else torch.float16
+            ))
+        }
+    # Sin bitsandbytes: device_map="auto" reparte entre GPU y CPU
+    return {"descripcion": "GPU + CPU offload, float16", "kwargs": dict(base, torch_dtype=torch.float16)}
@@ -0,0 +1,82 @@
+"""
+Benchmark en CPU: latencia de generación con el adaptador LoRA sin fusionar (PeftModel)
+frente al mismo modelo con el adaptador fusionado en los pesos base (merge_and_unload).
+
+Usa un modelo Phi3 diminuto con pesos aleatorios, así que no necesita GPU ni descargas.
+
+Uso:
+    python benchmark_merge.py
+    python benchmark_merge.py --hidden-size 512 --layers 8 --lora-r 128 --new-tokens 64
+"""
+
+import argparse
+import copy
+import statistics
+import time
+
+import torch
+
+from modelo_tiny import crear_modelo_tiny
+
+
+def medir_generacion(model, input_ids, new_tokens, repeticiones):
+    """Devuelve las latencias (s) de `repeticiones` generaciones greedy"""
+    kwargs = dict(max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False, pad_token_id=0)
+    with torch.no_grad():
+        # Calentamiento
+        model.generate(input_ids, **kwargs)
+        latencias = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            model.generate(input_ids, **kwargs)
+            latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LoRA fusionado vs. sin fusionar (CPU)")
+    parser.add_argument('--hidden-size', type=int, default=256)
+    parser.add_argument('--layers', type=int, default=4)
+    parser.add_argument('--lora-r', type=int, default=128)
+    parser.add_argument('--batch', type=int, default=1)
+    parser.add_argument('--prompt-tokens', type=int, default=64)
+    parser.add_argument('--new-tokens', type=int, default=32)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=None, help='Hilos de torch en CPU')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"🔧 Modelo tiny: hidden={args.hidden_size}, capas={args.layers}, LoRA r={args.lora_r}")
+    sin_fusionar = crear_modelo_tiny(
+        hidden_size=args.hidden_size,
+        intermediate_size=args.hidden_size * 4,
+        num_layers=args.layers,
+        lora_r=args.lora_r,
+        lora_alpha=args.lora_r * 2,
+    )
+    fusionado = copy.deepcopy(sin_fusionar).merge_and_unload()
+    fusionado.eval()
+
+    input_ids = torch.randint(2, 1024, (args.batch, args.prompt_tokens))
+
+    # Comprobar que la fusión no cambia las salidas
+    with torch.no_grad():
+        diferencia = (sin_fusionar(input_ids).logits - fusionado(input_ids).logits).abs().max().item()
+    print(f"🔍 Diferencia máxima de logits tras fusionar: {diferencia:.2e}")
+
+    resultados = {}
+    for nombre, model in [("sin fusionar (PeftModel)", sin_fusionar), ("fusionado", fusionado)]:
+        latencias = medir_generacion(model, input_ids, args.new_tokens, args.repeticiones)
+        mediana = statistics.median(latencias)
+        resultados[nombre] = mediana
+        ms_token = mediana * 1000 / args.new_tokens
+        print(f"⏱️  {nombre:<26} mediana {mediana * 1000:8.1f} ms  ({ms_token:.2f} ms/token)")
+
+    mejora = resultados["sin fusionar (PeftModel)"] / resultados["fusionado"]
+    print(f"\n🚀 Aceleración del modelo fusionado: {mejora:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
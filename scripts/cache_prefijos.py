@@ -0,0 +1,159 @@
+"""
+Caché de KV (past_key_values) para prefijos de prompt fijos.
+
+Los prompts del dataset y del RAG empiezan siempre por el mismo preámbulo
+("You are an expert researcher in cognitive psychology...", "Contesta la siguiente
+pregunta utilizando el contexto..."). Se precalcula una vez el KV de cada prefijo
+registrado y las peticiones que empiezan por él solo necesitan el prefill del resto.
+
+Las entradas se indexan por el hash de los token ids del prefijo (y del adaptador LoRA
+activo, ya que cambia las proyecciones q/k/v) y se expulsan por LRU cuando se supera el
+límite de memoria. El adaptador se identifica por "nombre=ruta", de modo que un adaptador
+re-registrado con otros pesos no reutiliza el KV antiguo (que además se puede descartar
+con olvidar_adaptador).
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Límite de memoria por defecto para todos los prefijos cacheados
+MAX_MB_PREFIJOS = 512
+
+
+def hash_tokens(token_ids, adaptador=None):
+    """Hash estable de una secuencia de token ids (y del adaptador con el que se calcula el KV)"""
+    clave = f"{adaptador or ''}|" + ",".join(map(str, token_ids))
+    return hashlib.sha256(clave.encode()).hexdigest()
+
+
+def tamano_cache_bytes(past_key_values):
+    """Bytes ocupados por los tensores key/value de todas las capas"""
+    # transformers >= 5: DynamicCache con .layers (cada capa con .keys/.values); al iterarlo
+    # devuelve (keys, values, None), así que se ignora todo lo que no sea un tensor
+    capas = getattr(past_key_values, "layers", None)
+    if capas is not None:
+        tensores = [t for capa in capas for t in (getattr(capa, "keys", None), getattr(capa, "values", None))]
+    else:
+        tensores = [t for capa in past_key_values for t in capa]
+    return sum(t.numel() * t.element_size() for t in tensores if isinstance(t, torch.Tensor))
+
+
+class CachePrefijos:
+    """Caché LRU de past_key_values de prefijos registrados"""
+
+    def __init__(self, model, tokenizer, max_mb=MAX_MB_PREFIJOS):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # hash -> (longitud en tokens, past_key_values, bytes, adaptador)
+        self.entradas = OrderedDict()
+        self.bytes_totales = 0
+        self.lock = threading.Lock()
+
+        # Métricas
+        self.aciertos = 0
+        self.fallos = 0
+        self.tokens_ahorrados = 0
+
+    def registrar(self, texto_prefijo, adaptador=None):
+        """
+        Precalcula y guarda el KV de un prefijo (texto tal como aparece al inicio del prompt
+        formateado, p. ej. "<s>[INST] You are an expert researcher...").
+
+        Con varios adaptadores, `adaptador` debe ser el que está activo en el modelo.
+
+        El último token del prefijo se descarta: al tokenizar el prompt completo podría
+        fusionarse con el texto que viene detrás y entonces los ids ya no coincidirían.
+
+        Returns:
+            int: número de tokens del prefijo cacheado (0 si es demasiado corto)
+        """
+        token_ids = self.tokenizer(texto_prefijo)["input_ids"][:-1]
+        if len(token_ids) < 2:
+            return 0
+
+        clave = hash_tokens(token_ids, adaptador)
+        with self.lock:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                return len(token_ids)
+
+        with torch.no_grad():
+            salida = self.model(
+                input_ids=torch.tensor([token_ids], device=self.model.device),
+                use_cache=True
+            )
+        past_key_values = salida.past_key_values
+        tamano = tamano_cache_bytes(past_key_values)
+
+        with self.lock:
+            self.entradas[clave] = (len(token_ids), past_key_values, tamano, adaptador)
+            self.bytes_totales += tamano
+            self._expulsar()
+        logger.info(f"🧠 Prefijo cacheado: {len(token_ids)} tokens, {tamano / 1024 / 1024:.1f} MB")
+        return len(token_ids)
+
+    def _expulsar(self):
+        """Expulsa las entradas menos usadas hasta respetar el límite de memoria"""
+        while self.bytes_totales > self.max_bytes and len(self.entradas) > 1:
+            _, (longitud, _, tamano, _) = self.entradas.popitem(last=False)
+            self.bytes_totales -= tamano
+            logger.info(f"🗑️  Prefijo expulsado de la caché ({longitud} tokens)")
+
+    def buscar(self, token_ids, adaptador=None):
+        """
+        Busca el prefijo registrado más largo con el que empieza token_ids (para ese adaptador).
+
+        Returns:
+            tuple: (longitud, copia de past_key_values) o (0, None) si no hay coincidencia.
+                La copia se puede pasar a generate(), que la amplía in-place.
+        """
+        with self.lock:
+            longitudes = sorted({entrada[0] for entrada in self.entradas.values()}, reverse=True)
+            for longitud in longitudes:
+                # Siempre tiene que quedar al menos un token por procesar
+                if longitud >= len(token_ids):
+                    continue
+                clave = hash_tokens(token_ids[:longitud], adaptador)
+                if clave in self.entradas:
+                    self.entradas.move_to_end(clave)
+                    past_key_values = self.entradas[clave][1]
+                    self.aciertos += 1
+                    self.tokens_ahorrados += longitud
+                    break
+            else:
+                self.fallos += 1
+                return 0, None
+        return longitud, copy.deepcopy(past_key_values)
+
+    def olvidar_adaptador(self, adaptador):
+        """
+        Descarta los prefijos calculados con un adaptador (p. ej. al re-registrarlo con otra ruta)
+
+        Returns:
+            int: número de prefijos descartados
+        """
+        with self.lock:
+            claves = [clave for clave, entrada in self.entradas.items() if entrada[3] == adaptador]
+            for clave in claves:
+                self.bytes_totales -= self.entradas.pop(clave)[2]
+        if claves:
+            logger.info(f"🗑️  {len(claves)} prefijos descartados del adaptador {adaptador}")
+        return len(claves)
+
+    def metricas(self):
+        with self.lock:
+            return {
+                'prefijos': len(self.entradas),
+                'memoria_mb': round(self.bytes_totales / 1024 / 1024, 1),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tokens_prefill_ahorrados': self.tokens_ahorrados,
+            }
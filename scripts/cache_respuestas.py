@@ -0,0 +1,186 @@
+"""
+Caché de respuestas generadas para los servidores de generación.
+
+test_rag_batch.py, client.py batch_analyze y process_document.py vuelven a enviar los
+mismos prompts (y las mismas imágenes) en cada ejecución. La clave de cada respuesta es
+el hash de modelo, adaptador, prompt normalizado, hash de la imagen y parámetros de
+muestreo. Hay dos niveles: un LRU en memoria y, opcionalmente, una base SQLite en disco
+que sobrevive a los reinicios del servidor.
+
+Solo se cachean las peticiones deterministas: greedy siempre y, con cachear_con_semilla,
+también las muestreadas con una semilla fijada por el cliente (el servidor de imágenes
+genera de una en una y fija la semilla con el modelo bloqueado, así que la misma semilla
+reproduce la misma respuesta). Sin semilla cada llamada debe poder dar una respuesta
+distinta: guardar la primera muestra la congelaría para siempre.
+
+Este archivo existe dos veces, idéntico: scripts/cache_respuestas.py (servidor LoRA) y
+apps/procesado-imagenes/cache_respuestas.py (servidor de imágenes), porque cada servidor
+se despliega por separado. Cualquier cambio se aplica a los dos.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Entradas por defecto del LRU en memoria
+MAX_ENTRADAS_CACHE = 1024
+
+
+def normalizar_prompt(texto):
+    """
+    Forma canónica del prompt: Unicode NFC, saltos de línea \\n y sin espacios en los extremos.
+    El servidor genera con el prompt ya normalizado para que clave y respuesta coincidan.
+    """
+    texto = unicodedata.normalize("NFC", texto)
+    return texto.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def hash_contenido(datos):
+    """sha256 de unos bytes (p. ej. el contenido de una imagen)"""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def es_cacheable(parametros, cachear_con_semilla=False):
+    """Greedy siempre; muestreo solo con cachear_con_semilla y una semilla fijada por el cliente"""
+    if not parametros.get("do_sample"):
+        return True
+    return cachear_con_semilla and parametros.get("seed") is not None
+
+
+def clave_respuesta(modelo, prompt, parametros, adaptador=None, hash_imagen=None):
+    """Hash de todo lo que determina la respuesta"""
+    # Los parámetros que no son JSON (p. ej. stopping_criteria) no forman parte de la clave
+    parametros = {k: v for k, v in parametros.items() if isinstance(v, (str, int, float, bool, type(None)))}
+    clave = json.dumps({
+        "modelo": modelo,
+        "adaptador": adaptador,
+        "prompt": normalizar_prompt(prompt),
+        "imagen": hash_imagen,
+        "parametros": parametros,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(clave.encode()).hexdigest()
+
+
+class AlmacenSQLite:
+    """Respuestas en disco, con expulsión LRU por fecha de último uso"""
+
+    def __init__(self, ruta, max_entradas=None):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.lock = threading.Lock()
+        # Flask atiende peticiones en varios hilos; el lock serializa el acceso a la conexión
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " clave TEXT PRIMARY KEY, valor TEXT NOT NULL, creado REAL NOT NULL, usado REAL NOT NULL)"
+        )
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS idx_usado ON respuestas (usado)")
+        self.conexion.commit()
+
+    def obtener(self, clave):
+        with self.lock:
+            fila = self.conexion.execute("SELECT valor FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            self.conexion.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (time.time(), clave))
+            self.conexion.commit()
+        return json.loads(fila[0])
+
+    def guardar(self, clave, valor):
+        ahora = time.time()
+        with self.lock:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, creado, usado) VALUES (?, ?, ?, ?)",
+                (clave, json.dumps(valor, ensure_ascii=False), ahora, ahora)
+            )
+            if self.max_entradas:
+                self.conexion.execute(
+                    "DELETE FROM respuestas WHERE clave IN ("
+                    " SELECT clave FROM respuestas ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entradas,)
+                )
+            self.conexion.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+
+
+class CacheRespuestas:
+    """LRU en memoria delante de un almacén en disco opcional"""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_CACHE, ruta_sqlite=None, max_entradas_disco=None,
+                 cachear_con_semilla=False):
+        self.max_entradas = max_entradas
+        self.cachear_con_semilla = cachear_con_semilla
+        self.memoria = OrderedDict()
+        self.disco = AlmacenSQLite(ruta_sqlite, max_entradas_disco) if ruta_sqlite else None
+        self.lock = threading.Lock()
+
+        # Métricas
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.no_cacheables = 0
+
+    def obtener(self, clave):
+        """Respuesta guardada (dict) o None"""
+        with self.lock:
+            if clave in self.memoria:
+                self.memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return self.memoria[clave]
+
+        valor = self.disco.obtener(clave) if self.disco is not None else None
+        with self.lock:
+            if valor is None:
+                self.fallos += 1
+                return None
+            self.aciertos_disco += 1
+            self._guardar_memoria(clave, valor)
+        return valor
+
+    def guardar(self, clave, valor):
+        with self.lock:
+            self._guardar_memoria(clave, valor)
+        if self.disco is not None:
+            try:
+                self.disco.guardar(clave, valor)
+            except sqlite3.Error as e:
+                # Un fallo del disco no debe romper la petición, solo se pierde la persistencia
+                logger.warning(f"⚠️ No se pudo guardar la respuesta en {self.disco.ruta}: {e}")
+
+    def es_cacheable(self, parametros):
+        return es_cacheable(parametros, self.cachear_con_semilla)
+
+    def contar_no_cacheable(self):
+        with self.lock:
+            self.no_cacheables += 1
+
+    def _guardar_memoria(self, clave, valor):
+        self.memoria[clave] = valor
+        self.memoria.move_to_end(clave)
+        while len(self.memoria) > self.max_entradas:
+            self.memoria.popitem(last=False)
+
+    def metricas(self):
+        with self.lock:
+            aciertos = self.aciertos_memoria + self.aciertos_disco
+            consultas = aciertos + self.fallos
+            return {
+                'entradas_memoria': len(self.memoria),
+                'entradas_disco': len(self.disco) if self.disco is not None else None,
+                'aciertos_memoria': self.aciertos_memoria,
+                'aciertos_disco': self.aciertos_disco,
+                'fallos': self.fallos,
+                'no_cacheables': self.no_cacheables,
+                'tasa_aciertos': round(aciertos / consultas, 3) if consultas else None,
+            }
@@ -0,0 +1,64 @@
+"""
+Comprobación en CPU de CachePrefijos con el modelo diminuto aleatorio (sin GPU ni descargas).
+
+Registra un prefijo, comprueba que se mide su memoria y que buscar() lo encuentra, que la
+generación greedy reutilizando el KV cacheado da los mismos tokens que sin caché y que el KV
+de un adaptador no se reutiliza con otra ruta.
+
+Uso:
+    python comprobar_cache_prefijos.py
+"""
+
+import torch
+
+from cache_prefijos import CachePrefijos, tamano_cache_bytes
+from modelo_tiny import crear_modelo_tiny
+
+PREFIJO = "<s>[INST] You are an expert researcher in cognitive psychology and magic. "
+PREGUNTA = "Why does misdirection work? [/INST]"
+
+
+class TokenizerBytes:
+    """Tokenizer mínimo: un id por byte del texto (desplazado para no usar pad/eos)"""
+
+    def __call__(self, texto):
+        return {"input_ids": [2 + b for b in texto.encode("utf-8")]}
+
+
+def main():
+    model = crear_modelo_tiny(hidden_size=64, intermediate_size=256, num_layers=2, num_heads=4,
+                              lora_r=16, lora_alpha=32)
+    tokenizer = TokenizerBytes()
+    cache = CachePrefijos(model, tokenizer, max_mb=16)
+
+    longitud = cache.registrar(PREFIJO)
+    assert longitud == len(tokenizer(PREFIJO)["input_ids"]) - 1, longitud
+    metricas = cache.metricas()
+    assert metricas["prefijos"] == 1 and cache.bytes_totales > 0, metricas
+    print(f"🧠 Prefijo registrado: {longitud} tokens, {cache.bytes_totales} bytes de KV")
+
+    token_ids = tokenizer(PREFIJO + PREGUNTA)["input_ids"]
+    encontrada, past_key_values = cache.buscar(token_ids)
+    assert encontrada == longitud and past_key_values is not None, encontrada
+    assert tamano_cache_bytes(past_key_values) == cache.bytes_totales
+    # Un prompt que no empieza por el prefijo no debe acertar
+    assert cache.buscar(tokenizer(PREGUNTA)["input_ids"]) == (0, None)
+
+    input_ids = torch.tensor([token_ids])
+    kwargs = dict(max_new_tokens=8, do_sample=False, pad_token_id=0)
+    with torch.no_grad():
+        sin_cache = model.generate(input_ids, **kwargs)
+        con_cache = model.generate(input_ids, past_key_values=past_key_values, **kwargs)
+    assert torch.equal(sin_cache, con_cache), (sin_cache, con_cache)
+
+    # El KV se indexa por "nombre=ruta": otros pesos con el mismo nombre no lo reutilizan
+    cache.registrar(PREFIJO, "magic1=./v1")
+    assert cache.buscar(token_ids, "magic1=./v1")[0] == longitud
+    assert cache.buscar(token_ids, "magic1=./v2") == (0, None)
+    assert cache.olvidar_adaptador("magic1=./v1") == 1
+    assert cache.buscar(token_ids, "magic1=./v1") == (0, None) and cache.metricas()["prefijos"] == 1
+    print(f"✅ Generación con el prefijo cacheado idéntica a la generación completa ({cache.metricas()})")
+
+
+if __name__ == "__main__":
+    main()
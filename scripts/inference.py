@@ -1,112 +1,474 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from peft import PeftModel
-import torch
+import argparse
+import contextlib
+import json
 import os
+import threading
+import time
+
+from arranque import PerfilArranque, elegir_configuracion_carga
+
+# torch, transformers y peft se importan dentro de las funciones que los usan:
+# son la parte más lenta del arranque y así `--help` o el modo merge no pagan lo que no usan.
 
 # --- 1. Define las rutas y nombres ---
 # Ruta donde guardaste tu adaptador LoRA entrenado.
 # Ejemplo: "./mis_modelos/mi_lora_entrenado/"
-lora_model_path = "./lora-phi4-magic1" 
+lora_model_path = "./lora-phi4-magic1"
 
 # Identificador del modelo base que usaste para entrenar LoRA.
 # ¡Debe ser EXACTAMENTE el mismo!
 # Ejemplo: "mistralai/Mistral-7B-Instruct-v0.2"
-base_model_id = "microsoft/Phi-4-mini-instruct" 
+base_model_id = "microsoft/Phi-4-mini-instruct"
+
+# Parámetros por defecto de la generación
+MAX_NEW_TOKENS = 200
+# Presupuesto de tokens por lote (prompt con padding + tokens generados) en modo batch
+MAX_TOKENS_LOTE = 16384
+MAX_LOTE = 32
+
+
+def formatear_prompt(texto):
+    """
+    Prepara el prompt para el modelo Phi-4-mini-instruct.
+    Es crucial usar el formato de instrucción que el modelo espera:
+    "<s>[INST] {prompt} [/INST]"
+    """
+    return f"<s>[INST] {texto} [/INST]"
+
+
+def formatear_prefijo(texto):
+    """Inicio del prompt formateado de cualquier pregunta que empiece por `texto` (para CachePrefijos)"""
+    return f"<s>[INST] {texto}"
+
+
+def parametros_generacion(tokenizer, max_new_tokens=MAX_NEW_TOKENS, greedy=False):
+    """Argumentos comunes para model.generate (muestreo por defecto, greedy para evaluación)"""
+    params = {
+        "max_new_tokens": max_new_tokens,  # Puedes ajustar esto según lo largas que quieras las respuestas
+        "num_beams": 1,                    # Sin beam search
+        "eos_token_id": tokenizer.eos_token_id,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    if greedy:
+        params["do_sample"] = False
+    else:
+        params.update(
+            do_sample=True,    # Para muestreo, si quieres diversidad
+            temperature=0.7,   # Controla la aleatoriedad
+            top_k=50,          # Considera los 50 tokens más probables
+            top_p=0.95,        # Considera el subconjunto más pequeño de tokens cuya probabilidad acumulada es >= 0.95
+        )
+    return params
+
+
+def importar_dependencias():
+    """Importa torch, transformers y peft (para medir su coste por separado en el perfil)"""
+    import torch  # noqa: F401
+    import transformers  # noqa: F401
+    import peft  # noqa: F401
+
 
 # --- 2. Cargar el Tokenizer del modelo base ---
-print(f"Cargando el tokenizer para: {base_model_id}...")
-tokenizer = AutoTokenizer.from_pretrained(base_model_id)
-# Algunos modelos necesitan un token de padding explícito, especialmente para batch inference.
-if tokenizer.pad_token is None:
-    tokenizer.pad_token = tokenizer.eos_token # O un token específico si lo tiene
+def cargar_tokenizer(base_model_id=base_model_id):
+    from transformers import AutoTokenizer
+
+    print(f"Cargando el tokenizer para: {base_model_id}...")
+    tokenizer = AutoTokenizer.from_pretrained(base_model_id)
+    # Algunos modelos necesitan un token de padding explícito, especialmente para batch inference.
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token # O un token específico si lo tiene
+    # En modelos decoder-only el padding va a la izquierda para que todas las
+    # secuencias del lote terminen alineadas justo antes del primer token generado.
+    tokenizer.padding_side = "left"
+    return tokenizer
+
 
 # --- 3. Cargar el modelo base original ---
-print(f"Cargando el modelo base: {base_model_id}...")
-try:
+def cargar_modelo_base(base_model_id=base_model_id):
+    """
+    Carga el modelo base con una única configuración (dtype, dispositivo, cuantización)
+    elegida antes de leer los pesos según el hardware disponible y el tamaño del modelo.
+    """
+    from transformers import AutoModelForCausalLM
+
+    configuracion = elegir_configuracion_carga(base_model_id)
+    print(f"Cargando el modelo base: {base_model_id} ({configuracion['descripcion']})...")
+    model = AutoModelForCausalLM.from_pretrained(base_model_id, **configuracion["kwargs"])
+    print("Modelo base cargado.")
+    return model
+
+
+# --- 4. Cargar el adaptador LoRA y "pegarlo" al modelo base ---
+def aplicar_adaptador(model, lora_model_path=lora_model_path):
+    from peft import PeftModel
+
+    print(f"Cargando el adaptador LoRA desde: {lora_model_path}...")
+    model = PeftModel.from_pretrained(model, lora_model_path)
+    print("Adaptador LoRA aplicado.")
+
+    # --- 5. Poner el modelo en modo de evaluación ---
+    model.eval()
+    return model
+
+
+def cargar_modelo(base_model_id=base_model_id, lora_model_path=lora_model_path):
+    return aplicar_adaptador(cargar_modelo_base(base_model_id), lora_model_path)
+
+
+def cargar_modelo_fusionado(merged_model_path):
+    """
+    Carga un checkpoint generado con el subcomando `merge`: los pesos LoRA ya están
+    sumados a los del modelo base, así que no hay PeftModel ni matmuls extra por capa.
+    """
+    model = cargar_modelo_base(merged_model_path)
+    model.eval()
+    return model
+
+
+def fusionar_adaptador(output_dir, base_model_id=base_model_id, lora_model_path=lora_model_path):
+    """
+    Fusiona el adaptador LoRA en los pesos del modelo base (W + B·A·alpha/r) y guarda
+    un checkpoint independiente en safetensors junto con el tokenizer.
+
+    La fusión se hace en CPU y en bfloat16: un modelo cuantizado en 4-bit no se puede
+    fusionar sin perder precisión, por eso no se usa elegir_configuracion_carga.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM
+    from peft import PeftModel
+
+    print(f"Cargando el modelo base en CPU (bfloat16): {base_model_id}...")
     model = AutoModelForCausalLM.from_pretrained(
         base_model_id,
-        device_map="auto",          # Distribuye el modelo automáticamente en tu GPU/CPU
-        torch_dtype=torch.bfloat16,  # Optimiza el uso de memoria y velocidad
-        trust_remote_code=True      # Necesario para algunos modelos personalizados
+        torch_dtype=torch.bfloat16,
+        trust_remote_code=True
     )
-except Exception as e:
-    print(f"Error al cargar en bfloat16: {e}. Intentando con float16...")
-    try:
-        model = AutoModelForCausalLM.from_pretrained(
-            base_model_id,
-            device_map="auto",
-            torch_dtype=torch.float16,
-            trust_remote_code=True
-        )
-    except Exception as e:
-        print(f"Error al cargar en float16: {e}. Intentando con load_in_4bit...")
-        model = AutoModelForCausalLM.from_pretrained(
-            base_model_id,
-            device_map="auto",
-            load_in_4bit=True, # Carga el modelo en 4-bit para ahorrar VRAM
-            trust_remote_code=True
-        )
+    print(f"Cargando el adaptador LoRA desde: {lora_model_path}...")
+    model = PeftModel.from_pretrained(model, lora_model_path)
 
-print("Modelo base cargado.")
+    print("🔄 Fusionando el adaptador en los pesos base...")
+    model = model.merge_and_unload()
+
+    print(f"💾 Guardando modelo fusionado en: {output_dir}")
+    model.save_pretrained(output_dir, safe_serialization=True)
+    cargar_tokenizer(base_model_id).save_pretrained(output_dir)
+    print("✅ Modelo fusionado guardado. Úsalo con: python inference.py --merged " + output_dir)
+
+
+# --- 6. Generación ---
+def generar_lote(model, tokenizer, lote_ids, cache_prefijos=None, adaptador=None, **kwargs_generacion):
+    """
+    Genera las respuestas de un lote de prompts ya tokenizados.
+
+    Args:
+        lote_ids (list[list[int]]): input_ids de cada prompt (sin padding)
+        cache_prefijos (CachePrefijos): si el lote es de un solo prompt y empieza por un
+            prefijo cacheado, solo se hace el prefill del resto. Con varios prompts el
+            padding a la izquierda desplaza el prefijo y no se usa la caché.
+        adaptador (str): adaptador LoRA activo, forma parte de la clave de cache_prefijos
+
+    Returns:
+        list[tuple[str, int]]: (respuesta, tokens generados) por prompt, en el mismo orden
+    """
+    import torch
+
+    # Padding dinámico: solo hasta la longitud del prompt más largo del lote
+    inputs = tokenizer.pad({"input_ids": lote_ids}, padding=True, return_tensors="pt").to(model.device)
+
+    if cache_prefijos is not None and len(lote_ids) == 1:
+        _, past_key_values = cache_prefijos.buscar(lote_ids[0], adaptador)
+        if past_key_values is not None:
+            kwargs_generacion = dict(kwargs_generacion, past_key_values=past_key_values)
 
-# --- 4. Cargar el adaptador LoRA y "pegarlo" al modelo base ---
-print(f"Cargando el adaptador LoRA desde: {lora_model_path}...")
-model = PeftModel.from_pretrained(model, lora_model_path)
-print("Adaptador LoRA aplicado.")
-
-# --- 5. Poner el modelo en modo de evaluación ---
-model.eval()
-
-print("\n--- ¡Modelo listo para la inferencia! ---")
-print("Escribe tu pregunta y presiona Enter. Escribe 'salir' para terminar.")
-
-# --- 6. Bucle para la inferencia interactiva ---
-while True:
-    user_input = input("\nTu pregunta: ")
-    if user_input.lower() == 'salir':
-        print("Saliendo del programa.")
-        break
-    
-    # Prepara el prompt para el modelo Phi-4-mini-instruct
-    # Asegúrate de usar el formato de instrucción que el modelo espera.
-    # El modelo Phi-4-mini-instruct usa el formato de chat de Llama, por ejemplo:
-    # "<s>[INST] {prompt} [/INST]"
-    # Es crucial para que el modelo entienda tu instrucción correctamente.
-    formatted_prompt = f"<s>[INST] {user_input} [/INST]"
-
-    inputs = tokenizer(formatted_prompt, return_tensors="pt", padding=True).to(model.device)
-
-    # --- 7. Generar la respuesta ---
-    print("\nGenerando respuesta...")
     with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=200,    # Puedes ajustar esto según lo largas que quieras las respuestas
-            num_beams=1,           # Para generación greedy simple
-            do_sample=True,        # Para muestreo, si quieres diversidad
-            temperature=0.7,       # Controla la aleatoriedad
-            top_k=50,              # Considera los 50 tokens más probables
-            top_p=0.95,            # Considera el subconjunto más pequeño de tokens cuya probabilidad acumulada es >= 0.95
-            eos_token_id=tokenizer.eos_token_id, 
-            pad_token_id=tokenizer.pad_token_id,
-            # Añadir este parámetro puede ayudar a que el modelo no regenere el prompt en la salida
-            # Aunque con el formato de instrucción, es menos común
-            # return_full_text=False 
-        )
+        outputs = model.generate(**inputs, **kwargs_generacion)
+
+    # Con padding a la izquierda todos los prompts ocupan las mismas posiciones,
+    # así que lo nuevo generado empieza justo en inputs.input_ids.shape[1]
+    nuevos = outputs[:, inputs["input_ids"].shape[1]:]
+    respuestas = tokenizer.batch_decode(nuevos, skip_special_tokens=True)
+    tokens_generados = (nuevos != tokenizer.pad_token_id).sum(dim=1).tolist()
+    return [(r.strip(), n) for r, n in zip(respuestas, tokens_generados)]
+
+
+def generar_respuesta(model, tokenizer, user_input, cache_prefijos=None, **kwargs_generacion):
+    """Genera la respuesta para una sola pregunta"""
+    lote_ids = [tokenizer(formatear_prompt(user_input))["input_ids"]]
+    respuesta, _ = generar_lote(model, tokenizer, lote_ids, cache_prefijos, **kwargs_generacion)[0]
+    return respuesta
 
-    # Decodificar el texto generado y mostrarlo
-    # Es importante decodificar solo la parte nueva generada por el modelo
-    # Para ello, podemos calcular la longitud de la entrada original y cortar la salida.
-    generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    
-    # En muchos modelos instruct, la salida incluye la pregunta.
-    # Necesitamos encontrar el final de la instrucción y mostrar solo lo que sigue.
-    # Para Phi-4-mini-instruct, la respuesta debería empezar después de "[/INST]"
-    if "[/INST]" in generated_text:
-        response_start = generated_text.find("[/INST]") + len("[/INST]")
-        actual_response = generated_text[response_start:].strip()
+
+def generar_stream(model, tokenizer, user_input, lock=None, cache_prefijos=None, adaptador=None,
+                   preparar=None, **kwargs_generacion):
+    """
+    Genera la respuesta a una pregunta devolviendo el texto a medida que se produce.
+
+    model.generate corre en un hilo aparte y escribe en un TextIteratorStreamer;
+    este generador va entregando los fragmentos de texto decodificados. Si el consumidor
+    deja de iterar (close() o se descarta el generador), la generación se corta en el
+    siguiente token y se libera el lock.
+
+    Args:
+        lock (threading.Lock): si se indica, se mantiene durante toda la generación
+            (para no solapar con otros usos del mismo modelo, p. ej. el batcher del servidor)
+        preparar (callable): se llama con el lock tomado justo antes de generar y devuelve
+            kwargs extra para generate (p. ej. cargar y seleccionar un adaptador)
+
+    Yields:
+        str: fragmentos de texto de la respuesta
+    """
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+    class DetenerSiCancelado(StoppingCriteria):
+        """Corta generate() cuando nadie consume ya el streaming"""
+
+        def __call__(self, input_ids, scores, **kwargs):
+            return cancelado.is_set()
+
+    cancelado = threading.Event()
+    criterios = StoppingCriteriaList(kwargs_generacion.pop("stopping_criteria", None) or [])
+    criterios.append(DetenerSiCancelado())
+
+    inputs = tokenizer(formatear_prompt(user_input), return_tensors="pt").to(model.device)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    errores = []
+
+    def _generar():
+        try:
+            with lock or contextlib.nullcontext():
+                if cancelado.is_set():
+                    # Abandonado mientras esperaba el lock
+                    streamer.end()
+                    return
+                extra = preparar() if preparar else {}
+                # El prefijo se busca con el lock tomado: nadie puede cambiar los pesos del
+                # adaptador entre la búsqueda y generate
+                if cache_prefijos is not None:
+                    _, past_key_values = cache_prefijos.buscar(inputs["input_ids"][0].tolist(), adaptador)
+                    if past_key_values is not None:
+                        extra = dict(extra, past_key_values=past_key_values)
+                with torch.no_grad():
+                    model.generate(**inputs, streamer=streamer, stopping_criteria=criterios,
+                                   **kwargs_generacion, **extra)
+        except Exception as e:
+            errores.append(e)
+            # Desbloquear al consumidor del streamer
+            streamer.end()
+
+    hilo = threading.Thread(target=_generar, daemon=True)
+    hilo.start()
+    try:
+        for texto in streamer:
+            if texto:
+                yield texto
+    finally:
+        # También con GeneratorExit: el hilo no debe seguir generando (con el lock tomado)
+        cancelado.set()
+    hilo.join()
+    if errores:
+        raise errores[0]
+
+
+def crear_lotes(longitudes, max_new_tokens=MAX_NEW_TOKENS, max_tokens_lote=MAX_TOKENS_LOTE, max_lote=MAX_LOTE):
+    """
+    Agrupa prompts en lotes dinámicos ordenándolos por longitud tokenizada.
+
+    Cada lote respeta un presupuesto de tokens: n_prompts * (longitud_max + max_new_tokens)
+    no supera max_tokens_lote, de modo que los prompts cortos se agrupan en lotes grandes
+    y los largos en lotes pequeños, con el mínimo padding posible.
+
+    Args:
+        longitudes (list[int]): longitud en tokens de cada prompt
+
+    Returns:
+        list[list[int]]: índices de los prompts de cada lote
+    """
+    # De más largo a más corto: el primer lote es el más exigente en memoria y falla pronto si no cabe
+    orden = sorted(range(len(longitudes)), key=lambda i: longitudes[i], reverse=True)
+    lotes = []
+    lote = []
+    longitud_max = 0
+    for i in orden:
+        nueva_max = max(longitud_max, longitudes[i])
+        if lote and (len(lote) >= max_lote or (len(lote) + 1) * (nueva_max + max_new_tokens) > max_tokens_lote):
+            lotes.append(lote)
+            lote = []
+            nueva_max = longitudes[i]
+        lote.append(i)
+        longitud_max = nueva_max
+    if lote:
+        lotes.append(lote)
+    return lotes
+
+
+def leer_prompts_jsonl(path):
+    """
+    Lee un JSONL con el formato de data/ds-full*.jsonl ("instruction" + "input" opcional)
+    y devuelve las filas junto con el texto de la pregunta a enviar al modelo.
+    """
+    filas = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            fila = json.loads(linea)
+            partes = [fila.get("instruction", ""), fila.get("input", "")]
+            fila["_pregunta"] = "\n".join(p for p in partes if p and p.strip())
+            filas.append(fila)
+    return filas
+
+
+def procesar_jsonl(model, tokenizer, input_path, output_path, max_new_tokens=MAX_NEW_TOKENS,
+                   max_tokens_lote=MAX_TOKENS_LOTE, max_lote=MAX_LOTE, greedy=False, cache_prefijos=None):
+    """
+    Modo batch: genera las respuestas de todas las filas de un JSONL en lotes dinámicos
+    y las va escribiendo en el JSONL de salida a medida que termina cada lote.
+    """
+    filas = leer_prompts_jsonl(input_path)
+    print(f"📄 {len(filas)} prompts leídos de {input_path}")
+
+    prompts_ids = tokenizer([formatear_prompt(f["_pregunta"]) for f in filas])["input_ids"]
+    lotes = crear_lotes([len(ids) for ids in prompts_ids], max_new_tokens, max_tokens_lote, max_lote)
+    print(f"📦 {len(lotes)} lotes (máx. {max_lote} prompts, {max_tokens_lote} tokens por lote)")
+
+    kwargs_generacion = parametros_generacion(tokenizer, max_new_tokens, greedy)
+    total_tokens = 0
+    inicio = time.perf_counter()
+
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for n, lote in enumerate(lotes, 1):
+            resultados = generar_lote(model, tokenizer, [prompts_ids[i] for i in lote], cache_prefijos,
+                                      **kwargs_generacion)
+            for i, (respuesta, tokens) in zip(lote, resultados):
+                fila = {k: v for k, v in filas[i].items() if k != "_pregunta"}
+                fila.update(indice=i, respuesta=respuesta, tokens_generados=tokens)
+                out.write(json.dumps(fila, ensure_ascii=False) + "\n")
+                total_tokens += tokens
+            out.flush()
+            transcurrido = time.perf_counter() - inicio
+            print(f"   ✅ Lote {n}/{len(lotes)} ({len(lote)} prompts) - {total_tokens / transcurrido:.1f} tokens/s")
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"\n🎉 {len(filas)} respuestas en {transcurrido:.1f}s "
+          f"({total_tokens} tokens, {total_tokens / transcurrido:.1f} tokens/s)")
+    print(f"💾 Resultados guardados en: {output_path}")
+
+
+# --- 7. Bucle para la inferencia interactiva ---
+def modo_interactivo(model, tokenizer, max_new_tokens=MAX_NEW_TOKENS, stream=False, cache_prefijos=None):
+    print("\n--- ¡Modelo listo para la inferencia! ---")
+    print("Escribe tu pregunta y presiona Enter. Escribe 'salir' para terminar.")
+
+    kwargs_generacion = parametros_generacion(tokenizer, max_new_tokens)
+    while True:
+        user_input = input("\nTu pregunta: ")
+        if user_input.lower() == 'salir':
+            print("Saliendo del programa.")
+            break
+
+        if stream:
+            # Mostrar los tokens según se generan
+            print("\n--- Respuesta del Modelo ---")
+            for texto in generar_stream(model, tokenizer, user_input, cache_prefijos=cache_prefijos,
+                                        **kwargs_generacion):
+                print(texto, end="", flush=True)
+            print()
+            continue
+
+        print("\nGenerando respuesta...")
+        actual_response = generar_respuesta(model, tokenizer, user_input, cache_prefijos, **kwargs_generacion)
+
+        print("\n--- Respuesta del Modelo ---")
+        print(actual_response)
+
+
+def crear_cache_prefijos(model, tokenizer, prefijos=(), prefijos_jsonl=None, max_mb=None, adaptador=None):
+    """
+    Crea una CachePrefijos con los preámbulos indicados y, si se da un JSONL con el
+    formato de data/ds-full-v2.jsonl, con cada "instruction" distinta que tenga "input".
+    El KV se calcula con el adaptador activo del modelo (`adaptador` para la clave).
+
+    Returns:
+        CachePrefijos o None si no hay prefijos que registrar
+    """
+    textos = list(prefijos)
+    if prefijos_jsonl:
+        for fila in leer_prompts_jsonl(prefijos_jsonl):
+            if fila.get("input", "").strip() and fila["instruction"] not in textos:
+                textos.append(fila["instruction"])
+    if not textos:
+        return None
+
+    from cache_prefijos import CachePrefijos, MAX_MB_PREFIJOS
+    cache_prefijos = CachePrefijos(model, tokenizer, max_mb or MAX_MB_PREFIJOS)
+    for texto in textos:
+        cache_prefijos.registrar(formatear_prefijo(texto), adaptador)
+    return cache_prefijos
+
+
+def calentar_modelo(model, tokenizer):
+    """Genera un token para que la primera petición real no pague la inicialización de kernels"""
+    lote_ids = [tokenizer(formatear_prompt("Hola"))["input_ids"]]
+    generar_lote(model, tokenizer, lote_ids, **parametros_generacion(tokenizer, max_new_tokens=1, greedy=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inferencia con Phi-4-mini + adaptador LoRA")
+    parser.add_argument('--input', help='JSONL con prompts (formato data/ds-full*.jsonl) para modo batch')
+    parser.add_argument('--output', default='respuestas.jsonl', help='JSONL de salida del modo batch')
+    parser.add_argument('--max-new-tokens', type=int, default=MAX_NEW_TOKENS)
+    parser.add_argument('--max-tokens-lote', type=int, default=MAX_TOKENS_LOTE,
+                        help='Presupuesto de tokens por lote (prompt con padding + generación)')
+    parser.add_argument('--max-lote', type=int, default=MAX_LOTE, help='Máximo de prompts por lote')
+    parser.add_argument('--greedy', action='store_true', help='Decodificación greedy (reproducible)')
+    parser.add_argument('--stream', action='store_true', help='Modo interactivo mostrando los tokens según se generan')
+    parser.add_argument('--prefijo', action='append', default=[],
+                        help='Preámbulo fijo cuyo KV se precalcula (se puede repetir)')
+    parser.add_argument('--prefijos-jsonl', metavar='JSONL',
+                        help='Registrar como prefijos las "instruction" de un JSONL tipo ds-full-v2')
+    parser.add_argument('--max-mb-prefijos', type=float, help='Límite de memoria de la caché de prefijos')
+    parser.add_argument('--merged', metavar='DIR',
+                        help='Cargar un modelo ya fusionado (generado con el subcomando merge)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Mostrar el tiempo de cada fase del arranque (imports, tokenizer, pesos, adaptador, primer token)')
+
+    subparsers = parser.add_subparsers(dest='comando')
+    parser_merge = subparsers.add_parser('merge', help='Fusionar el adaptador LoRA en el modelo base')
+    parser_merge.add_argument('--output', required=True, help='Directorio de salida del modelo fusionado')
+    parser_merge.add_argument('--base-model', default=base_model_id)
+    parser_merge.add_argument('--adapter', default=lora_model_path)
+    args = parser.parse_args()
+
+    if args.comando == 'merge':
+        fusionar_adaptador(args.output, args.base_model, args.adapter)
+        return
+
+    perfil = PerfilArranque(activo=args.profile_startup)
+    with perfil.fase("imports"):
+        importar_dependencias()
+    with perfil.fase("tokenizer"):
+        tokenizer = cargar_tokenizer(args.merged or base_model_id)
+    with perfil.fase("pesos base"):
+        model = cargar_modelo_base(args.merged or base_model_id)
+    if args.merged:
+        model.eval()
     else:
-        actual_response = generated_text.strip() # En caso de que el formato no sea el esperado
+        with perfil.fase("adaptador"):
+            model = aplicar_adaptador(model)
+    if args.profile_startup:
+        with perfil.fase("primer token"):
+            calentar_modelo(model, tokenizer)
+    perfil.imprimir()
+
+    cache_prefijos = crear_cache_prefijos(model, tokenizer, args.prefijo, args.prefijos_jsonl, args.max_mb_prefijos)
+
+    if args.input:
+        procesar_jsonl(model, tokenizer, args.input, args.output, args.max_new_tokens,
+                       args.max_tokens_lote, args.max_lote, args.greedy, cache_prefijos)
+    else:
+        modo_interactivo(model, tokenizer, args.max_new_tokens, args.stream, cache_prefijos)
+
 
-    print("\n--- Respuesta del Modelo ---")
-    print(actual_response)
+if __name__ == "__main__":
+    main()
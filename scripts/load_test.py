@@ -0,0 +1,65 @@
+"""
+Prueba de carga para server.py: lanza peticiones concurrentes a /generate y muestra
+latencias, throughput y las métricas de batching del servidor.
+
+Uso:
+    python server.py --tiny &
+    python load_test.py --peticiones 200 --concurrencia 32
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor LoRA")
+    parser.add_argument('--server', default='http://localhost:8000')
+    parser.add_argument('--peticiones', type=int, default=100)
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--max-new-tokens', type=int, default=32)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrencia)
+    session.mount('http://', adapter)
+    session.headers["Authorization"] = f"Bearer {os.getenv('AUTH_TOKEN', '123')}"
+
+    def enviar(i):
+        inicio = time.perf_counter()
+        response = session.post(
+            f"{args.server}/generate",
+            json={"instruction": f"Pregunta de prueba número {i}: ¿qué es el misdirection?",
+                  "max_new_tokens": args.max_new_tokens},
+            timeout=300
+        )
+        return time.perf_counter() - inicio, response.status_code
+
+    print(f"🔄 Enviando {args.peticiones} peticiones con concurrencia {args.concurrencia}...")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        resultados = list(pool.map(enviar, range(args.peticiones)))
+    total = time.perf_counter() - inicio
+
+    latencias = sorted(lat for lat, codigo in resultados if codigo == 200)
+    errores = sum(1 for _, codigo in resultados if codigo != 200)
+    print(f"✅ {len(latencias)} correctas, ❌ {errores} errores en {total:.1f}s "
+          f"({len(resultados) / total:.1f} peticiones/s)")
+    if latencias:
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+        print(f"⏱️  Latencia p50 {statistics.median(latencias) * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms")
+
+    print("\n📊 Métricas del servidor:")
+    print(json.dumps(session.get(f"{args.server}/metrics", timeout=10).json(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
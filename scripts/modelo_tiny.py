@@ -0,0 +1,53 @@
+"""
+Modelo diminuto con la arquitectura de Phi-4-mini (Phi3) y pesos aleatorios, con un
+adaptador LoRA aleatorio sobre los mismos módulos que models/lora_adapters.
+
+Sirve para benchmarks y pruebas de carga en CPU sin descargar los pesos reales.
+"""
+
+import torch
+from transformers import Phi3Config, Phi3ForCausalLM
+from peft import LoraConfig, get_peft_model
+
+# Mismos módulos que models/lora_adapters/adapter_config.json
+LORA_TARGET_MODULES = ["o_proj", "qkv_proj", "gate_up_proj", "down_proj"]
+
+
+def crear_modelo_tiny(vocab_size=1024, hidden_size=256, num_layers=4, num_heads=8,
+                      intermediate_size=1024, lora_r=128, lora_alpha=256, semilla=0,
+                      pad_token_id=0, eos_token_id=1):
+    """
+    Crea un PeftModel diminuto con pesos aleatorios.
+
+    Los pesos LoRA se inicializan aleatoriamente (no a cero como en un entrenamiento
+    nuevo) para que el adaptador cambie realmente las salidas del modelo.
+
+    Returns:
+        PeftModel: modelo base Phi3 con el adaptador LoRA aplicado, en modo eval
+    """
+    torch.manual_seed(semilla)
+    config = Phi3Config(
+        vocab_size=vocab_size,
+        hidden_size=hidden_size,
+        intermediate_size=intermediate_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=num_heads,
+        num_key_value_heads=num_heads,
+        max_position_embeddings=4096,
+        pad_token_id=pad_token_id,
+        bos_token_id=eos_token_id,
+        eos_token_id=eos_token_id,
+    )
+    model = Phi3ForCausalLM(config)
+
+    lora_config = LoraConfig(
+        r=lora_r,
+        lora_alpha=lora_alpha,
+        lora_dropout=0.0,
+        target_modules=LORA_TARGET_MODULES,
+        init_lora_weights=False,
+        task_type="CAUSAL_LM",
+    )
+    model = get_peft_model(model, lora_config)
+    model.eval()
+    return model
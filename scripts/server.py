@@ -0,0 +1,563 @@
+"""
+Servidor persistente para Phi-4-mini + adaptador LoRA.
+
+Carga el modelo una sola vez y expone el contrato que usa apps/examples/rag:
+    POST /generate         {"instruction": "...", "max_new_tokens": 200}  ->  {"respuesta": "..."}
+    POST /generate_stream  (mismo cuerpo)  ->  text/event-stream con los tokens según se generan
+
+Las peticiones concurrentes a /generate se encolan y un único hilo las agrupa en lotes
+dinámicos (hasta --max-batch-size peticiones o --max-wait-ms de espera) que se generan juntos.
+
+Uso:
+    python server.py                          # Phi-4-mini + adaptador LoRA
+    python server.py --merged ./phi4-merged   # Checkpoint fusionado
+    python server.py --tiny                   # Modelo diminuto aleatorio en CPU (pruebas de carga)
+    python server.py --adaptador v3=./lora-phi4-magic1 --adaptador v2=./lora-phi4-magic1-v2
+
+Con varios adaptadores el modelo base se carga una sola vez; cada petición elige el suyo con
+"adaptador" y un mismo lote puede mezclar adaptadores. Se gestionan en caliente con /adapters.
+
+Con --cache-respuestas (y --cache-sqlite para persistirla) las peticiones repetidas se sirven
+sin generar. Solo son cacheables con --greedy (con muestreo cada respuesta puede variar).
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+import torch
+from dotenv import load_dotenv
+from flask import Flask, Response, request, jsonify, stream_with_context
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from adaptadores import GestorAdaptadores, MAX_ADAPTADORES, MAX_MB_ADAPTADORES
+from cache_respuestas import CacheRespuestas, MAX_ENTRADAS_CACHE, clave_respuesta, normalizar_prompt
+from inference import (
+    MAX_NEW_TOKENS,
+    base_model_id,
+    cargar_modelo_base,
+    cargar_modelo_fusionado,
+    cargar_tokenizer,
+    crear_cache_prefijos,
+    formatear_prompt,
+    generar_lote,
+    generar_stream,
+    lora_model_path,
+    parametros_generacion,
+)
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+
+# Token de autenticación desde variables de entorno
+AUTH_TOKEN = os.getenv('AUTH_TOKEN', '123')
+
+# Configuración del batching dinámico
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 20
+# Límite máximo de tokens nuevos que puede pedir una petición
+LIMITE_NEW_TOKENS = 1024
+TIMEOUT_PETICION = 300
+
+# Variables globales
+batcher = None
+cache_respuestas = None
+# Identifica los pesos en la clave de la caché de respuestas
+modelo_id = None
+
+
+class LimitePorPeticion(StoppingCriteria):
+    """
+    Detiene cada fila del lote al alcanzar su propio max_new_tokens.
+    Las filas terminadas dejan de contar y generate() acaba cuando terminan todas.
+    """
+
+    def __init__(self, limites):
+        self.limites = torch.tensor(limites)
+        self.longitud_prompt = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        # Se llama tras cada token nuevo: la primera vez ya hay 1 token generado
+        if self.longitud_prompt is None:
+            self.longitud_prompt = input_ids.shape[1] - 1
+        generados = input_ids.shape[1] - self.longitud_prompt
+        return (generados >= self.limites).to(input_ids.device)
+
+
+class Peticion:
+    """Petición de generación encolada a la espera de su lote"""
+
+    def __init__(self, input_ids, max_new_tokens, adaptador=None):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.adaptador = adaptador
+        self.llegada = time.perf_counter()
+        self.evento = threading.Event()
+        self.respuesta = None
+        self.tokens_generados = 0
+        self.error = None
+
+
+class BatcherDinamico:
+    """Agrupa peticiones concurrentes en lotes y las genera en un único hilo"""
+
+    def __init__(self, model, tokenizer, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, greedy=False,
+                 cache_prefijos=None, gestor=None, adaptador_defecto=None):
+        self._model = model
+        self.tokenizer = tokenizer
+        self.cache_prefijos = cache_prefijos
+        self.gestor = gestor
+        self.adaptador_defecto = adaptador_defecto
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.kwargs_generacion = parametros_generacion(tokenizer, greedy=greedy)
+        self.cola = queue.Queue()
+        # Serializa el uso del modelo entre los lotes y las peticiones en streaming
+        self.lock_modelo = threading.Lock()
+
+        # Métricas
+        self.lock_metricas = threading.Lock()
+        self.histograma_lotes = Counter()
+        self.histograma_cola = Counter()
+        self.cola_max = 0
+        self.peticiones_totales = 0
+        self.latencia_total = 0.0
+
+        self.hilo = threading.Thread(target=self._bucle, daemon=True)
+        self.hilo.start()
+
+    @property
+    def model(self):
+        # Con GestorAdaptadores el PeftModel lo crea el gestor al cargar el primer adaptador
+        return self.gestor.model if self.gestor else self._model
+
+    def id_adaptador(self, nombre):
+        """Clave del adaptador para las cachés (incluye su ruta) o None sin gestor"""
+        return self.gestor.identificador(nombre) if self.gestor and nombre else None
+
+    def enviar(self, instruction, max_new_tokens, adaptador=None):
+        """Encola una petición y la devuelve para esperar su evento"""
+        input_ids = self.tokenizer(formatear_prompt(instruction))["input_ids"]
+        peticion = Peticion(input_ids, max_new_tokens, adaptador or self.adaptador_defecto)
+        self.cola.put(peticion)
+        with self.lock_metricas:
+            self.cola_max = max(self.cola_max, self.cola.qsize())
+        return peticion
+
+    def _recoger_lote(self):
+        """Bloquea hasta la primera petición y espera hasta max_wait por más"""
+        lote = [self.cola.get()]
+        limite = time.perf_counter() + self.max_wait
+        while len(lote) < self.max_batch_size:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def preparar_adaptadores(self, nombres):
+        """
+        Carga los adaptadores del lote y devuelve los kwargs de generate para usarlos.
+        Debe llamarse con lock_modelo tomado.
+        """
+        if not self.gestor:
+            return {}
+        self.gestor.asegurar(nombres)
+        return self.gestor.kwargs_generacion(nombres)
+
+    def _generar(self, lote):
+        kwargs = dict(self.kwargs_generacion)
+        limites = [p.max_new_tokens for p in lote]
+        kwargs["max_new_tokens"] = max(limites)
+        kwargs["stopping_criteria"] = StoppingCriteriaList([LimitePorPeticion(limites)])
+        with self.lock_modelo:
+            nombres = [p.adaptador for p in lote]
+            kwargs.update(self.preparar_adaptadores(nombres))
+            # Con el lock tomado: la ruta no puede cambiar entre la búsqueda del prefijo y generate
+            resultados = generar_lote(self.model, self.tokenizer, [p.input_ids for p in lote],
+                                      self.cache_prefijos, self.id_adaptador(nombres[0]), **kwargs)
+        for peticion, (respuesta, tokens) in zip(lote, resultados):
+            peticion.respuesta = respuesta
+            peticion.tokens_generados = tokens
+
+    def _bucle(self):
+        while True:
+            lote = self._recoger_lote()
+            en_cola = self.cola.qsize()
+            # Un adaptador eliminado mientras la petición esperaba no debe tumbar el lote entero
+            validas = []
+            for peticion in lote:
+                if self.gestor and peticion.adaptador not in self.gestor.rutas:
+                    peticion.error = f"Adaptador no registrado: {peticion.adaptador}"
+                else:
+                    validas.append(peticion)
+            try:
+                if validas:
+                    self._generar(validas)
+            except Exception as e:
+                logger.error(f"❌ Error generando lote de {len(validas)} peticiones: {e}")
+                for peticion in validas:
+                    peticion.error = str(e)
+
+            fin = time.perf_counter()
+            with self.lock_metricas:
+                self.histograma_lotes[len(lote)] += 1
+                self.histograma_cola[en_cola] += 1
+                self.peticiones_totales += len(lote)
+                self.latencia_total += sum(fin - p.llegada for p in lote)
+            for peticion in lote:
+                peticion.evento.set()
+
+    def metricas(self):
+        with self.lock_metricas:
+            lotes = sum(self.histograma_lotes.values())
+            return {
+                'cola_actual': self.cola.qsize(),
+                'cola_max': self.cola_max,
+                'peticiones_totales': self.peticiones_totales,
+                'lotes_totales': lotes,
+                'tamano_lote_medio': self.peticiones_totales / lotes if lotes else 0,
+                'latencia_media_ms': 1000 * self.latencia_total / self.peticiones_totales if self.peticiones_totales else 0,
+                # Tamaño de lote -> nº de lotes; peticiones en cola al despachar -> nº de lotes
+                'histograma_tamano_lote': dict(sorted(self.histograma_lotes.items())),
+                'histograma_profundidad_cola': dict(sorted(self.histograma_cola.items())),
+                'cache_prefijos': self.cache_prefijos.metricas() if self.cache_prefijos else None,
+                'adaptadores': self.gestor.estado() if self.gestor else None,
+            }
+
+
+def require_auth(f):
+    """Decorator para requerir autenticación"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+
+        if not auth_header:
+            return jsonify({'error': 'Cabecera de autenticación requerida'}), 401
+
+        # Verificar formato Bearer token
+        if not auth_header.startswith('Bearer '):
+            return jsonify({'error': 'Formato de autenticación inválido. Use: Bearer <token>'}), 401
+
+        # Verificar token
+        if auth_header.split(' ')[1] != AUTH_TOKEN:
+            return jsonify({'error': 'Token de autenticación inválido'}), 401
+
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def evento_sse(datos, evento=None):
+    """Formatea un evento server-sent events con datos JSON"""
+    cabecera = f"event: {evento}\n" if evento else ""
+    return f"{cabecera}data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+def leer_peticion():
+    """
+    Valida el cuerpo JSON de /generate y /generate_stream
+
+    Returns:
+        tuple: (instruction, max_new_tokens, adaptador, clave de caché o None, None)
+            o (None, None, None, None, respuesta de error)
+    """
+    data = request.get_json(silent=True)
+    if not data or not str(data.get('instruction', '')).strip():
+        return None, None, None, None, (jsonify({'error': 'Falta el parámetro instruction'}), 400)
+
+    try:
+        max_new_tokens = int(data.get('max_new_tokens', MAX_NEW_TOKENS))
+    except (TypeError, ValueError):
+        return None, None, None, None, (jsonify({'error': 'max_new_tokens debe ser un entero'}), 400)
+    max_new_tokens = max(1, min(max_new_tokens, LIMITE_NEW_TOKENS))
+
+    adaptador = data.get('adaptador') or batcher.adaptador_defecto
+    if data.get('adaptador') and (not batcher.gestor or adaptador not in batcher.gestor.rutas):
+        return None, None, None, None, (jsonify({'error': f'Adaptador no registrado: {adaptador}'}), 400)
+
+    # Se genera con el prompt normalizado para que la respuesta corresponda a su clave
+    instruction = normalizar_prompt(data['instruction'])
+    clave = None
+    if cache_respuestas:
+        parametros = dict(batcher.kwargs_generacion, max_new_tokens=max_new_tokens)
+        if cache_respuestas.es_cacheable(parametros):
+            clave = clave_respuesta(modelo_id, instruction, parametros, batcher.id_adaptador(adaptador))
+        else:
+            cache_respuestas.contar_no_cacheable()
+    return instruction, max_new_tokens, adaptador, clave, None
+
+
+@app.route('/generate', methods=['POST'])
+@require_auth
+def generate():
+    """Genera la respuesta a una instrucción"""
+    instruction, max_new_tokens, adaptador, clave, error = leer_peticion()
+    if error:
+        return error
+
+    guardada = cache_respuestas.obtener(clave) if clave else None
+    if guardada:
+        return jsonify(dict(guardada, cache=True))
+
+    peticion = batcher.enviar(instruction, max_new_tokens, adaptador)
+    if not peticion.evento.wait(TIMEOUT_PETICION):
+        return jsonify({'error': 'Timeout esperando la generación'}), 504
+    if peticion.error:
+        return jsonify({'error': peticion.error}), 500
+
+    resultado = {
+        'respuesta': peticion.respuesta,
+        'tokens_generados': peticion.tokens_generados
+    }
+    if clave:
+        cache_respuestas.guardar(clave, resultado)
+    return jsonify(dict(resultado, cache=False))
+
+
+@app.route('/generate_stream', methods=['POST'])
+@require_auth
+def generate_stream():
+    """
+    Genera la respuesta como server-sent events:
+        data: {"token": "..."}                     por cada fragmento de texto
+        event: fin   data: {"respuesta": "...", "tiempo_primer_token_ms": ...}
+        event: error data: {"error": "..."}
+    """
+    instruction, max_new_tokens, adaptador, clave, error = leer_peticion()
+    if error:
+        return error
+
+    guardada = cache_respuestas.obtener(clave) if clave else None
+    if guardada:
+        # Acierto de caché: la respuesta completa llega como un único fragmento
+        def eventos_cacheados():
+            yield evento_sse({'token': guardada['respuesta']})
+            yield evento_sse({'respuesta': guardada['respuesta'], 'tiempo_primer_token_ms': 0.0,
+                              'tiempo_total_ms': 0.0, 'cache': True}, 'fin')
+        return Response(eventos_cacheados(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    kwargs = dict(batcher.kwargs_generacion, max_new_tokens=max_new_tokens)
+    # El adaptador se carga y activa con el lock del modelo tomado, justo antes de generar
+    preparar = (lambda: batcher.preparar_adaptadores([adaptador])) if batcher.gestor else None
+
+    def eventos():
+        inicio = time.perf_counter()
+        primer_token = None
+        partes = []
+        flujo = generar_stream(batcher.model, batcher.tokenizer, instruction,
+                               lock=batcher.lock_modelo, cache_prefijos=batcher.cache_prefijos,
+                               adaptador=batcher.id_adaptador(adaptador), preparar=preparar, **kwargs)
+        try:
+            for texto in flujo:
+                if primer_token is None:
+                    primer_token = time.perf_counter() - inicio
+                partes.append(texto)
+                yield evento_sse({'token': texto})
+        except Exception as e:
+            logger.error(f"❌ Error en generación streaming: {e}")
+            yield evento_sse({'error': str(e)}, 'error')
+            return
+        finally:
+            # Si el cliente se desconecta, Flask cierra este generador: se corta la generación
+            # para que no siga ocupando el lock del modelo hasta max_new_tokens
+            flujo.close()
+        respuesta = ''.join(partes).strip()
+        if clave:
+            # tokens_generados no se conoce al hacer streaming; se cuenta con el tokenizer
+            tokens = len(batcher.tokenizer(respuesta, add_special_tokens=False)["input_ids"])
+            cache_respuestas.guardar(clave, {'respuesta': respuesta, 'tokens_generados': tokens})
+        yield evento_sse({
+            'respuesta': respuesta,
+            'tiempo_primer_token_ms': round(1000 * (primer_token or 0), 1),
+            'tiempo_total_ms': round(1000 * (time.perf_counter() - inicio), 1),
+            'cache': False
+        }, 'fin')
+
+    return Response(stream_with_context(eventos()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/adapters', methods=['GET'])
+@require_auth
+def listar_adaptadores():
+    """Adaptadores registrados y cargados"""
+    if not batcher.gestor:
+        return jsonify({'error': 'El servidor no usa adaptadores intercambiables'}), 400
+    return jsonify(dict(batcher.gestor.estado(), defecto=batcher.adaptador_defecto))
+
+
+@app.route('/adapters', methods=['POST'])
+@require_auth
+def registrar_adaptador():
+    """Registra un adaptador {"nombre": ..., "ruta": ..., "cargar": false}"""
+    if not batcher.gestor:
+        return jsonify({'error': 'El servidor no usa adaptadores intercambiables'}), 400
+    data = request.get_json(silent=True) or {}
+    if not data.get('nombre') or not data.get('ruta'):
+        return jsonify({'error': 'Faltan parámetros: nombre y ruta requeridos'}), 400
+
+    try:
+        with batcher.lock_modelo:
+            anterior = batcher.gestor.rutas.get(data['nombre'])
+            batcher.gestor.registrar(data['nombre'], data['ruta'])
+            # Otros pesos con el mismo nombre: el KV de prefijos calculado con los antiguos ya no vale
+            if batcher.cache_prefijos and anterior and anterior != data['ruta']:
+                batcher.cache_prefijos.olvidar_adaptador(f"{data['nombre']}={anterior}")
+            # Precarga opcional para que la primera petición no pague la carga
+            if data.get('cargar'):
+                batcher.gestor.asegurar([data['nombre']])
+    except Exception as e:
+        logger.error(f"❌ Error registrando adaptador {data['nombre']}: {e}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify(batcher.gestor.estado())
+
+
+@app.route('/adapters/<nombre>', methods=['DELETE'])
+@require_auth
+def eliminar_adaptador(nombre):
+    """Descarga y elimina un adaptador"""
+    if not batcher.gestor:
+        return jsonify({'error': 'El servidor no usa adaptadores intercambiables'}), 400
+    if nombre == batcher.adaptador_defecto:
+        return jsonify({'error': 'No se puede eliminar el adaptador por defecto'}), 400
+    try:
+        with batcher.lock_modelo:
+            batcher.gestor.eliminar(nombre)
+    except KeyError:
+        return jsonify({'error': f'Adaptador no registrado: {nombre}'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(batcher.gestor.estado())
+
+
+@app.route('/metrics')
+def metrics():
+    """Profundidad de cola, histogramas de tamaño de lote y aciertos de caché"""
+    return jsonify(dict(
+        batcher.metricas(),
+        cache_respuestas=cache_respuestas.metricas() if cache_respuestas else None
+    ))
+
+
+@app.route('/health')
+def health():
+    """Endpoint de salud"""
+    return jsonify({'status': 'healthy', 'model_loaded': batcher is not None})
+
+
+def cargar_modelo_tiny(tokenizer):
+    """Modelo Phi3 diminuto con LoRA aleatorio (CPU) que comparte el tokenizer real"""
+    from modelo_tiny import crear_modelo_tiny
+    return crear_modelo_tiny(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=256,
+        num_layers=2,
+        num_heads=4,
+        lora_r=16,
+        lora_alpha=32,
+        pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+
+
+def main():
+    global batcher, cache_respuestas, modelo_id, LIMITE_NEW_TOKENS
+
+    parser = argparse.ArgumentParser(description="Servidor Phi-4-mini + LoRA con batching dinámico")
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    parser.add_argument('--limite-new-tokens', type=int, default=LIMITE_NEW_TOKENS,
+                        help='Máximo max_new_tokens aceptado por petición')
+    parser.add_argument('--greedy', action='store_true', help='Decodificación greedy')
+    parser.add_argument('--prefijo', action='append', default=[],
+                        help='Preámbulo fijo cuyo KV se precalcula, p. ej. el del RAG: '
+                             '"Contesta la siguiente pregunta utilizando el contexto del documento '
+                             'y tu conocimiento especializado." (se puede repetir)')
+    parser.add_argument('--prefijos-jsonl', metavar='JSONL',
+                        help='Registrar como prefijos las "instruction" de un JSONL tipo ds-full-v2')
+    parser.add_argument('--max-mb-prefijos', type=float, help='Límite de memoria de la caché de prefijos')
+    parser.add_argument('--adaptador', action='append', default=[], metavar='NOMBRE=RUTA',
+                        help='Adaptador LoRA intercambiable (se puede repetir; el primero es el de por defecto)')
+    parser.add_argument('--max-adaptadores', type=int, default=MAX_ADAPTADORES,
+                        help='Máximo de adaptadores cargados a la vez (LRU)')
+    parser.add_argument('--max-mb-adaptadores', type=float, default=MAX_MB_ADAPTADORES,
+                        help='Memoria máxima de los adaptadores cargados (LRU)')
+    parser.add_argument('--cache-respuestas', type=int, nargs='?', const=MAX_ENTRADAS_CACHE, default=0,
+                        metavar='N', help=f'Cachear respuestas en un LRU de N entradas (por defecto {MAX_ENTRADAS_CACHE})')
+    parser.add_argument('--cache-sqlite', metavar='RUTA',
+                        help='Persistir la caché de respuestas en SQLite (implica --cache-respuestas)')
+    parser.add_argument('--merged', metavar='DIR', help='Cargar un modelo ya fusionado')
+    parser.add_argument('--tiny', action='store_true', help='Modelo diminuto aleatorio en CPU para pruebas')
+    args = parser.parse_args()
+
+    LIMITE_NEW_TOKENS = args.limite_new_tokens
+
+    logger.info("🚀 Iniciando servidor LoRA...")
+    gestor = None
+    adaptador_defecto = None
+    if args.merged:
+        # Con el adaptador ya fusionado en los pesos no hay adaptadores que intercambiar
+        tokenizer = cargar_tokenizer(args.merged)
+        model = cargar_modelo_fusionado(args.merged)
+    elif args.tiny:
+        tokenizer = cargar_tokenizer()
+        model = cargar_modelo_tiny(tokenizer)
+    else:
+        tokenizer = cargar_tokenizer()
+        model = cargar_modelo_base()
+        gestor = GestorAdaptadores(model, args.max_adaptadores, args.max_mb_adaptadores)
+        for definicion in args.adaptador or [f"magic1={lora_model_path}"]:
+            nombre, _, ruta = definicion.partition('=')
+            if not ruta:
+                parser.error(f"--adaptador debe tener la forma NOMBRE=RUTA: {definicion}")
+            gestor.registrar(nombre, ruta)
+        adaptador_defecto = next(iter(gestor.rutas))
+        gestor.asegurar([adaptador_defecto])
+        model = gestor.model
+
+    # El KV de los prefijos se indexa por "nombre=ruta": un re-registro con otra ruta no lo reutiliza
+    cache_prefijos = crear_cache_prefijos(model, tokenizer, args.prefijo, args.prefijos_jsonl, args.max_mb_prefijos,
+                                          gestor.identificador(adaptador_defecto) if gestor else None)
+    batcher = BatcherDinamico(model, tokenizer, args.max_batch_size, args.max_wait_ms, args.greedy,
+                              cache_prefijos, gestor, adaptador_defecto)
+
+    if args.cache_respuestas or args.cache_sqlite:
+        # Los pesos de --tiny son aleatorios: su semilla fija forma parte de la identidad
+        modelo_id = args.merged or ('tiny' if args.tiny else base_model_id)
+        cache_respuestas = CacheRespuestas(args.cache_respuestas or MAX_ENTRADAS_CACHE, args.cache_sqlite)
+        logger.info(f"🗃️  Caché de respuestas activa ({args.cache_sqlite or 'solo memoria'})")
+
+    logger.info(f"🌐 Servidor disponible en: http://{args.host}:{args.port}")
+    logger.info(f"📦 Lotes de hasta {args.max_batch_size} peticiones, espera máxima {args.max_wait_ms} ms")
+    logger.info("📖 Endpoints disponibles:")
+    logger.info("  POST /generate - Generar respuesta (requiere auth)")
+    logger.info("  POST /generate_stream - Generar respuesta en streaming SSE (requiere auth)")
+    logger.info("  GET/POST /adapters, DELETE /adapters/<nombre> - Adaptadores LoRA (requiere auth)")
+    logger.info("  GET  /metrics - Cola e histogramas de lotes")
+    logger.info("  GET  /health - Estado de salud (sin auth)")
+
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()